@@ -0,0 +1,81 @@
+"""
+Arquivos estáticos da interface servidos da memória.
+
+Só os arquivos de uma lista fixa são servidos: cada um é lido e comprimido
+com gzip uma vez e identificado por um ETag (hash do conteúdo), então o
+navegador revalida com If-None-Match e recebe 304 sem corpo. Qualquer outro
+caminho (config.json, o banco do catálogo, as capturas, o código) não é
+acessível pela rota estática.
+"""
+
+import os
+import gzip
+import hashlib
+import threading
+
+# Arquivos da interface servidos pelo servidor
+STATIC_FILES = ("index.html", "script.js", "style.css", "favicon.ico")
+
+MIMETYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".ico": "image/x-icon",
+}
+COMPRESSIBLE = (".html", ".js", ".css")
+MIN_GZIP_SIZE = 256  # Abaixo disso o cabeçalho do gzip não compensa
+
+
+class Asset:
+    """Conteúdo de um arquivo estático (e a versão gzip, se compensar)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.body = f.read()
+        self.mtime = os.path.getmtime(path)
+        extension = os.path.splitext(path)[1].lower()
+        self.mimetype = MIMETYPES.get(extension, "application/octet-stream")
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.gzip = None
+        if extension in COMPRESSIBLE and len(self.body) >= MIN_GZIP_SIZE:
+            # mtime=0: a mesma entrada gera sempre os mesmos bytes
+            packed = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if len(packed) < len(self.body):
+                self.gzip = packed
+
+
+class StaticAssets:
+    """
+    Arquivos de `names` em `directory`, carregados na criação.
+
+    Com `reload` (modo de desenvolvimento), um arquivo alterado no disco é
+    relido no pedido seguinte.
+    """
+
+    def __init__(self, directory, names=STATIC_FILES, reload=False):
+        self.directory = directory
+        self.names = frozenset(names)
+        self.reload = reload
+        self._lock = threading.Lock()
+        self._assets = {name: self._load(name) for name in self.names}
+
+    def _load(self, name):
+        try:
+            return Asset(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return None
+
+    def get(self, name):
+        """O Asset de `name`, ou None se não está na lista ou não existe."""
+        if name not in self.names:
+            return None
+        asset = self._assets[name]
+        if self.reload:
+            try:
+                mtime = os.path.getmtime(os.path.join(self.directory, name))
+            except OSError:
+                mtime = None
+            if mtime != (asset.mtime if asset is not None else None):
+                with self._lock:
+                    asset = self._assets[name] = self._load(name)
+        return asset
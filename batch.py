@@ -0,0 +1,286 @@
+"""
+Análise em lote (headless) de vídeos e diretórios de imagens.
+
+Roda a mesma detecção do monitoramento (MotionDetector, limiar de
+SENSIBILIDADE, zonas de COMPARE_IMG) sobre uma gravação ou um diretório de
+capturas exportadas, sem desktop, navegador, Flask nem pyautogui. Cada
+detecção vira uma linha JSON com índice do frame, horário, score, limiar e
+retângulos do movimento.
+
+O pipeline é feito de geradores (leitura -> detecção -> JSONL), então só
+um frame fica em memória por vez. Entradas longas são divididas em blocos
+de frames analisados em paralelo, um processo por núcleo; cada bloco
+começa um frame antes (o frame de referência) e os resultados são
+escritos na ordem da entrada.
+
+Exemplos:
+    python batch.py gravacao.mp4 --output eventos.jsonl
+    python batch.py capturas/ --config config.json --workers 4
+    python batch.py gravacao.mp4 --compare 100,80,400,300 --sensitivity 90 --step 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import cv2
+
+import capture
+import crops
+import detector
+import masks
+from sources import IMAGE_EXTENSIONS
+
+CHUNK_FRAMES = 2000  # Frames por bloco analisado em paralelo
+
+
+# --- Leitura ---
+
+def list_images(directory):
+    """Imagens do diretório em ordem alfabética."""
+    files = sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                   if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not files:
+        raise ValueError(f"Nenhuma imagem encontrada em '{directory}'")
+    return files
+
+
+def probe(path):
+    """
+    Descobre o tamanho e a quantidade de frames da entrada.
+
+    Returns:
+        tuple: ((largura, altura), frames ou None se desconhecida, fps ou None)
+    """
+    if os.path.isdir(path):
+        files = list_images(path)
+        image = cv2.imread(files[0], cv2.IMREAD_COLOR)
+        if image is None:
+            raise IOError(f"Não foi possível ler '{files[0]}'")
+        return (image.shape[1], image.shape[0]), len(files), None
+    video = cv2.VideoCapture(path)
+    try:
+        ok, frame = video.read()
+        if not ok:
+            raise IOError(f"Não foi possível ler o vídeo '{path}'")
+        count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = video.get(cv2.CAP_PROP_FPS)
+        return (frame.shape[1], frame.shape[0]), count if count > 0 else None, fps if fps > 0 else None
+    finally:
+        video.release()
+
+
+def read_video(path, start=0, stop=None, step=1, fps=None):
+    """
+    Gera (índice, segundos desde o início, frame BGR) de um vídeo.
+
+    Os frames fora do passo só são avançados (`grab`), sem decodificação.
+    """
+    video = cv2.VideoCapture(path)
+    try:
+        if start:
+            video.set(cv2.CAP_PROP_POS_FRAMES, start)
+        frame = None
+        index = start
+        while stop is None or index < stop:
+            if (index - start) % step:
+                if not video.grab():
+                    break
+            else:
+                ok, frame = video.read(frame)
+                if not ok:
+                    break
+                yield index, round(index / fps, 3) if fps else None, frame
+            index += 1
+    finally:
+        video.release()
+
+
+def read_images(files, size, start=0, stop=None, step=1):
+    """
+    Gera (índice, mtime do arquivo, frame BGR) de uma lista de imagens.
+
+    Imagens com tamanho diferente de `size` são redimensionadas para ele.
+    """
+    width, height = size
+    for index in range(start, len(files) if stop is None else min(stop, len(files)), step):
+        image = cv2.imread(files[index], cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        if image.shape[:2] != (height, width):
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        yield index, round(os.path.getmtime(files[index]), 3), image
+
+
+# --- Detecção ---
+
+def detect(frames, settings):
+    """
+    Compara os frames consecutivos de `frames` e gera um dict por detecção.
+
+    Args:
+        frames: Gerador de (índice, horário, frame BGR), todos do mesmo tamanho
+        settings: Dict com COMPARE_IMG, SENSIBILIDADE, DETECTION_SCALE,
+            CROP_MIN_AREA, EXCLUDE_IMG, EXCLUDE_MASK, MASK_TILE_SIZE e "size"
+            (largura, altura) da entrada
+    """
+    screen = settings["size"]
+    frame_region = (0, 0) + tuple(screen)
+    zones = detector.normalize_zones(settings["COMPARE_IMG"], settings["SENSIBILIDADE"])
+    if zones is None:
+        cmp_region = capture.clamp_region(settings["COMPARE_IMG"], screen)
+    else:
+        for zone in zones:
+            zone["region"] = capture.clamp_region(zone["region"], screen)
+        cmp_region = capture.bounding_region([z["region"] for z in zones])
+    excluded = masks.exclusion_mask(cmp_region, settings.get("EXCLUDE_IMG"), settings.get("EXCLUDE_MASK"))
+    motion = detector.MotionDetector((cmp_region[3], cmp_region[2]), scale=settings.get("DETECTION_SCALE", 1.0),
+                                     exclude=excluded, tile_size=settings.get("MASK_TILE_SIZE", masks.TILE_SIZE))
+    if zones is None:
+        counter = None
+        area = masks.unmasked_area(excluded) if excluded is not None else None
+        threshold = detector.calculate_pixel_threshold(cmp_region, settings["SENSIBILIDADE"], area)
+    else:
+        areas = None
+        if excluded is not None:
+            areas = [masks.unmasked_area(excluded, z["region"], cmp_region) for z in zones]
+        counter = detector.ZoneCounter(zones, cmp_region, motion, areas)
+    min_area = max(1, int(settings.get("CROP_MIN_AREA", 25) / motion.pixel_scale))
+
+    for index, timestamp, frame in frames:
+        # Máscara completa (sem limite): os retângulos precisam de todos os componentes
+        score = motion.process(capture.region_view(frame, frame_region, cmp_region))
+        if score is None:
+            continue
+        event = None
+        if counter is None:
+            if score > threshold:
+                event = {"score": score, "threshold": threshold}
+        else:
+            counts = counter.count(motion.mask, score)
+            fired = counter.fired(counts)
+            if len(fired):
+                event = {"score": score,
+                         "zones": [{"name": counter.names[i], "score": int(counts[i]),
+                                    "threshold": int(counter.thresholds[i])} for i in fired]}
+        if event is not None:
+            boxes = crops.merge_boxes(crops.to_capture(crops.find_boxes(motion.mask, min_area),
+                                                       motion.mask.shape, cmp_region, frame_region))
+            event = dict({"frame": index, "timestamp": timestamp}, **event)
+            event["boxes"] = [[x0, y0, x1 - x0, y1 - y0] for x0, y0, x1, y1 in sorted(boxes)]
+            yield event
+
+
+def analyze_chunk(task):
+    """
+    Analisa os frames [start, stop) de uma entrada (roda nos processos do pool).
+
+    O bloco começa um frame de passo antes de `start`, que serve só de
+    referência, então o resultado é o mesmo de uma leitura contínua.
+
+    Returns:
+        list: Detecções do bloco, em ordem
+    """
+    path, start, stop, settings = task
+    step = settings["step"]
+    first = max(0, start - step)
+    if os.path.isdir(path):
+        files = list_images(path)
+        frames = read_images(files, settings["size"], first, stop, step)
+        events = list(detect(frames, settings))
+        for event in events:
+            event["file"] = os.path.basename(files[event["frame"]])
+        return events
+    return list(detect(read_video(path, first, stop, step, settings.get("fps")), settings))
+
+
+def chunks(total, step, size=CHUNK_FRAMES):
+    """Divide [0, total) em blocos de ~`size` frames alinhados ao passo."""
+    size = max(step, size - size % step)
+    return [(start, min(total, start + size)) for start in range(0, total, size)]
+
+
+def analyze(path, settings, workers=None, chunk_frames=CHUNK_FRAMES):
+    """
+    Gera as detecções da entrada em ordem, analisando blocos em paralelo.
+
+    Sem a quantidade de frames (alguns vídeos não informam) a entrada é lida
+    de ponta a ponta em um único processo.
+    """
+    size, total, fps = probe(path)
+    settings = dict(settings, size=size, fps=fps)
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    if total is None:
+        yield from analyze_chunk((path, 0, None, settings))
+        return
+    tasks = [(path, start, stop, settings) for start, stop in chunks(total, settings["step"], chunk_frames)]
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            yield from analyze_chunk(task)
+        return
+    # 'spawn' como em workers.py: o mesmo comportamento em todas as plataformas
+    with multiprocessing.get_context("spawn").Pool(min(workers, len(tasks))) as pool:
+        for events in pool.imap(analyze_chunk, tasks):
+            yield from events
+
+
+# --- Linha de comando ---
+
+def parse_region(text):
+    """Converte 'x,y,l,a' em [x, y, largura, altura]."""
+    values = [int(v) for v in text.split(",")]
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError("use x,y,largura,altura")
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análise headless de vídeos e diretórios de imagens.")
+    parser.add_argument("input", help="Arquivo de vídeo ou diretório de imagens")
+    parser.add_argument("--output", "-o", default="-", help="Arquivo JSONL das detecções (padrão: saída padrão)")
+    parser.add_argument("--config", help="config.json de onde vêm COMPARE_IMG, SENSIBILIDADE, DETECTION_SCALE e a exclusão")
+    parser.add_argument("--compare", type=parse_region,
+                        help="Região de comparação x,y,largura,altura (padrão: o frame inteiro)")
+    parser.add_argument("--sensitivity", type=float, help="SENSIBILIDADE (%%, padrão: 80)")
+    parser.add_argument("--scale", type=float, help="DETECTION_SCALE (padrão: 1.0)")
+    parser.add_argument("--step", type=int, default=1,
+                        help="Compara um frame a cada N (ex.: 10 num vídeo de 30 fps ~ INTERVAL de 0,333 s)")
+    parser.add_argument("--workers", type=int, help="Processos em paralelo (padrão: núcleos)")
+    parser.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES, help="Frames por bloco paralelo")
+    args = parser.parse_args(argv)
+
+    settings = {"SENSIBILIDADE": 80, "DETECTION_SCALE": 1.0}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        settings.update({k: config[k] for k in ("COMPARE_IMG", "SENSIBILIDADE", "DETECTION_SCALE", "CROP_MIN_AREA",
+                                                "EXCLUDE_IMG", "EXCLUDE_MASK", "MASK_TILE_SIZE")
+                         if k in config})
+    if args.compare:
+        settings["COMPARE_IMG"] = args.compare
+    if args.sensitivity is not None:
+        settings["SENSIBILIDADE"] = args.sensitivity
+    if args.scale is not None:
+        settings["DETECTION_SCALE"] = args.scale
+    settings.setdefault("COMPARE_IMG", [0, 0, 1 << 30, 1 << 30])  # Ajustada ao tamanho do frame
+    settings["step"] = max(1, args.step)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.perf_counter()
+    count = 0
+    try:
+        for event in analyze(args.input, settings, args.workers, args.chunk_frames):
+            output.write(json.dumps(event, ensure_ascii=False) + "\n")
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"{count} detecção(ões) em {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
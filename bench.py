@@ -0,0 +1,315 @@
+"""
+Benchmark do núcleo de detecção do MonitCam.
+
+Roda captura (de uma fonte sintética ou gravada) -> detecção -> codificação
+sem desktop, navegador ou Flask, e reporta FPS, latência por estágio
+(percentis) e pico de memória para cada combinação de tamanho de região e
+sensibilidade.
+
+Com --compare-modes, compara a vazão da detecção em thread (DETECTION_MODE
+"thread") e em processos de trabalho ("process") com várias regiões de
+comparação detectadas a cada tick, como várias sessões ou zonas.
+
+Com --startup, mede a partida a frio do servidor em interpretadores novos:
+tempo de `import server`, tempo até a primeira resposta de / e /get_config e
+quais módulos pesados (cv2, numpy, mss, pyautogui) foram carregados.
+
+Exemplos:
+    python bench.py
+    python bench.py --sizes 320x240,730x412,1920x1080 --sensitivities 50,80,95
+    python bench.py --source gravacao.mp4 --frames 500 --json resultado.json
+    python bench.py --compare-modes --sizes 1920x1080 --detectors 4 --workers 4
+    python bench.py --startup --runs 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+import tracemalloc
+
+import cv2
+
+import capture
+import detector
+import sources
+import workers
+from detector import calculate_pixel_threshold
+from metrics import StageTimer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ("capture", "convert", "diff", "blur", "threshold", "morph", "count", "save")
+
+# Módulos que não devem ser carregados só para servir a interface
+HEAVY_MODULES = ("cv2", "numpy", "mss", "pyautogui")
+
+# Roda em um interpretador novo: mede a importação e as primeiras respostas
+_STARTUP_PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+client = server.app.test_client()
+first = {}
+for path in ("/", "/get_config"):
+    t = time.perf_counter()
+    status = client.get(path).status_code
+    first[path] = [round((time.perf_counter() - t) * 1000, 1), status]
+print(json.dumps({"import_ms": round((imported - started) * 1000, 1),
+                  "ready_ms": round((time.perf_counter() - started) * 1000, 1),
+                  "first_request_ms": first,
+                  "heavy_modules": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def parse_size(text):
+    """Converte 'LxA' em (largura, altura)."""
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def benchmark_case(source, cap_region, cmp_region, sensitivity, frames, scale=1.0, save_format=".png"):
+    """
+    Mede o pipeline em uma combinação de regiões e sensibilidade.
+
+    Returns:
+        dict: FPS, detecções, percentis por estágio e pico de memória
+    """
+    grabber = capture.RegionGrabber(source, [cap_region, cmp_region])
+    motion = detector.MotionDetector((cmp_region[3], cmp_region[2]), scale=scale)
+    timer = StageTimer()
+    motion.timer = timer
+    pixel_threshold = calculate_pixel_threshold(cmp_region, sensitivity)
+
+    processed = 0
+    detections = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        while processed < frames:
+            timer.start()
+            try:
+                frame_A, frame_B = grabber.grab()
+            except capture.SourceExhausted:
+                break
+            timer.lap("capture")
+            score = motion.process(frame_B, limit=pixel_threshold)
+            if score is not None and score > pixel_threshold:
+                detections += 1
+                cv2.imencode(save_format, cv2.cvtColor(frame_A, cv2.COLOR_BGR2GRAY))
+                timer.lap("save")
+            timer.stop()
+            processed += 1
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    summary = timer.summary()
+    return {
+        "capture_region": list(cap_region),
+        "compare_region": list(cmp_region),
+        "sensitivity": sensitivity,
+        "scale": scale,
+        "frames": processed,
+        "detections": detections,
+        "fps": round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+        "stages": {stage: summary[stage] for stage in STAGES if stage in summary},
+        "cascade": dict(motion.stats),
+        "python_peak_mb": round(peak / 1e6, 2),
+    }
+
+
+def benchmark_modes(open_source, cap_region, detectors, frames, scale=1.0, pool_workers=None):
+    """
+    Mede a vazão (ticks/s) de `detectors` regiões detectadas por tick, em
+    thread e em processos. A região de captura é dividida em faixas
+    verticais, uma por detector; a inicialização do pool não é cronometrada.
+
+    Args:
+        open_source: Função que abre uma fonte nova (cada modo usa a sua)
+
+    Returns:
+        dict: Ticks/s de cada modo e o ganho do modo em processos
+    """
+    x, y, w, h = cap_region
+    step = max(1, w // detectors)
+    regions = [(x + i * step, y, step, h) for i in range(detectors)]
+    result = {"capture_region": list(cap_region), "detectors": detectors, "scale": scale}
+
+    for mode in ("thread", "process"):
+        source = open_source()
+        pool = workers.DetectionPool(pool_workers) if mode == "process" else None
+        if pool is not None:
+            motions = [pool.detector((r[3], r[2]), scale) for r in regions]
+            result["workers"] = pool.size
+        else:
+            motions = [detector.MotionDetector((r[3], r[2]), scale=scale) for r in regions]
+        grabber = capture.RegionGrabber(source, regions)
+        processed = 0
+        try:
+            started = time.perf_counter()
+            while processed < frames:
+                try:
+                    views = grabber.grab()
+                except capture.SourceExhausted:
+                    break
+                if pool is not None:
+                    for motion, view in zip(motions, views):
+                        motion.submit(view)
+                for motion, view in zip(motions, views):
+                    motion.process(view)
+                processed += 1
+            elapsed = time.perf_counter() - started
+        finally:
+            for motion in motions:
+                motion.close()
+            if pool is not None:
+                pool.close()
+            source.close()
+        result[f"{mode}_ticks_per_s"] = round(processed / elapsed, 1) if elapsed > 0 else 0.0
+
+    if result["thread_ticks_per_s"]:
+        result["speedup"] = round(result["process_ticks_per_s"] / result["thread_ticks_per_s"], 2)
+    return result
+
+
+def benchmark_startup(runs=5):
+    """
+    Mede a partida a frio do servidor, cada rodada em um interpretador novo.
+
+    Returns:
+        dict: Mediana e pior caso da importação e do tempo até responder, as
+        rodadas e os módulos pesados carregados
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE], cwd=here,
+                             capture_output=True, text=True, check=True).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        sample["process_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        samples.append(sample)
+    result = {"runs": samples, "heavy_modules": sorted({m for s in samples for m in s["heavy_modules"]})}
+    for key in ("import_ms", "ready_ms", "process_ms"):
+        values = [s[key] for s in samples]
+        result[key] = {"median": round(statistics.median(values), 1), "max": max(values)}
+    return result
+
+
+def max_rss_mb():
+    """Pico de memória residente do processo (MB), quando disponível."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return round(rss / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+
+def print_report(results):
+    for r in results:
+        w, h = r["capture_region"][2:]
+        cw, ch = r["compare_region"][2:]
+        print(f"\nCAPTURE {w}x{h} | COMPARE {cw}x{ch} | sensibilidade {r['sensitivity']}% "
+              f"| escala {r['scale']} -> {r['fps']} FPS, {r['detections']}/{r['frames']} detecções")
+        print(f"  cascata: {r['cascade']} | memória Python (pico): {r['python_peak_mb']} MB")
+        for stage, stats in r["stages"].items():
+            print(f"  {stage:<10} n={stats['count']:<6} p50={stats['p50_ms']:>8.3f} ms "
+                  f"p90={stats['p90_ms']:>8.3f} ms p99={stats['p99_ms']:>8.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark headless do núcleo de detecção do MonitCam.")
+    parser.add_argument("--source", default="synthetic",
+                        help="'synthetic', diretório de imagens ou arquivo de vídeo (padrão: synthetic)")
+    parser.add_argument("--sizes", default="320x240,730x412,1280x720",
+                        help="Tamanhos da região de captura, LxA separados por vírgula")
+    parser.add_argument("--compare-ratio", type=float, default=0.5,
+                        help="Tamanho da região de comparação relativo à de captura (centralizada)")
+    parser.add_argument("--sensitivities", default="50,80,95",
+                        help="Sensibilidades (%%) separadas por vírgula")
+    parser.add_argument("--scale", type=float, default=1.0, help="DETECTION_SCALE usado na detecção")
+    parser.add_argument("--frames", type=int, default=300, help="Frames por combinação")
+    parser.add_argument("--motion", type=float, default=0.1,
+                        help="Probabilidade de movimento por frame na fonte sintética")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON")
+    parser.add_argument("--compare-modes", action="store_true",
+                        help="Compara a detecção em thread e em processos de trabalho")
+    parser.add_argument("--detectors", type=int, default=4,
+                        help="Regiões detectadas por tick em --compare-modes")
+    parser.add_argument("--workers", type=int, help="Processos de detecção em --compare-modes")
+    parser.add_argument("--startup", action="store_true",
+                        help="Mede a partida a frio do servidor (importação e primeiras respostas)")
+    parser.add_argument("--runs", type=int, default=5, help="Rodadas de --startup")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        r = benchmark_startup(max(1, args.runs))
+        print(f"import server: {r['import_ms']['median']} ms (pior {r['import_ms']['max']} ms) | "
+              f"pronto para responder: {r['ready_ms']['median']} ms | "
+              f"processo inteiro: {r['process_ms']['median']} ms")
+        print(f"módulos pesados carregados: {', '.join(r['heavy_modules']) or 'nenhum'}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"startup": r}, f, indent=2)
+        return 0
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    sensitivities = [int(s) for s in args.sensitivities.split(",")]
+
+    def open_source(size):
+        if args.source == "synthetic":
+            return sources.SyntheticSource(size=size, motion_probability=args.motion)
+        return sources.open_source(args.source, loop=True)
+
+    if args.compare_modes:
+        results = []
+        for size in sizes:
+            with open_source(size) as probe:
+                cap_region = probe.clamp((0, 0) + size)
+            r = benchmark_modes(lambda: open_source(size), cap_region, args.detectors, args.frames,
+                                scale=args.scale, pool_workers=args.workers)
+            results.append(r)
+            print(f"CAPTURE {cap_region[2]}x{cap_region[3]} | {r['detectors']} detectores | "
+                  f"thread {r['thread_ticks_per_s']} ticks/s | process ({r['workers']} processos) "
+                  f"{r['process_ticks_per_s']} ticks/s | ganho {r.get('speedup')}x")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"modes": results}, f, indent=2)
+        return 0
+
+    results = []
+    for size in sizes:
+        for sensitivity in sensitivities:
+            source = open_source(size)
+            try:
+                cap_region = source.clamp((0, 0) + size)
+                cw = max(1, int(cap_region[2] * args.compare_ratio))
+                ch = max(1, int(cap_region[3] * args.compare_ratio))
+                cmp_region = ((cap_region[2] - cw) // 2, (cap_region[3] - ch) // 2, cw, ch)
+                results.append(benchmark_case(source, cap_region, cmp_region, sensitivity,
+                                              args.frames, scale=args.scale))
+            finally:
+                source.close()
+
+    print_report(results)
+    rss = max_rss_mb()
+    if rss is not None:
+        print(f"\nPico de memória residente do processo: {rss} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "max_rss_mb": rss}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Distribuição de eventos do monitoramento para a interface (Server-Sent Events).
+
+A thread de monitoramento publica mensagens sem nunca bloquear: cada
+cliente tem uma fila limitada própria e, se ele não consome a tempo, as
+mensagens mais antigas da fila dele são descartadas.
+"""
+
+import json
+import queue
+import threading
+
+
+class Subscription:
+    """Fila de mensagens de um cliente conectado."""
+
+    def __init__(self, max_queue):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, message):
+        """Entrega sem bloquear, descartando a mensagem mais antiga se a fila estiver cheia."""
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Próxima mensagem, ou None se o tempo esgotar."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broadcaster:
+    """Publica mensagens para todos os clientes inscritos (fan-out)."""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last = {}  # Última mensagem de cada (tipo, chave), reenviada a quem se inscreve
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        sub = Subscription(self.max_queue)
+        with self._lock:
+            self._subscribers.add(sub)
+            for message in self._last.values():
+                sub.offer(message)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event_type, data, key=None):
+        """
+        Publica `data` (serializável em JSON) como um evento SSE do tipo `event_type`.
+
+        `key` separa as últimas mensagens guardadas por origem (ex.: o id da
+        sessão), para que quem se inscreve receba o status de todas.
+        """
+        message = format_sse(event_type, data)
+        with self._lock:
+            if event_type != "detection":
+                self._last[(event_type, key)] = message
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.offer(message)
+
+
+def format_sse(event_type, data):
+    """Formata uma mensagem no protocolo text/event-stream."""
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
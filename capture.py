@@ -0,0 +1,321 @@
+"""
+Sessões de captura de tela do MonitCam.
+
+Uma sessão mantém o recurso de captura aberto (handle do mss ou o módulo
+pyautogui) durante todo o monitoramento e guarda em cache a geometria da
+tela, evitando o custo de configuração a cada frame.
+"""
+
+import time
+import logging
+import importlib.util
+
+import cv2
+import numpy as np
+
+# Intervalo padrão (s) entre verificações de mudança na geometria da tela
+GEOMETRY_CHECK_INTERVAL = 5.0
+
+
+class SourceExhausted(Exception):
+    """Sinaliza que uma fonte de frames gravada (vídeo, diretório) chegou ao fim."""
+
+
+class CaptureFailed(Exception):
+    """Falhas seguidas de captura: a sessão de captura precisa ser reaberta."""
+
+
+def clamp_region(region, screen_size):
+    """
+    Ajusta a região (x, y, w, h) para caber dentro da tela.
+
+    Args:
+        region: Sequência (x, y, w, h)
+        screen_size: Tupla (largura, altura) da tela
+
+    Returns:
+        tuple: Região ajustada (x, y, w, h) com inteiros
+    """
+    screen_w, screen_h = screen_size
+    left, top, w, h = region
+    left = max(0, int(left))
+    top = max(0, int(top))
+    w = max(1, int(min(w, screen_w - left)))
+    h = max(1, int(min(h, screen_h - top)))
+    return (left, top, w, h)
+
+
+class CaptureSession:
+    """
+    Classe base para os backends de captura.
+
+    As subclasses implementam `_open`, `_close`, `_query_screen_size` e
+    `_grab_into`. A sessão deve ser criada e usada na mesma thread
+    (o mss usa recursos do sistema ligados à thread que o abriu).
+    """
+
+    name = "base"
+
+    def __init__(self, geometry_check_interval=GEOMETRY_CHECK_INTERVAL):
+        self.geometry_check_interval = geometry_check_interval
+        self._screen_size = None
+        self._geometry_checked_at = 0.0
+        self._clamp_cache = {}
+        self._scratch = {}
+        self._open()
+        self.refresh_geometry()
+
+    # --- Ciclo de vida ---
+    def close(self):
+        """Libera o recurso de captura."""
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # --- Geometria da tela ---
+    @property
+    def screen_size(self):
+        """Tamanho (largura, altura) da tela em cache."""
+        return self._screen_size
+
+    def refresh_geometry(self):
+        """
+        Consulta novamente o tamanho da tela.
+
+        Returns:
+            bool: True se a geometria mudou desde a última consulta
+        """
+        size = tuple(int(v) for v in self._query_screen_size())
+        self._geometry_checked_at = time.monotonic()
+        if size == self._screen_size:
+            return False
+        if self._screen_size is not None:
+            logging.info("Geometria da tela alterada: %s -> %s", self._screen_size, size)
+            self._on_geometry_change()
+        self._screen_size = size
+        self._clamp_cache.clear()
+        return True
+
+    def check_geometry(self):
+        """Revalida a geometria apenas quando o intervalo de verificação expirou."""
+        if time.monotonic() - self._geometry_checked_at >= self.geometry_check_interval:
+            return self.refresh_geometry()
+        return False
+
+    def clamp(self, region):
+        """Ajusta a região à tela usando a geometria em cache."""
+        key = tuple(region)
+        clamped = self._clamp_cache.get(key)
+        if clamped is None:
+            clamped = clamp_region(key, self._screen_size)
+            self._clamp_cache[key] = clamped
+        return clamped
+
+    # --- Captura ---
+    def begin_frame(self):
+        """
+        Chamado uma vez por tick, antes das capturas do tick.
+
+        Na tela real não faz nada; fontes gravadas/sintéticas avançam um frame
+        (e levantam SourceExhausted ao terminar).
+        """
+
+    def grab(self, region, out=None):
+        """
+        Captura a região (já ajustada à tela) como imagem BGR.
+
+        Args:
+            region: Tupla (x, y, w, h) em coordenadas de tela
+            out: Buffer opcional (h, w, 3) uint8 reutilizado como destino
+
+        Returns:
+            np.ndarray: Imagem BGR (h, w, 3); é o próprio `out` quando compatível
+        """
+        left, top, w, h = region
+        if out is None or out.shape != (h, w, 3) or out.dtype != np.uint8:
+            out = np.empty((h, w, 3), dtype=np.uint8)
+        try:
+            self._grab_into(left, top, w, h, out)
+        except Exception:
+            # Uma falha de captura costuma indicar mudança de resolução/monitor
+            self.refresh_geometry()
+            raise
+        return out
+
+    def grab_gray(self, region, out=None):
+        """Captura a região e converte para escala de cinza."""
+        size = tuple(region[2:])
+        frame = self.grab(region, self._scratch.get(size))
+        self._scratch[size] = frame
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+
+    # --- Pontos de extensão ---
+    def _open(self):
+        pass
+
+    def _close(self):
+        pass
+
+    def _on_geometry_change(self):
+        pass
+
+    def _query_screen_size(self):
+        raise NotImplementedError
+
+    def _grab_into(self, left, top, w, h, out):
+        raise NotImplementedError
+
+
+class MssCaptureSession(CaptureSession):
+    """Backend de captura usando um handle mss persistente."""
+
+    name = "mss"
+
+    def _open(self):
+        import mss
+        self._mss = mss
+        self._sct = mss.mss()
+
+    def _close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+    def _on_geometry_change(self):
+        # O mss guarda a lista de monitores; reabre o handle com a nova geometria
+        self._close()
+        self._sct = self._mss.mss()
+
+    def _query_screen_size(self):
+        # O handle principal mantém os monitores em cache, então a consulta
+        # usa um handle temporário (executada apenas a cada verificação)
+        with self._mss.mss() as probe:
+            monitors = probe.monitors
+            primary = monitors[1] if len(monitors) > 1 else monitors[0]
+            return primary["width"], primary["height"]
+
+    def _grab_into(self, left, top, w, h, out):
+        img = self._sct.grab({"left": left, "top": top, "width": w, "height": h})
+        bgra = np.frombuffer(img.raw, dtype=np.uint8).reshape(h, w, 4)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+
+
+class PyAutoGuiCaptureSession(CaptureSession):
+    """Backend de captura usando pyautogui (fallback quando o mss não está instalado)."""
+
+    name = "pyautogui"
+
+    def _open(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def _query_screen_size(self):
+        return self._pyautogui.size()
+
+    def _grab_into(self, left, top, w, h, out):
+        shot = self._pyautogui.screenshot(region=(left, top, w, h))
+        cv2.cvtColor(np.asarray(shot), cv2.COLOR_RGB2BGR, dst=out)
+
+
+BACKENDS = {
+    MssCaptureSession.name: MssCaptureSession,
+    PyAutoGuiCaptureSession.name: PyAutoGuiCaptureSession,
+}
+
+
+def mss_available():
+    """Indica se o pacote mss está instalado (sem importá-lo)."""
+    return importlib.util.find_spec("mss") is not None
+
+
+def open_session(backend=None, **kwargs):
+    """
+    Cria uma sessão de captura.
+
+    Args:
+        backend: 'mss', 'pyautogui' ou None para escolher automaticamente
+
+    Returns:
+        CaptureSession: Sessão aberta
+    """
+    if backend is None:
+        backend = "mss" if mss_available() else "pyautogui"
+    return BACKENDS[backend](**kwargs)
+
+
+def bounding_region(regions):
+    """Retorna a região (x, y, w, h) que envolve todas as regiões informadas."""
+    left = min(r[0] for r in regions)
+    top = min(r[1] for r in regions)
+    right = max(r[0] + r[2] for r in regions)
+    bottom = max(r[1] + r[3] for r in regions)
+    return (left, top, right - left, bottom - top)
+
+
+def region_view(frame, origin, region):
+    """
+    Recorta `region` de um frame capturado a partir de `origin` sem copiar pixels.
+
+    Args:
+        frame: Imagem capturada da região `origin`
+        origin: Região (x, y, w, h) correspondente ao frame
+        region: Sub-região (x, y, w, h) em coordenadas de tela
+
+    Returns:
+        np.ndarray: View (fatia NumPy) do frame
+    """
+    x = region[0] - origin[0]
+    y = region[1] - origin[1]
+    return frame[y:y + region[3], x:x + region[2]]
+
+
+class RegionGrabber:
+    """
+    Captura um conjunto de regiões por tick.
+
+    No modo 'union' faz uma única captura do retângulo envolvente e entrega
+    cada região como view desse buffer, garantindo que todas venham do mesmo
+    instante. No modo 'separate' faz uma captura por região.
+    Os buffers são reaproveitados: as views só são válidas até o próximo `grab`.
+    """
+
+    MODES = ("union", "separate")
+
+    def __init__(self, session, regions, mode="union"):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de captura inválido: {mode}")
+        self.session = session
+        self.mode = mode
+        self.set_regions(regions)
+
+    def set_regions(self, regions):
+        """Define as regiões (já ajustadas à tela) e descarta os buffers antigos."""
+        self.regions = [tuple(r) for r in regions]
+        self.union = bounding_region(self.regions)
+        self._buffers = [None] * len(self.regions)
+
+    def grab(self, new_frame=True):
+        """
+        Captura o tick atual e retorna as imagens BGR na ordem das regiões.
+
+        Com `new_frame=False` não avança a sessão: usado quando vários
+        grabbers recortam o mesmo tick (ver sessions.MonitorManager).
+        """
+        if new_frame:
+            self.session.begin_frame()
+        if self.mode == "union":
+            frame = self.session.grab(self.union, self._buffers[0])
+            self._buffers[0] = frame
+            return [region_view(frame, self.union, r) for r in self.regions]
+
+        frames = []
+        for i, region in enumerate(self.regions):
+            frame = self.session.grab(region, self._buffers[i])
+            self._buffers[i] = frame
+            frames.append(frame)
+        return frames
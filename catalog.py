@@ -0,0 +1,298 @@
+"""
+Catálogo das detecções do MonitCam (SQLite).
+
+Cada detecção (ou evento encerrado) vira uma linha com horário, score,
+limiar, regiões, zonas e caminhos dos arquivos. A thread de captura só
+enfileira o registro; uma thread própria grava em lotes, em uma transação
+por lote. As consultas usam paginação por cursor (chave horário + id) e as
+miniaturas são geradas sob demanda e guardadas em disco, uma pasta por
+captura; a retenção apaga a pasta junto com a captura (`forget_files`).
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import time
+import queue
+import base64
+import logging
+import sqlite3
+import threading
+
+BATCH_SIZE = 100         # Registros por transação
+FLUSH_INTERVAL = 1.0     # Espera máxima (s) para completar um lote
+MAX_PENDING = 10000      # Registros aguardando gravação antes de começar a descartar
+THUMBNAIL_WIDTH = 240    # Largura padrão das miniaturas (px)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    end TEXT,
+    score INTEGER NOT NULL,
+    threshold INTEGER,
+    detections INTEGER NOT NULL DEFAULT 1,
+    region TEXT,
+    zones TEXT,
+    files TEXT NOT NULL,
+    boxes TEXT
+);
+CREATE INDEX IF NOT EXISTS detections_timestamp ON detections (timestamp, id);
+CREATE INDEX IF NOT EXISTS detections_session ON detections (session, timestamp, id);
+"""
+
+_COLUMNS = ("session", "timestamp", "end", "score", "threshold", "detections", "region", "zones", "files", "boxes")
+
+# Colunas acrescentadas depois da primeira versão do esquema: (nome, tipo)
+_ADDED_COLUMNS = (("boxes", "TEXT"),)
+
+
+def encode_cursor(timestamp, row_id):
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverso de `encode_cursor`; ValueError se o cursor for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return timestamp, int(row_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor}") from None
+
+
+class Catalog:
+    """Catálogo com gravação em lotes fora da thread de captura."""
+
+    def __init__(self, path, thumb_dir=None):
+        """
+        Args:
+            path: Arquivo SQLite (criado se não existir)
+            thumb_dir: Diretório das miniaturas (padrão: '{path sem extensão}_thumbs')
+        """
+        self.path = path
+        self.thumb_dir = thumb_dir or os.path.splitext(path)[0] + "_thumbs"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        # WAL: as consultas da API não esperam as gravações em lote
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(detections)")}
+        for name, kind in _ADDED_COLUMNS:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE detections ADD COLUMN {name} {kind}")
+        conn.commit()
+        conn.close()
+        self.stats = {"recorded": 0, "dropped": 0, "failed": 0}
+        self._queue = queue.Queue(maxsize=MAX_PENDING)
+        self._thread = threading.Thread(target=self._worker, name="catalog-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- Gravação ---
+
+    def record(self, session, timestamp, score, threshold, paths, end=None, detections=1,
+               region=None, zones=None, boxes=None):
+        """
+        Enfileira o registro de uma detecção sem bloquear.
+
+        Args:
+            session: Id da sessão
+            timestamp: Início da detecção/evento (datetime)
+            score: Pixels alterados (pico, no caso de evento)
+            threshold: Limiar usado
+            paths: Caminhos dos arquivos gravados
+            end: Fim do evento (datetime), se for um evento agrupado
+            detections: Quantidade de detecções do evento
+            region: Regiões da sessão, ex.: {"capture": [...], "compare": [...]}
+            zones: Zonas que dispararam
+            boxes: Retângulos [x, y, w, h] do movimento, relativos à região de captura
+        """
+        row = (session, timestamp.isoformat(timespec="milliseconds"),
+               end.isoformat(timespec="milliseconds") if end is not None else None,
+               int(score), None if threshold is None else int(threshold), int(detections),
+               json.dumps(region) if region is not None else None,
+               json.dumps(zones, ensure_ascii=False) if zones else None,
+               json.dumps(list(paths), ensure_ascii=False),
+               json.dumps(boxes) if boxes else None)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logging.warning("Fila do catálogo cheia; detecção não registrada.")
+
+    def _worker(self):
+        conn = self._connect()
+        sql = f"INSERT INTO detections ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        running = True
+        while running:
+            batch = []
+            flushes = []
+            item = self._queue.get()
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    flushes.append(item)
+                else:
+                    batch.append(item)
+                if not running or flushes or len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(sql, batch)
+                    self.stats["recorded"] += len(batch)
+                except sqlite3.Error as e:
+                    self.stats["failed"] += len(batch)
+                    logging.error(f"Falha ao gravar {len(batch)} registro(s) no catálogo: {e}")
+            for event in flushes:
+                event.set()
+        conn.close()
+
+    def flush(self, timeout=None):
+        """Aguarda a gravação de tudo o que foi enfileirado até agora."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Grava o que resta na fila e encerra a thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    # --- Consulta ---
+
+    @staticmethod
+    def _row_to_event(row):
+        event = dict(row)
+        event["files"] = json.loads(event["files"])
+        event["region"] = json.loads(event["region"]) if event["region"] else None
+        event["zones"] = json.loads(event["zones"]) if event["zones"] else []
+        event["boxes"] = json.loads(event["boxes"]) if event["boxes"] else []
+        return event
+
+    def query(self, since=None, until=None, session=None, cursor=None, limit=PAGE_SIZE):
+        """
+        Detecções da mais recente para a mais antiga.
+
+        Args:
+            since, until: Limites do horário (ISO 8601; `until` exclusivo)
+            session: Filtra por sessão
+            cursor: `next_cursor` da página anterior
+            limit: Itens por página (até MAX_PAGE_SIZE)
+
+        Returns:
+            tuple: (lista de eventos, próximo cursor ou None)
+        """
+        limit = max(1, min(MAX_PAGE_SIZE, int(limit)))
+        where, params = [], []
+        if since:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            where.append("timestamp < ?")
+            params.append(until)
+        if session:
+            where.append("session = ?")
+            params.append(session)
+        if cursor:
+            timestamp, row_id = decode_cursor(cursor)
+            where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend((timestamp, timestamp, row_id))
+        sql = "SELECT * FROM detections"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        events = [self._row_to_event(r) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = events[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+        return events, next_cursor
+
+    def get(self, event_id):
+        """Uma detecção pelo id (ou None)."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM detections WHERE id = ?", (event_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_event(row) if row is not None else None
+
+    def thumbnail(self, event_id, width=THUMBNAIL_WIDTH):
+        """
+        Caminho da miniatura JPEG do primeiro arquivo da detecção, gerada na
+        primeira vez em que é pedida.
+
+        Returns:
+            str: Caminho da miniatura, ou None se a detecção ou o arquivo não existir
+                (ex.: a captura ainda está na fila de gravação)
+        """
+        event = self.get(event_id)
+        if event is None or not event["files"]:
+            return None
+        source = event["files"][0]
+        directory = self._thumb_path(source)
+        if not os.path.exists(source):
+            # Captura removida (ex.: pela retenção): a miniatura também sai
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        path = os.path.join(directory, f"{int(width)}.jpg")
+        if os.path.exists(path):
+            return path
+        import cv2  # Importado sob demanda: o catálogo é aberto sem o OpenCV
+        import numpy as np
+        try:
+            # np.fromfile + imdecode também funciona com caminhos não-ASCII no Windows
+            image = cv2.imdecode(np.fromfile(source, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        except OSError:
+            return None
+        if image is None:
+            return None
+        h, w = image.shape[:2]
+        if w > width:
+            image = cv2.resize(image, (int(width), max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if not ok:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        # Grava em um arquivo temporário e renomeia: pedidos simultâneos não veem arquivo parcial
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp, path)
+        except FileNotFoundError:
+            return None  # A pasta foi apagada por `forget_files` no meio do caminho
+        return path
+
+    def _thumb_path(self, source):
+        """Pasta das miniaturas (uma por largura) da captura `source`."""
+        return os.path.join(self.thumb_dir, hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:20])
+
+    def forget_files(self, paths):
+        """Apaga as miniaturas das capturas removidas (chamado pela retenção)."""
+        for path in paths:
+            shutil.rmtree(self._thumb_path(path), ignore_errors=True)
@@ -0,0 +1,168 @@
+"""
+Gravação de clipes de eventos do MonitCam.
+
+Os últimos frames da região de captura ficam num buffer circular
+pré-alocado. Quando há uma detecção, o clipe (pré-roll + pós-roll) é
+copiado para um segundo buffer, também pré-alocado, e gravado com
+cv2.VideoWriter numa thread em segundo plano.
+
+Memória usada: 2 × (pre_frames + post_frames) × altura × largura bytes.
+"""
+
+import os
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+
+class ClipRecorder:
+    """
+    Buffer circular de frames em cinza com gravação de clipes em segundo plano.
+
+    O frame do disparo conta como o último frame do pré-roll. Enquanto um
+    clipe ainda está sendo gravado em disco, um novo clipe pronto é descartado
+    (contado em `stats['dropped']`) em vez de bloquear o monitoramento.
+    """
+
+    def __init__(self, shape, pre_frames=10, post_frames=10, fps=3.0, fourcc="MJPG", extension=".avi",
+                 on_written=None):
+        """
+        Args:
+            shape: Tupla (altura, largura) dos frames
+            pre_frames: Frames mantidos antes do disparo (incluindo o do disparo)
+            post_frames: Frames gravados após o disparo
+            fps: Taxa de quadros do arquivo de vídeo
+            fourcc: Código do codec do VideoWriter
+            extension: Extensão do arquivo de vídeo
+            on_written: Função opcional chamada com (caminho, bytes) após cada clipe gravado
+        """
+        self.shape = tuple(shape)
+        self.pre_frames = max(1, int(pre_frames))
+        self.post_frames = max(0, int(post_frames))
+        self.capacity = self.pre_frames + self.post_frames
+        self.fps = float(fps)
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+        self.on_written = on_written
+
+        self._ring = np.empty((self.capacity,) + self.shape, dtype=np.uint8)
+        self._clip = np.empty_like(self._ring)
+        self._head = 0       # Próximo slot a ser escrito
+        self._count = 0      # Frames válidos no buffer
+        self._path = None    # Clipe em gravação (aguardando o pós-roll)
+        self._remaining = 0
+
+        self._lock = threading.Lock()
+        self._counters = {"written": 0, "dropped": 0, "failed": 0}
+        self._pending = None
+        self._wakeup = threading.Condition(self._lock)
+        self._closing = False
+        self._thread = threading.Thread(target=self._worker, name="clip-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def nbytes(self):
+        """Memória total reservada pelos buffers (bytes)."""
+        return self._ring.nbytes + self._clip.nbytes
+
+    @property
+    def recording(self):
+        """Indica se há um clipe aguardando o pós-roll."""
+        return self._path is not None
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def push(self, frame):
+        """Adiciona um frame (BGR ou cinza) ao buffer circular, sem alocar memória."""
+        slot = self._ring[self._head]
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=slot)
+        else:
+            np.copyto(slot, frame)
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+        if self._path is not None:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self._finish()
+
+    def trigger(self, path):
+        """
+        Inicia um clipe no frame mais recente.
+
+        Returns:
+            bool: False se já há um clipe aguardando o pós-roll
+        """
+        if self._path is not None:
+            return False
+        self._path = path
+        self._remaining = self.post_frames
+        if self._remaining == 0:
+            self._finish()
+        return True
+
+    def _finish(self):
+        """Copia o buffer circular em ordem para o buffer do clipe e o entrega à thread."""
+        path, self._path = self._path, None
+        with self._lock:
+            if self._pending is not None:
+                self._counters["dropped"] += 1
+                logging.warning("Gravação de clipe anterior em andamento; clipe descartado: %s", path)
+                return
+            n = self._count
+            start = (self._head - n) % self.capacity
+            first = min(n, self.capacity - start)
+            np.copyto(self._clip[:first], self._ring[start:start + first])
+            if n > first:
+                np.copyto(self._clip[first:n], self._ring[:n - first])
+            self._pending = (path, n)
+            self._wakeup.notify()
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while self._pending is None and not self._closing:
+                    self._wakeup.wait()
+                if self._pending is None:
+                    return
+                path, n = self._pending
+            ok = self._write(path, n)
+            with self._lock:
+                self._counters["written" if ok else "failed"] += 1
+                self._pending = None
+
+    def _write(self, path, n):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            height, width = self.shape
+            video = cv2.VideoWriter(path, self.fourcc, self.fps, (width, height), False)
+            if not video.isOpened():
+                raise IOError("VideoWriter não pôde ser aberto")
+            try:
+                for i in range(n):
+                    video.write(self._clip[i])
+            finally:
+                video.release()
+            if self.on_written is not None:
+                self.on_written(path, os.path.getsize(path))
+            return True
+        except Exception as e:
+            logging.error(f"Falha ao gravar clipe '{path}': {e}")
+            return False
+
+    def close(self):
+        """Grava o clipe em andamento (com pós-roll parcial) e encerra a thread."""
+        if self._path is not None:
+            self._finish()
+        with self._lock:
+            self._closing = True
+            self._wakeup.notify()
+        self._thread.join()
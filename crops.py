@@ -0,0 +1,126 @@
+"""
+Recorte das capturas na área do movimento (CROP_MODE).
+
+Os componentes conexos da máscara de mudança viram retângulos, que são
+levados da escala da detecção (sobre COMPARE_IMG) para coordenadas da
+região de captura, ganham uma margem e são unidos quando se sobrepõem.
+Em vez da região de captura inteira são gravados só esses recortes
+('crops') ou uma versão reduzida da captura mais os recortes em resolução
+original ('overview'), então o custo de codificação e o tamanho dos
+arquivos acompanham o tamanho da mudança.
+"""
+
+import math
+
+import cv2
+
+MODES = ("full", "crops", "overview")
+
+# Se os recortes cobrem mais que isso da região de captura, grava a captura inteira
+MAX_COVERAGE = 0.5
+
+
+def find_boxes(mask, min_area=1):
+    """
+    Retângulos (x, y, w, h) dos componentes conexos da máscara.
+
+    Args:
+        mask: Máscara binária (0/255) na escala da detecção
+        min_area: Área mínima de um componente (pixels da máscara)
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    stats = stats[1:]  # O rótulo 0 é o fundo
+    return stats[stats[:, cv2.CC_STAT_AREA] >= min_area, :4]
+
+
+def to_capture(boxes, mask_shape, cmp_region, cap_region, padding=0):
+    """
+    Leva retângulos da máscara para coordenadas da região de captura.
+
+    Args:
+        boxes: Retângulos (x, y, w, h) na escala da detecção
+        mask_shape: (altura, largura) da máscara
+        cmp_region: Região (x, y, w, h) de comparação na tela
+        cap_region: Região (x, y, w, h) de captura na tela
+        padding: Margem (px) em volta de cada retângulo
+
+    Returns:
+        list: Retângulos (x0, y0, x1, y1) recortados à região de captura
+        (os que ficam fora dela são descartados)
+    """
+    sx = cmp_region[2] / mask_shape[1]
+    sy = cmp_region[3] / mask_shape[0]
+    ox = cmp_region[0] - cap_region[0]
+    oy = cmp_region[1] - cap_region[1]
+    width, height = cap_region[2], cap_region[3]
+    result = []
+    for x, y, w, h in boxes:
+        x0 = max(0, math.floor(x * sx) + ox - padding)
+        y0 = max(0, math.floor(y * sy) + oy - padding)
+        x1 = min(width, math.ceil((x + w) * sx) + ox + padding)
+        y1 = min(height, math.ceil((y + h) * sy) + oy + padding)
+        if x1 > x0 and y1 > y0:
+            result.append((x0, y0, x1, y1))
+    return result
+
+
+def merge_boxes(boxes):
+    """Une os retângulos (x0, y0, x1, y1) que se sobrepõem, até não sobrar sobreposição."""
+    boxes = list(boxes)
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        result = []
+        for box in boxes:
+            for i, other in enumerate(result):
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    result[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                                 max(box[2], other[2]), max(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return boxes
+
+
+def motion_boxes(mask, pixel_scale, cmp_region, cap_region, padding=16, min_area=25, max_boxes=8):
+    """
+    Retângulos de movimento de um tick em coordenadas da região de captura.
+
+    Args:
+        mask: Máscara completa do detector
+        pixel_scale: Pixels originais por pixel da máscara (MotionDetector.pixel_scale)
+        cmp_region, cap_region: Regiões de comparação e de captura na tela
+        padding: Margem (px) em volta de cada retângulo
+        min_area: Área mínima (pixels originais) de um componente
+        max_boxes: Acima disso os retângulos viram um só, o envolvente
+
+    Returns:
+        list: Retângulos [x, y, w, h], ou None se a captura inteira deve ser
+        gravada (nenhum retângulo dentro dela ou cobertura acima de MAX_COVERAGE)
+    """
+    found = find_boxes(mask, max(1, int(min_area / pixel_scale)))
+    boxes = merge_boxes(to_capture(found, mask.shape, cmp_region, cap_region, padding))
+    if not boxes:
+        return None
+    if len(boxes) > max_boxes:
+        xs0, ys0, xs1, ys1 = zip(*boxes)
+        boxes = [(min(xs0), min(ys0), max(xs1), max(ys1))]
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+    if area > MAX_COVERAGE * cap_region[2] * cap_region[3]:
+        return None
+    return [[x0, y0, x1 - x0, y1 - y0] for x0, y0, x1, y1 in sorted(boxes)]
+
+
+def crop_images(frame, boxes):
+    """Recortes em cinza de `frame` (BGR) para cada retângulo [x, y, w, h]; cada um é um array próprio."""
+    return [cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY) for x, y, w, h in boxes]
+
+
+def overview_image(frame, scale):
+    """Versão reduzida em cinza de `frame` (BGR) para o modo 'overview'."""
+    height, width = frame.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
@@ -0,0 +1,433 @@
+"""
+Núcleo de detecção de movimento do MonitCam.
+
+O MotionDetector mantém todos os buffers de trabalho pré-alocados para a
+região de comparação, de modo que o loop de monitoramento não cria novos
+arrays a cada tick.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+import masks
+
+# Configurações técnicas fixas otimizadas para a maioria dos cenários
+DIFF_THRESHOLD = 25          # Sensibilidade de diferença de pixel
+BLUR_KERNEL_SIZE = (5, 5)    # Redução de ruído
+MORPH_KERNEL = (3, 3)        # Remoção de falsos positivos
+BAND_ROWS = 64               # Altura das faixas usadas na contagem com parada antecipada
+
+
+def scale_kernel_size(size, scale):
+    """
+    Reescala um tamanho de kernel (largura, altura) mantendo-o ímpar.
+
+    O raio é reescalado (arredondando para cima na metade), de modo que
+    (5, 5) vira (3, 3) em 1/2 e (3, 3) em 1/4, e (3, 3) vira (1, 1) em 1/4.
+    """
+    return tuple(2 * int((k // 2) * scale + 0.5) + 1 for k in size)
+
+
+def detection_shape(shape, scale):
+    """Tamanho (altura, largura) em que a detecção roda para a região `shape` na escala `scale`."""
+    return max(1, int(round(shape[0] * scale))), max(1, int(round(shape[1] * scale)))
+
+
+def calculate_pixel_threshold(compare_region, sensitivity_percent, area=None):
+    """
+    Calcula o limiar de pixels baseado na área da região de comparação e no percentual de sensibilidade.
+    
+    Args:
+        compare_region: Tupla (x, y, w, h) da região de comparação
+        sensitivity_percent: Valor de 1 a 100, onde:
+            - 100% = detecta qualquer mudança (limiar próximo a 0)
+            - 1% = detecta apenas mudanças muito grandes (limiar próximo à área total)
+        area: Área considerada, se menor que a da região (ex.: sem as partes
+            ignoradas por uma máscara de exclusão)
+    
+    Returns:
+        int: Limiar de pixels para detecção
+    
+    Fórmula: T = A × (1 - (sensibilidade / 100))
+    """
+    _, _, w, h = compare_region
+    area = w * h if area is None else area
+    
+    # Garante que o percentual está entre 1 e 100
+    sensitivity_percent = max(1, min(100, sensitivity_percent))
+    
+    # Calcula o limiar: quanto maior a sensibilidade, menor o limiar
+    threshold = int(area * (1 - (sensitivity_percent / 100)))
+    
+    # Garante um mínimo de 1 pixel para evitar detecções espúrias em 100%
+    threshold = max(1, threshold)
+    
+    logging.info("Área da região: %d pixels | Sensibilidade: %d%% | Limiar calculado: %d pixels",
+                 area, sensitivity_percent, threshold)
+    
+    return threshold
+
+
+def normalize_zones(compare, sensitivity):
+    """
+    Interpreta COMPARE_IMG: uma região [x, y, w, h] ou uma lista de zonas,
+    cada uma [x, y, w, h] ou {"region": [x, y, w, h], "SENSIBILIDADE": s, "name": n}.
+
+    Zonas sem SENSIBILIDADE própria usam `sensitivity` (a da sessão).
+
+    Returns:
+        list: Zonas como dicts {"name", "region", "sensitivity"}, ou None se
+        COMPARE_IMG é uma única região
+    """
+    if not compare or not isinstance(compare[0], (list, tuple, dict)):
+        return None
+    zones = []
+    for i, zone in enumerate(compare):
+        if not isinstance(zone, dict):
+            zone = {"region": zone}
+        zones.append({"name": str(zone.get("name", f"zona{i + 1}")),
+                      "region": tuple(int(v) for v in zone["region"]),
+                      "sensitivity": zone.get("SENSIBILIDADE", sensitivity)})
+    return zones
+
+
+def zone_thresholds(zones, areas=None):
+    """Limiar de pixels de cada zona de `normalize_zones` (`areas`: área não ignorada de cada uma)."""
+    areas = areas or [None] * len(zones)
+    return np.array([calculate_pixel_threshold(z["region"], z["sensitivity"], a) for z, a in zip(zones, areas)],
+                    dtype=np.int64)
+
+
+class ZoneCounter:
+    """
+    Contagem dos pixels alterados de várias zonas em um único passo.
+
+    O MotionDetector roda uma vez sobre o retângulo envolvente das zonas; a
+    contagem de cada zona sai da imagem integral da máscara com quatro
+    consultas vetorizadas: S[y1, x1] - S[y0, x1] - S[y1, x0] + S[y0, x0].
+    Cada zona tem o limiar de `calculate_pixel_threshold` para a sua área.
+    """
+
+    def __init__(self, zones, origin, motion, areas=None):
+        """
+        Args:
+            zones: Zonas de `normalize_zones`, com regiões já ajustadas à tela
+            origin: Região (x, y, w, h) envolvente das zonas (a do detector)
+            motion: MotionDetector da região envolvente
+            areas: Área não ignorada de cada zona (padrão: a área inteira)
+        """
+        self.names = [z["name"] for z in zones]
+        self.regions = [z["region"] for z in zones]
+        self.thresholds = zone_thresholds(zones, areas)
+        self.pixel_scale = motion.pixel_scale
+        h, w = motion.shape
+        sy = h / motion.input_shape[0]
+        sx = w / motion.input_shape[1]
+        boxes = np.array([(x - origin[0], y - origin[1], x - origin[0] + zw, y - origin[1] + zh)
+                          for x, y, zw, zh in self.regions], dtype=np.float64)
+        # Cantos das zonas na escala da detecção (índices da imagem integral)
+        self._x0 = np.clip(np.round(boxes[:, 0] * sx), 0, w).astype(np.intp)
+        self._y0 = np.clip(np.round(boxes[:, 1] * sy), 0, h).astype(np.intp)
+        self._x1 = np.clip(np.round(boxes[:, 2] * sx), 0, w).astype(np.intp)
+        self._y1 = np.clip(np.round(boxes[:, 3] * sy), 0, h).astype(np.intp)
+        # A soma da máscara (0/255) cabe em int32 até ~8,4 milhões de pixels
+        self._sdepth = cv2.CV_32S if h * w * 255 < 2 ** 31 else cv2.CV_64F
+        self._integral = np.zeros((h + 1, w + 1), dtype=np.int32 if self._sdepth == cv2.CV_32S else np.float64)
+        self._zeros = np.zeros(len(zones), dtype=np.int64)
+
+    def count(self, mask, score=None):
+        """
+        Pixels alterados de cada zona, em pixels da resolução original.
+
+        Args:
+            mask: Máscara completa do detector (process sem `limit`)
+            score: Score total do tick; se 0, nenhuma zona mudou e a integral é pulada
+        """
+        if score == 0:
+            return self._zeros
+        s = cv2.integral(mask, sum=self._integral, sdepth=self._sdepth)
+        counts = (s[self._y1, self._x1] - s[self._y0, self._x1] - s[self._y1, self._x0] + s[self._y0, self._x0]) / 255
+        return np.rint(counts * self.pixel_scale).astype(np.int64)
+
+    def fired(self, counts):
+        """Índices das zonas cuja contagem passou do limiar."""
+        return np.flatnonzero(counts > self.thresholds)
+
+
+class MotionDetector:
+    """
+    Compara frames consecutivos da região de comparação.
+
+    Pipeline: absdiff -> GaussianBlur -> threshold -> abertura morfológica
+    -> countNonZero, sempre escrevendo em buffers próprios (`dst=`).
+    Os frames anterior e atual são alternados por troca de referência.
+
+    A detecção é feita em cascata:
+    1. Se nenhum pixel do absdiff passa de `diff_threshold`, o blur (média
+       ponderada) também não passa, então o score é 0 e o resto é pulado.
+    2. Com `limit`, o restante do pipeline roda em faixas horizontais (com
+       margem suficiente para o blur e a morfologia darem o mesmo resultado
+       do frame inteiro) e para assim que a contagem passa do limite.
+    `stats` registra quantas vezes cada estágio encerrou o processamento.
+
+    Com `scale` < 1 a detecção roda numa versão reduzida (INTER_AREA) da
+    região, com kernels reescalados. Scores e `limit` continuam em pixels da
+    resolução original, então o limiar de `calculate_pixel_threshold` (e a
+    SENSIBILIDADE) tem o mesmo significado em qualquer escala.
+
+    Com uma máscara de exclusão (`exclude`) a região é dividida em blocos
+    (masks.py): só os retângulos dos blocos não totalmente ignorados passam
+    pelo pipeline, cada um com margem, sobre a diferença já mascarada; os
+    pixels ignorados nunca entram na máscara nem no score.
+    """
+
+    def __init__(self, shape, diff_threshold=DIFF_THRESHOLD,
+                 blur_kernel_size=BLUR_KERNEL_SIZE, morph_kernel=MORPH_KERNEL,
+                 band_rows=BAND_ROWS, scale=1.0, exclude=None, tile_size=masks.TILE_SIZE):
+        """
+        Args:
+            shape: Tupla (altura, largura) da região de comparação
+            diff_threshold: Diferença mínima de intensidade para um pixel contar
+            blur_kernel_size: Tamanho do kernel do GaussianBlur (na escala original)
+            morph_kernel: Tamanho do elemento estruturante da abertura (na escala original)
+            band_rows: Altura das faixas na contagem com parada antecipada
+            scale: Fator de redução da detecção (ex.: 1, 0.5, 0.25)
+            exclude: Máscara booleana (altura, largura) dos pixels ignorados (masks.exclusion_mask)
+            tile_size: Lado dos blocos (na escala original)
+        """
+        if not 0 < scale <= 1:
+            raise ValueError(f"Escala de detecção inválida: {scale}")
+        self.input_shape = tuple(shape)
+        self.scale = scale
+        self.shape = detection_shape(shape, scale)
+        # Quantos pixels originais cada pixel da detecção representa
+        self.pixel_scale = (self.input_shape[0] * self.input_shape[1]) / (self.shape[0] * self.shape[1])
+        if scale < 1:
+            blur_kernel_size = scale_kernel_size(blur_kernel_size, scale)
+            morph_kernel = scale_kernel_size(morph_kernel, scale)
+        self.diff_threshold = diff_threshold
+        self.blur_kernel_size = tuple(blur_kernel_size)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, tuple(morph_kernel))
+        self.band_rows = max(1, int(band_rows))
+        # Linhas contaminadas pela borda de uma faixa: raio do blur + erosão + dilatação
+        self.halo = self.blur_kernel_size[1] // 2 + 2 * (morph_kernel[1] // 2)
+        self.stats = {"frames": 0, "unchanged": 0, "early_exit": 0, "full": 0}
+        self.mask_complete = True
+        # Cronômetro opcional por estágio (ex.: metrics.StageTimer), usado nos benchmarks
+        self.timer = None
+
+        self._prev = np.zeros(self.shape, dtype=np.uint8)
+        self._curr = np.zeros(self.shape, dtype=np.uint8)
+        self._diff = np.empty(self.shape, dtype=np.uint8)
+        self._blur = np.empty(self.shape, dtype=np.uint8)
+        self._thresh = np.empty(self.shape, dtype=np.uint8)
+        self._mask = np.zeros(self.shape, dtype=np.uint8)
+        self._band = np.empty((min(self.shape[0], self.band_rows + 2 * self.halo), self.shape[1]), dtype=np.uint8)
+        # Frame em cinza na resolução original (só necessário quando há redução)
+        self._gray = np.empty(self.input_shape, dtype=np.uint8) if self.shape != self.input_shape else None
+        self._mask_clear = True
+        self.has_reference = False
+
+        # Exclusão: pixels mantidos (0/255), fração mantida de cada bloco e
+        # retângulos dos blocos ativos com as margens de cada um: os maiores
+        # possíveis sem `limit` e em faixas de `band_rows` linhas com ele
+        self.tile = masks.detection_tile(tile_size, scale)
+        self.keep = self.coverage = self._rects = self._band_rects = None
+        if exclude is not None:
+            self.keep = masks.keep_mask(exclude, self.shape)
+            self.coverage = masks.tile_coverage(self.keep, self.tile)
+            height, width = self.shape
+            halo_x = self.blur_kernel_size[0] // 2 + 2 * (morph_kernel[0] // 2)
+            self._rects, self._band_rects = [
+                [(y0, y1, x0, x1, max(0, y0 - self.halo), min(height, y1 + self.halo),
+                  max(0, x0 - halo_x), min(width, x1 + halo_x))
+                 for y0, y1, x0, x1 in masks.active_rects(self.coverage, self.tile, self.shape, max_rows)]
+                for max_rows in (None, self.band_rows)]
+            self._scratch = np.empty(self.shape, dtype=np.uint8)
+
+    @property
+    def frame(self):
+        """Último frame processado (em cinza, resolução original); válido até o próximo `process`."""
+        return self._prev if self._gray is None else self._gray
+
+    @property
+    def mask(self):
+        """Máscara binária de mudança do último `process` (na escala da detecção)."""
+        return self._mask
+
+    def reset(self):
+        """Descarta o frame de referência; o próximo frame vira a nova base."""
+        self.has_reference = False
+
+    def close(self):
+        """Nada a liberar; existe para manter a interface de workers.RemoteDetector."""
+
+    def load(self, frame):
+        """Copia/converte o frame (BGR ou cinza) para o buffer do frame atual."""
+        gray = self._curr if self._gray is None else self._gray
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        else:
+            np.copyto(gray, frame)
+        if self._gray is not None:
+            cv2.resize(self._gray, (self.shape[1], self.shape[0]), dst=self._curr,
+                       interpolation=cv2.INTER_AREA)
+        self._lap("convert")
+
+    def process(self, frame, limit=None):
+        """
+        Processa um novo frame da região de comparação.
+
+        Args:
+            frame: Imagem BGR ou cinza com o mesmo tamanho da região
+            limit: Se informado, a contagem para assim que passar deste valor
+                (o score retornado é então um limite inferior e a máscara fica
+                incompleta, ver `mask_complete`: as linhas não processadas
+                ficam zeradas)
+
+        Returns:
+            int: Quantidade de pixels alterados (em pixels da resolução original),
+            ou None se ainda não havia referência
+        """
+        self.load(frame)
+        score = None
+        if self.has_reference:
+            if limit is not None:
+                limit = limit / self.pixel_scale
+            score = self._compare(limit)
+            if self.pixel_scale != 1:
+                score = int(round(score * self.pixel_scale))
+        self._swap()
+        return score
+
+    def _compare(self, limit):
+        if self._rects is not None:
+            return self._compare_tiles(limit)
+        self.stats["frames"] += 1
+        cv2.absdiff(self._prev, self._curr, dst=self._diff)
+
+        # Estágio 1: nada muda o suficiente para sobreviver ao threshold
+        unchanged = cv2.minMaxLoc(self._diff)[1] <= self.diff_threshold
+        self._lap("diff")
+        if unchanged:
+            self.stats["unchanged"] += 1
+            if not self._mask_clear:
+                self._mask.fill(0)
+                self._mask_clear = True
+            self.mask_complete = True
+            return 0
+
+        self._mask_clear = False
+        if limit is None or self.shape[0] <= self.band_rows:
+            score = self._pipeline(0, self.shape[0])
+            if limit is not None and score > limit:
+                self.stats["early_exit"] += 1
+            else:
+                self.stats["full"] += 1
+            self.mask_complete = True
+            return score
+
+        # Estágio 2: contagem por faixas com parada antecipada
+        height = self.shape[0]
+        score = 0
+        for y0 in range(0, height, self.band_rows):
+            y1 = min(height, y0 + self.band_rows)
+            score += self._band_pipeline(y0, y1)
+            if score > limit:
+                self.mask_complete = y1 == height
+                # As linhas seguintes ainda têm a máscara do tick anterior
+                self._mask[y1:].fill(0)
+                self.stats["early_exit"] += 1
+                return score
+        self.mask_complete = True
+        self.stats["full"] += 1
+        return score
+
+    def _compare_tiles(self, limit):
+        """`_compare` com exclusão: só os retângulos dos blocos ativos são processados."""
+        self.stats["frames"] += 1
+        rects = self._rects if limit is None else self._band_rects
+        changed = False
+        for _, _, _, _, a, b, c, d in rects:
+            diff = self._diff[a:b, c:d]
+            cv2.absdiff(self._prev[a:b, c:d], self._curr[a:b, c:d], dst=diff)
+            cv2.bitwise_and(diff, self.keep[a:b, c:d], dst=diff)
+            changed = changed or cv2.minMaxLoc(diff)[1] > self.diff_threshold
+        self._lap("diff")
+        if not changed:
+            self.stats["unchanged"] += 1
+            if not self._mask_clear:
+                self._mask.fill(0)
+                self._mask_clear = True
+            self.mask_complete = True
+            return 0
+
+        self._mask_clear = False
+        score = 0
+        last = len(rects) - 1
+        for i, (y0, y1, x0, x1, a, b, c, d) in enumerate(rects):
+            rows, cols = slice(a, b), slice(c, d)
+            cv2.GaussianBlur(self._diff[rows, cols], self.blur_kernel_size, 0, dst=self._blur[rows, cols])
+            self._lap("blur")
+            cv2.threshold(self._blur[rows, cols], self.diff_threshold, 255, cv2.THRESH_BINARY,
+                          dst=self._thresh[rows, cols])
+            self._lap("threshold")
+            opened = self._scratch[:b - a, :d - c]
+            cv2.morphologyEx(self._thresh[rows, cols], cv2.MORPH_OPEN, self.kernel, dst=opened)
+            # A abertura pode espalhar a mudança para pixels ignorados da borda
+            core = self._mask[y0:y1, x0:x1]
+            cv2.bitwise_and(opened[y0 - a:y1 - a, x0 - c:x1 - c], self.keep[y0:y1, x0:x1], dst=core)
+            self._lap("morph")
+            score += int(cv2.countNonZero(core))
+            self._lap("count")
+            if limit is not None and score > limit:
+                self.mask_complete = i == last
+                # Os blocos seguintes ainda têm a máscara do tick anterior
+                for y0, y1, x0, x1, _, _, _, _ in rects[i + 1:]:
+                    self._mask[y0:y1, x0:x1].fill(0)
+                self.stats["early_exit"] += 1
+                return score
+        self.mask_complete = True
+        self.stats["full"] += 1
+        return score
+
+    def _pipeline(self, y0, y1):
+        """Roda blur -> threshold -> abertura nas linhas [y0, y1) direto na máscara."""
+        rows = slice(y0, y1)
+        cv2.GaussianBlur(self._diff[rows], self.blur_kernel_size, 0, dst=self._blur[rows])
+        self._lap("blur")
+        cv2.threshold(self._blur[rows], self.diff_threshold, 255, cv2.THRESH_BINARY, dst=self._thresh[rows])
+        self._lap("threshold")
+        cv2.morphologyEx(self._thresh[rows], cv2.MORPH_OPEN, self.kernel, dst=self._mask[rows])
+        self._lap("morph")
+        count = int(cv2.countNonZero(self._mask[rows]))
+        self._lap("count")
+        return count
+
+    def _band_pipeline(self, y0, y1):
+        """Processa a faixa [y0, y1) com margem e copia só as linhas internas para a máscara."""
+        a = max(0, y0 - self.halo)
+        b = min(self.shape[0], y1 + self.halo)
+        rows = slice(a, b)
+        band = self._band[:b - a]
+        cv2.GaussianBlur(self._diff[rows], self.blur_kernel_size, 0, dst=self._blur[rows])
+        self._lap("blur")
+        cv2.threshold(self._blur[rows], self.diff_threshold, 255, cv2.THRESH_BINARY, dst=self._thresh[rows])
+        self._lap("threshold")
+        cv2.morphologyEx(self._thresh[rows], cv2.MORPH_OPEN, self.kernel, dst=band)
+        core = band[y0 - a:y1 - a]
+        np.copyto(self._mask[y0:y1], core)
+        self._lap("morph")
+        count = int(cv2.countNonZero(core))
+        self._lap("count")
+        return count
+
+    def _lap(self, stage):
+        if self.timer is not None:
+            self.timer.lap(stage)
+
+    def _swap(self):
+        self._prev, self._curr = self._curr, self._prev
+        self.has_reference = True
@@ -0,0 +1,130 @@
+"""
+Agrupamento de detecções em eventos de movimento.
+
+Detecções consecutivas (separadas por menos que o período de silêncio)
+formam um único evento. Cada evento guarda apenas os melhores frames e
+eles são gravados uma única vez, quando o evento é encerrado.
+"""
+
+# Estratégias de seleção dos frames guardados
+KEEP_MODES = ("top_k", "first_peak_last")
+
+
+class MotionEvent:
+    """Um evento de movimento e os frames selecionados para gravação."""
+
+    def __init__(self, start, keep="top_k", top_k=3):
+        self.start = start
+        self.end = start
+        self.detections = 0
+        self.peak_score = 0
+        self.peak_threshold = None
+        self.zones = []       # Zonas que dispararam durante o evento (COMPARE_IMG com várias zonas)
+        self.keep = keep
+        self.top_k = max(1, int(top_k))
+        self._frames = []     # top_k: lista de (score, timestamp, frames)
+        self._slots = {}      # first_peak_last: nome -> (score, timestamp, frames)
+
+    def add(self, timestamp, score, materialize, threshold=None, zones=()):
+        """
+        Registra uma detecção.
+
+        Args:
+            timestamp: Instante da detecção (datetime)
+            score: Pixels alterados
+            materialize: Função sem argumentos que retorna os frames a guardar;
+                só é chamada quando o frame entra na seleção
+            threshold: Limiar com que o score foi comparado
+            zones: Nomes das zonas que dispararam
+        """
+        self.end = timestamp
+        self.detections += 1
+        is_peak = score > self.peak_score
+        if is_peak:
+            self.peak_score = score
+            self.peak_threshold = threshold
+        self.zones.extend(z for z in zones if z not in self.zones)
+
+        if self.keep == "top_k":
+            if len(self._frames) < self.top_k:
+                self._frames.append((score, timestamp, materialize()))
+            else:
+                weakest = min(range(len(self._frames)), key=lambda i: self._frames[i][0])
+                if score > self._frames[weakest][0]:
+                    self._frames[weakest] = (score, timestamp, materialize())
+            return
+
+        entry = (score, timestamp, materialize())
+        if "first" not in self._slots:
+            self._slots["first"] = entry
+        if is_peak:
+            self._slots["peak"] = entry
+        self._slots["last"] = entry
+
+    def selected(self):
+        """Frames selecionados em ordem cronológica, como (score, timestamp, frames)."""
+        if self.keep == "top_k":
+            entries = self._frames
+        else:
+            entries = list({id(e): e for e in self._slots.values()}.values())
+        return sorted(entries, key=lambda e: e[1])
+
+
+class EventTracker:
+    """
+    Máquina de estados dos eventos: aberto -> estendido -> encerrado.
+
+    Um evento é aberto na primeira detecção, estendido a cada nova detecção e
+    encerrado quando passam `quiet_period` segundos sem detecções.
+    """
+
+    def __init__(self, quiet_period=2.0, keep="top_k", top_k=3):
+        if keep not in KEEP_MODES:
+            raise ValueError(f"Modo de seleção de frames inválido: {keep}")
+        self.quiet_period = quiet_period
+        self.keep = keep
+        self.top_k = top_k
+        self.stats = {"opened": 0, "closed": 0, "detections": 0}
+        self._event = None
+        self._last_detection = None
+
+    @property
+    def active(self):
+        """Evento aberto no momento (ou None)."""
+        return self._event
+
+    def observe(self, now, timestamp, score, detected, materialize, threshold=None, zones=()):
+        """
+        Alimenta a máquina de estados com o resultado de um tick.
+
+        Args:
+            now: Instante monotônico do tick (s)
+            timestamp: Instante do tick (datetime), usado nos nomes dos arquivos
+            score: Pixels alterados no tick
+            detected: Se o score passou do limiar
+            materialize: Ver MotionEvent.add
+            threshold: Limiar com que o score foi comparado
+            zones: Nomes das zonas que dispararam no tick
+
+        Returns:
+            MotionEvent: O evento encerrado neste tick, ou None
+        """
+        if detected:
+            if self._event is None:
+                self._event = MotionEvent(timestamp, self.keep, self.top_k)
+                self.stats["opened"] += 1
+            self._event.add(timestamp, score, materialize, threshold, zones)
+            self._last_detection = now
+            self.stats["detections"] += 1
+            return None
+
+        if self._event is not None and now - self._last_detection >= self.quiet_period:
+            return self.close()
+        return None
+
+    def close(self):
+        """Encerra o evento aberto (se houver) e o retorna."""
+        event, self._event = self._event, None
+        if event is not None:
+            self.stats["closed"] += 1
+        return event
@@ -0,0 +1,214 @@
+"""
+Teste de carga local da API do MonitCam.
+
+Várias threads fazem requisições GET em sequência (conexões keep-alive,
+como o navegador) aos endpoints da API durante um tempo fixo, e o relatório
+traz requisições/s, latência (percentis) e erros por endpoint.
+
+Por padrão usa um servidor já rodando. Com --serve, sobe o servidor em um
+processo separado (SERVER_MODE de --mode), com uma fonte sintética no lugar
+da tela, e com --start-monitor o monitoramento roda durante o teste.
+
+Exemplos:
+    python loadtest.py --url http://127.0.0.1:5000
+    python loadtest.py --serve --start-monitor --duration 20 --concurrency 16
+    python loadtest.py --serve --mode development --start-monitor --json carga.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+import urllib.parse
+
+from metrics import percentile
+
+DEFAULT_PATHS = ("/get_status", "/get_config", "/sessions", "/metrics.json", "/metrics",
+                 "/events?limit=20", "/script.js")
+
+# Roda em um processo novo: o servidor com o MonitorManager sobre uma fonte sintética
+_SERVER_PROBE = """
+import main, server, sessions, sources
+main.monitor_manager = sessions.MonitorManager(
+    lambda: sources.SyntheticSource(size=%r, motion_probability=%r), events=main.monitor_events)
+server.run_server(port=%d, mode=%r, browser=False)
+"""
+
+
+def free_port():
+    """Uma porta TCP livre no 127.0.0.1."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, mode, size, motion):
+    """Sobe o servidor em um processo separado e espera ele responder."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable, "-c", _SERVER_PROBE % (size, motion, port, mode)], cwd=here,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"O servidor encerrou ao iniciar (código {process.returncode})")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("O servidor não respondeu em 30 s")
+
+
+def request(host, port, method, path, timeout=10):
+    """Uma requisição avulsa; retorna (status, corpo)."""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request(method, path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def client(host, port, paths, offset, deadline, samples, errors):
+    """Faz requisições em sequência até `deadline`, alternando entre `paths`."""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            status = None
+        elapsed = time.perf_counter() - started
+        # list.append é atômico: as listas são compartilhadas entre as threads sem lock
+        samples[path].append(elapsed)
+        if status is None or status >= 500:
+            errors[path].append(status)
+    conn.close()
+
+
+def run_load(host, port, paths, concurrency, duration, warmup=1.0):
+    """
+    Roda o teste de carga.
+
+    Returns:
+        dict: Por endpoint e no total: requisições, requisições/s, percentis
+        de latência (ms) e erros
+    """
+    for path in paths:  # Aquecimento: a primeira chamada de cada endpoint carrega módulos
+        request(host, port, "GET", path)
+    if warmup > 0:
+        time.sleep(warmup)
+    samples = {path: [] for path in paths}
+    errors = {path: [] for path in paths}
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [threading.Thread(target=client, args=(host, port, paths, n, deadline, samples, errors), daemon=True)
+               for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    def summarize(values, failures):
+        ordered = sorted(values)
+        stats = {"requests": len(ordered), "rps": round(len(ordered) / elapsed, 1), "errors": len(failures)}
+        if ordered:
+            for p in (50, 95, 99):
+                stats[f"p{p}_ms"] = round(percentile(ordered, p) * 1000, 2)
+            stats["max_ms"] = round(ordered[-1] * 1000, 2)
+        return stats
+
+    result = {"duration_s": round(elapsed, 2), "concurrency": concurrency,
+              "endpoints": {path: summarize(samples[path], errors[path]) for path in paths}}
+    result["total"] = summarize([v for path in paths for v in samples[path]],
+                                [e for path in paths for e in errors[path]])
+    return result
+
+
+def print_report(result):
+    print(f"\n{result['concurrency']} clientes por {result['duration_s']} s")
+    print(f"{'endpoint':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}{'erros':>7}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for path, s in rows:
+        print(f"{path:<22}{s['rps']:>9}{s.get('p50_ms', '-'):>9}{s.get('p95_ms', '-'):>9}"
+              f"{s.get('p99_ms', '-'):>9}{s.get('max_ms', '-'):>9}{s['errors']:>7}")
+
+
+def parse_size(text):
+    """Converte 'LxA' em (largura, altura)."""
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga local da API do MonitCam.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Servidor já rodando (sem --serve)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Sobe o servidor em um processo separado, com uma fonte sintética no lugar da tela")
+    parser.add_argument("--mode", default="production", choices=("production", "development"),
+                        help="SERVER_MODE do servidor de --serve")
+    parser.add_argument("--size", default="1280x720", help="Tamanho da tela sintética de --serve (LxA)")
+    parser.add_argument("--motion", type=float, default=0.0,
+                        help="Probabilidade de movimento por frame na fonte sintética (0: nada é gravado)")
+    parser.add_argument("--start-monitor", action="store_true", help="Inicia o monitoramento durante o teste")
+    parser.add_argument("--paths", default=",".join(DEFAULT_PATHS), help="Endpoints separados por vírgula")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultâneos")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duração (s)")
+    parser.add_argument("--json", help="Grava o resultado neste arquivo JSON")
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.serve:
+        host, port = "127.0.0.1", free_port()
+        process = start_server(port, args.mode, parse_size(args.size), args.motion)
+    else:
+        url = urllib.parse.urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    try:
+        if args.start_monitor:
+            status, body = request(host, port, "POST", "/start_monitor")
+            if status != 200 or not json.loads(body).get("success"):
+                print(f"Falha ao iniciar o monitoramento: {status} {body[:200]!r}", file=sys.stderr)
+                return 1
+        try:
+            result = run_load(host, port, args.paths.split(","), max(1, args.concurrency), args.duration)
+            # Status com as estatísticas do agendador ainda sob carga
+            status, body = request(host, port, "GET", "/get_status")
+            result["monitor"] = json.loads(body) if status == 200 else None
+            result["mode"] = args.mode if args.serve else None
+        finally:
+            if args.start_monitor:
+                request(host, port, "POST", "/stop_monitor")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+    print_report(result)
+    if result["monitor"] and result["monitor"].get("scheduler"):
+        s = result["monitor"]["scheduler"]
+        print(f"monitoramento: {s.get('achieved_fps')} FPS (alvo {s.get('target_fps')}), "
+              f"jitter {s.get('jitter_ms')} ms, {s.get('overruns')} atrasos")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
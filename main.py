@@ -1,21 +1,15 @@
-import cv2
-import numpy as np
-import pyautogui
-import time
-from datetime import datetime
 import os
 import sys
 import logging
-import traceback
 import json
 import threading
 
-# --- Tente usar o backend mss, se disponível ---
-try:
-    import mss
-    import mss.tools
-except ImportError:
-    mss = None
+# Só módulos leves aqui: cv2, numpy, mss e pyautogui (este exige um display)
+# são importados sob demanda, quando um monitoramento começa (ver get_manager)
+import broadcast
+import catalog
+
+DEFAULT_SESSION = "default"  # O mesmo de sessions.DEFAULT_SESSION
 
 # --- Configuração do Logging ---
 # (A configuração do arquivo de log será ajustada após carregar o config.json)
@@ -24,9 +18,10 @@ logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %
 
 # --- Variáveis Globais de Estado ---
 APP_CONFIG = {}
-monitor_thread = None
-monitor_stop_event = threading.Event()
-monitor_status = "stopped"  # Pode ser 'stopped', 'running', 'stopping', 'error'
+monitor_events = broadcast.Broadcaster()  # Status, detecções e métricas para a interface (SSE)
+monitor_manager = None  # sessions.MonitorManager, criado no primeiro início (ver get_manager)
+_manager_lock = threading.Lock()
+monitor_catalog = None  # catalog.Catalog das detecções (aberto sob demanda)
 
 # --- Carregamento da Configuração ---
 def load_settings():
@@ -44,6 +39,7 @@ def load_settings():
             file_handler = logging.FileHandler(log_file, encoding="utf-8")
             logging.getLogger().addHandler(file_handler)
         logging.info("Configuração carregada de config.json")
+        sync_sessions()
     except FileNotFoundError:
         logging.error("ERRO: O arquivo config.json não foi encontrado. A aplicação não pode iniciar.")
         sys.exit(1)
@@ -51,50 +47,28 @@ def load_settings():
         logging.error("ERRO: O arquivo config.json está mal formatado.")
         sys.exit(1)
 
+def ensure_settings():
+    """
+    Carrega o config.json se o APP_CONFIG ainda está vazio: as alterações
+    parciais (formulário, sessões) são mescladas à configuração salva.
+    """
+    if not APP_CONFIG and os.path.exists("config.json"):
+        load_settings()
+
 # Mantém a função load_config para compatibilidade interna
 def load_config():
     """Alias para load_settings() - mantém compatibilidade."""
     load_settings()
 
-def calculate_pixel_threshold(compare_region, sensitivity_percent):
-    """
-    Calcula o limiar de pixels baseado na área da região de comparação e no percentual de sensibilidade.
-    
-    Args:
-        compare_region: Tupla (x, y, w, h) da região de comparação
-        sensitivity_percent: Valor de 1 a 100, onde:
-            - 100% = detecta qualquer mudança (limiar próximo a 0)
-            - 1% = detecta apenas mudanças muito grandes (limiar próximo à área total)
-    
-    Returns:
-        int: Limiar de pixels para detecção
-    
-    Fórmula: T = A × (1 - (sensibilidade / 100))
-    """
-    _, _, w, h = compare_region
-    area = w * h
-    
-    # Garante que o percentual está entre 1 e 100
-    sensitivity_percent = max(1, min(100, sensitivity_percent))
-    
-    # Calcula o limiar: quanto maior a sensibilidade, menor o limiar
-    threshold = int(area * (1 - (sensitivity_percent / 100)))
-    
-    # Garante um mínimo de 1 pixel para evitar detecções espúrias em 100%
-    threshold = max(1, threshold)
-    
-    logging.info(f"Área da região: {area} pixels | Sensibilidade: {sensitivity_percent}% | Limiar calculado: {threshold} pixels")
-    
-    return threshold
-
 def save_config(new_config):
     """Salva a nova configuração no arquivo config.json."""
     global APP_CONFIG
     try:
-        with open("config.json", "w") as f:
-            json.dump(new_config, f, indent=2)
+        with open("config.json", "w", encoding="utf-8") as f:
+            json.dump(new_config, f, indent=2, ensure_ascii=False)
         APP_CONFIG = new_config
         logging.info("Configuração salva em config.json")
+        sync_sessions()
         return True
     except Exception as e:
         logging.error(f"Falha ao salvar a configuração: {e}")
@@ -102,168 +76,267 @@ def save_config(new_config):
 
 # --- Lógica de Captura e Monitoramento (Adaptada do original) ---
 
-def choose_backend():
-    if mss is not None:
-        logging.info("Backend escolhido: mss")
-        return "mss"
-    logging.info("Backend escolhido: pyautogui")
-    return "pyautogui"
-
-def clamp_region_to_screen(region):
-    screen_w, screen_h = pyautogui.size()
-    left, top, w, h = region
-    left = max(0, int(left))
-    top = max(0, int(top))
-    w = max(1, int(min(w, screen_w - left)))
-    h = max(1, int(min(h, screen_h - top)))
-    return (left, top, w, h)
-
-def capture_frame(region, backend):
-    left, top, w, h = clamp_region_to_screen(region)
+def clamp_region_to_screen(region, session=None):
+    """Ajusta a região à tela; usa a geometria em cache da sessão quando informada."""
+    if session is not None:
+        return session.clamp(region)
+    import capture
+    import pyautogui  # Importado sob demanda: exige um display disponível
+    return capture.clamp_region(region, pyautogui.size())
+
+def capture_frame(region, backend, out=None):
+    """
+    Captura a região em escala de cinza usando a sessão `backend`.
+
+    Em caso de falha retorna None: um frame preto no lugar pareceria um
+    movimento enorme na comparação com o frame seguinte.
+    """
+    region = clamp_region_to_screen(region, backend)
     try:
-        if backend == "mss" and mss is not None:
-            with mss.mss() as sct:
-                monitor = {"left": left, "top": top, "width": w, "height": h}
-                img = sct.grab(monitor)
-                frame = np.array(img)
-                return cv2.cvtColor(frame[..., :3], cv2.COLOR_BGR2GRAY)
-        else:
-            shot = pyautogui.screenshot(region=(left, top, w, h))
-            frame = np.array(shot)
-            return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        return backend.grab_gray(region, out)
     except Exception as e:
-        logging.error(f"Falha ao capturar frame com backend '{backend}': {e}")
-    return np.zeros((h, w), dtype=np.uint8)
+        logging.error(f"Falha ao capturar frame com backend '{backend.name}': {e}")
+    return None
 
-def run_monitor(config, stop_event):
+def run_monitor(config, stop_event, source=None):
     """
-    Função principal de monitoramento, projetada para rodar em uma thread.
-    
-    Configurações técnicas fixas otimizadas:
+    Executa uma única sessão de monitoramento na thread atual até `stop_event`.
+
+    `source` permite trocar a tela por outra fonte de frames (ver sources.py);
+    quando a fonte termina, o monitoramento é encerrado normalmente.
+
+    A detecção usa as configurações técnicas fixas de detector.py:
     - DIFF_THRESHOLD: 25 (sensibilidade de diferença de pixel)
     - BLUR_KERNEL_SIZE: (5, 5) (redução de ruído)
     - MORPH_KERNEL: (3, 3) (remoção de falsos positivos)
+
+    Returns:
+        sessions.MonitorSession: A sessão executada (status e métricas finais)
     """
-    global monitor_status
-    monitor_status = "running"
-    logging.info("Thread de monitoramento iniciada.")
-    
-    # Configurações técnicas fixas otimizadas para a maioria dos cenários
-    DIFF_THRESHOLD = 25
-    BLUR_KERNEL_SIZE = (5, 5)
-    MORPH_KERNEL = (3, 3)
+    import capture
+    import sessions
+    factory = (lambda: source) if source is not None else capture.open_session
+    manager = sessions.MonitorManager(factory, events=monitor_events)
+    session = manager.add(DEFAULT_SESSION, config)
+    session.mark_starting()
+    manager.run(stop_event)
+    return session
+
+# --- Sessões ---
+def get_manager():
+    """
+    MonitorManager das sessões. É criado no primeiro uso, e só então os
+    módulos de captura e visão (cv2, numpy...) são importados.
+    """
+    global monitor_manager
+    with _manager_lock:
+        if monitor_manager is None:
+            import sessions
+            monitor_manager = sessions.MonitorManager(events=monitor_events)
+        return monitor_manager
+
+def get_session(session_id):
+    """Sessão `session_id` do MonitorManager, ou None (também se ele ainda não existe)."""
+    manager = monitor_manager
+    return manager.get(session_id) if manager is not None else None
 
+def validate_session_config(config):
+    """Valida a configuração de uma sessão (ValueError se inválida)."""
+    import sessions  # Validação usa as opções dos módulos de captura e gravação
+    sessions.validate_config(config)
+
+def session_config(session_id, config=None):
+    """
+    Configuração efetiva de uma sessão.
+
+    A sessão padrão usa o config.json; as demais, definidas em SESSIONS
+    ({id: {chave: valor}}), herdam dele o que não sobrescrevem e, sem
+    CAPTURE_DIR próprio, gravam em {CAPTURE_DIR}/{id}.
+
+    Returns:
+        dict: Configuração da sessão ou None se ela não existir
+    """
+    config = APP_CONFIG if config is None else config
+    base = {k: v for k, v in config.items() if k != "SESSIONS"}
+    if session_id == DEFAULT_SESSION:
+        return base
+    overrides = config.get("SESSIONS", {}).get(session_id)
+    if overrides is None:
+        return None
+    merged = dict(base)
+    merged["CAPTURE_DIR"] = os.path.join(base.get("CAPTURE_DIR", "captures"), session_id)
+    merged.update(overrides)
+    return merged
+
+def session_ids():
+    """Ids das sessões configuradas (a padrão primeiro)."""
+    return [DEFAULT_SESSION] + [i for i in APP_CONFIG.get("SESSIONS", {}) if i != DEFAULT_SESSION]
+
+def sync_sessions():
+    """
+    Aplica o APP_CONFIG às sessões (as ativas trocam de configuração no
+    próximo tick) e remove as paradas que saíram de SESSIONS.
+
+    Antes do primeiro início não há sessões criadas e nada a fazer.
+    """
+    manager = monitor_manager
+    if manager is None:
+        return
+    ids = session_ids()
+    for session_id in ids:
+        try:
+            manager.reconfigure(session_id, session_config(session_id))
+        except ValueError as e:
+            logging.error(f"Configuração da sessão '{session_id}' inválida; mantida a anterior: {e}")
+    for session_id in list(manager.sessions):
+        session = manager.get(session_id)
+        if session_id not in ids and not session.active:
+            manager.remove(session_id)
+
+def list_sessions():
+    """Status de todas as sessões."""
+    return [get_monitor_status(session_id) for session_id in session_ids()]
+
+def save_session(session_id, overrides):
+    """Cria ou altera uma sessão adicional (SESSIONS no config.json)."""
+    if session_id == DEFAULT_SESSION:
+        return {"success": False, "message": "A sessão padrão é configurada por /save_config."}
+    ensure_settings()
+    new_config = dict(APP_CONFIG)
+    new_config["SESSIONS"] = dict(APP_CONFIG.get("SESSIONS", {}))
+    new_config["SESSIONS"][session_id] = overrides
     try:
-        backend = choose_backend()
-        cap_region = clamp_region_to_screen(config["CAPTURE_IMG"])
-        cmp_region = clamp_region_to_screen(config["COMPARE_IMG"])
-        
-        # Calcula o limiar de pixels baseado no percentual de sensibilidade
-        pixel_threshold = calculate_pixel_threshold(cmp_region, config["SENSIBILIDADE"])
-        
-        logging.info("Usando CAPTURE_IMG=%s COMPARE_IMG=%s sensitivity=%d%% (limiar=%d pixels) interval=%.3f",
-                     cap_region, cmp_region, config["SENSIBILIDADE"], pixel_threshold, config["INTERVAL"])
-
-        ultimo_cmp = capture_frame(cmp_region, backend)
-        
-        while not stop_event.is_set():
-            frame_A = capture_frame(cap_region, backend)
-            frame_B = capture_frame(cmp_region, backend)
-
-            diferenca = cv2.absdiff(ultimo_cmp, frame_B)
-            diferenca_blur = cv2.GaussianBlur(diferenca, BLUR_KERNEL_SIZE, 0)
-            _, diferenca_thresh = cv2.threshold(diferenca_blur, DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
-            
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, MORPH_KERNEL)
-            diferenca_thresh = cv2.morphologyEx(diferenca_thresh, cv2.MORPH_OPEN, kernel)
-            score = int(cv2.countNonZero(diferenca_thresh))
-
-            if score > pixel_threshold:
-                horario = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                logging.info(f"Movimento detectado! score={score} -> salvando...")
-                
-                os.makedirs(config["CAPTURE_DIR"], exist_ok=True)
-                arquivoA = os.path.join(config["CAPTURE_DIR"], f"{config['FILENAME_PREFIX']}_{horario}_A.png")
-                cv2.imwrite(arquivoA, frame_A)
-
-                if config["SAVE_COMPARE_IMG"]:
-                    arquivoB = os.path.join(config["CAPTURE_DIR"], f"{config['FILENAME_PREFIX']}_{horario}_B.png")
-                    cv2.imwrite(arquivoB, frame_B)
-
-                ultimo_cmp = frame_B
-                stop_event.wait(config["INTERVAL"] * 2)
-            else:
-                ultimo_cmp = frame_B
-                stop_event.wait(config["INTERVAL"])
+        validate_session_config(session_config(session_id, new_config))
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    if save_config(new_config):
+        return {"success": True, "message": f"Sessão '{session_id}' salva."}
+    return {"success": False, "message": "Falha ao salvar a configuração."}
 
-    except Exception as e:
-        monitor_status = "error"
-        logging.error(f"Erro fatal na thread de monitoramento: {e}")
-        with open(APP_CONFIG.get("ERROR_LOG_FILE", "monitcam_error.log"), "a", encoding="utf-8") as f:
-            f.write(f"{datetime.now().isoformat()} - Exception:\n")
-            traceback.print_exc(file=f)
-            f.write("\n")
-    finally:
-        if monitor_status != "error":
-            monitor_status = "stopped"
-        logging.info("Thread de monitoramento finalizada.")
+def delete_session(session_id):
+    """Remove uma sessão adicional parada."""
+    ensure_settings()
+    if session_id not in APP_CONFIG.get("SESSIONS", {}):
+        return {"success": False, "message": f"Sessão '{session_id}' não encontrada."}
+    session = get_session(session_id)
+    if session is not None and session.active:
+        return {"success": False, "message": "Pare a sessão antes de removê-la."}
+    new_config = dict(APP_CONFIG)
+    new_config["SESSIONS"] = {k: v for k, v in APP_CONFIG["SESSIONS"].items() if k != session_id}
+    if save_config(new_config):
+        return {"success": True, "message": f"Sessão '{session_id}' removida."}
+    return {"success": False, "message": "Falha ao salvar a configuração."}
+
+# --- Catálogo de Detecções ---
+def get_catalog():
+    """Abre (uma única vez) o catálogo em CATALOG_PATH; None se CATALOG_ENABLED for falso."""
+    global monitor_catalog
+    if monitor_catalog is None and APP_CONFIG.get("CATALOG_ENABLED", True):
+        monitor_catalog = catalog.Catalog(APP_CONFIG.get("CATALOG_PATH", "monitcam_catalog.db"))
+    return monitor_catalog
+
+def list_events(since=None, until=None, session=None, cursor=None, limit=catalog.PAGE_SIZE):
+    """
+    Página de detecções do catálogo, da mais recente para a mais antiga.
+
+    Returns:
+        dict: {"events": [...], "next_cursor": str ou None}
+    """
+    events_catalog = get_catalog()
+    if events_catalog is None:
+        return {"events": [], "next_cursor": None}
+    events, next_cursor = events_catalog.query(since, until, session, cursor, limit)
+    for event in events:
+        event["files"] = [os.path.basename(p) for p in event["files"]]
+        event["thumbnail"] = f"/events/{event['id']}/thumbnail"
+    return {"events": events, "next_cursor": next_cursor}
+
+def get_thumbnail(event_id, width=catalog.THUMBNAIL_WIDTH):
+    """Caminho da miniatura de uma detecção (gerada sob demanda) ou None."""
+    events_catalog = get_catalog()
+    if events_catalog is None:
+        return None
+    return events_catalog.thumbnail(event_id, width)
 
 # --- Funções de Controle de Monitoramento ---
-def start_monitoring():
-    """Inicia o monitoramento."""
-    global monitor_thread, monitor_stop_event, monitor_status
-    
-    if monitor_thread is not None and monitor_thread.is_alive():
+def start_monitoring(session_id=DEFAULT_SESSION):
+    """Inicia o monitoramento de uma sessão."""
+    config = session_config(session_id)
+    if config is None:
+        return {"success": False, "message": f"Sessão '{session_id}' não encontrada."}
+
+    session = get_session(session_id)
+    if session is not None and session.active:
         logging.warning("O monitoramento já está em execução.")
         return {"success": False, "message": "O monitoramento já está em execução."}
 
-    monitor_stop_event.clear()
-    monitor_thread = threading.Thread(target=run_monitor, args=(APP_CONFIG, monitor_stop_event))
-    monitor_thread.start()
-    logging.info("Monitoramento iniciado.")
+    manager = get_manager()
+    manager.catalog = get_catalog()
+    manager.add(session_id, config)
+    manager.start(session_id)
+    logging.info("Monitoramento iniciado (sessão '%s').", session_id)
     return {"success": True, "message": "Monitoramento iniciado."}
 
-def stop_monitoring():
-    """Para o monitoramento."""
-    global monitor_thread, monitor_status
-    
-    if monitor_thread is None or not monitor_thread.is_alive():
-        monitor_status = "stopped"
+def stop_monitoring(session_id=DEFAULT_SESSION):
+    """Para o monitoramento de uma sessão."""
+    session = get_session(session_id)
+    if session is None or not session.active:
         logging.warning("O monitoramento não está em execução.")
         return {"success": False, "message": "O monitoramento não está em execução."}
 
-    logging.info("Parando o monitoramento...")
-    monitor_status = "stopping"
-    monitor_stop_event.set()
-    
-    # Aguarda a thread terminar
-    monitor_thread.join(timeout=APP_CONFIG.get("INTERVAL", 1) * 3) 
-    
-    if monitor_thread.is_alive():
-        logging.warning("A thread de monitoramento não parou a tempo.")
-        monitor_status = "stopped"  # Marca como parado mesmo assim
-        monitor_thread = None
+    logging.info("Parando o monitoramento (sessão '%s')...", session_id)
+    # Aguarda a thread de captura encerrar a sessão
+    if not monitor_manager.stop(session_id, timeout=session.config.get("INTERVAL", 1) * 3):
+        logging.warning("A sessão '%s' não parou a tempo.", session_id)
         return {"success": False, "message": "A thread não respondeu ao comando de parada."}
 
-    monitor_thread = None
-    monitor_status = "stopped"
     logging.info("Monitoramento parado com sucesso.")
     return {"success": True, "message": "Monitoramento parado."}
 
-def get_monitor_status():
-    """Retorna o status atual do monitoramento."""
-    return {"status": monitor_status}
+def get_monitor_status(session_id=DEFAULT_SESSION):
+    """Retorna o status atual do monitoramento de uma sessão."""
+    session = get_session(session_id)
+    if session is None:
+        return {"session": session_id, "status": "stopped"}
+    return session.snapshot()
+
+def get_heatmap(session_id=DEFAULT_SESSION):
+    """Mapa de calor por bloco da região de comparação de uma sessão, ou None."""
+    session = get_session(session_id)
+    return session.heatmap_snapshot() if session is not None else None
+
+def get_metrics_text():
+    """Métricas de todas as sessões no formato de texto do Prometheus."""
+    return monitor_manager.render_prometheus() if monitor_manager is not None else ""
+
+def get_metrics_snapshot():
+    """Métricas de todas as sessões como dicionário (JSON), por id de sessão."""
+    return monitor_manager.metrics_snapshot() if monitor_manager is not None else {}
 
 def get_config():
     """Retorna a configuração atual."""
     return APP_CONFIG
 
-def update_config(new_config):
-    """Atualiza a configuração."""
-    if monitor_status == 'running':
-        return {"success": False, "message": "Pare o monitoramento antes de alterar a configuração."}
-    
+def update_config(changes):
+    """
+    Mescla `changes` (ex.: os campos do formulário da interface) ao
+    APP_CONFIG, valida e salva. As chaves ausentes (SESSIONS, opções sem
+    campo no formulário) são mantidas. Sessões em execução passam a usar a
+    configuração no próximo tick, sem parar (o frame de referência só é
+    refeito se a geometria mudou).
+    """
+    ensure_settings()
+    new_config = dict(APP_CONFIG, **changes)
+    ids = [DEFAULT_SESSION] + [i for i in new_config.get("SESSIONS", {}) if i != DEFAULT_SESSION]
+    try:
+        for session_id in ids:
+            validate_session_config(session_config(session_id, new_config))
+    except ValueError as e:
+        message = str(e) if session_id == DEFAULT_SESSION else f"Sessão '{session_id}': {e}"
+        return {"success": False, "message": message}
+
     if save_config(new_config):
-        return {"success": True, "message": "Configuração salva."}
+        return {"success": True, "message": "Configuração salva.",
+                "versions": {i: get_session(i).latest_config_version for i in ids if get_session(i)}}
     else:
-        return {"success": False, "message": "Falha ao salvar a configuração."}
\ No newline at end of file
+        return {"success": False, "message": "Falha ao salvar a configuração."}
@@ -0,0 +1,215 @@
+"""
+Máscaras de exclusão e grade de blocos da região de comparação.
+
+Relógios, cursores piscando e letreiros dentro de COMPARE_IMG geram
+detecções falsas o tempo todo. As áreas ignoradas vêm de retângulos em
+coordenadas de tela (EXCLUDE_IMG) e/ou de uma imagem do tamanho da região
+de comparação (EXCLUDE_MASK, branco = ignorado).
+
+A região é dividida em blocos de MASK_TILE_SIZE pixels: os blocos
+totalmente ignorados ficam fora do pipeline de diferença, os parcialmente
+ignorados são mascarados no lugar e o limiar usa só a área que sobra. O
+TileHeatmap acumula a mudança de cada bloco ao longo do tempo, para mostrar
+onde uma máscara é necessária.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+TILE_SIZE = 32  # Lado (px na resolução original) dos blocos da grade
+
+
+def load_mask_image(path, size):
+    """
+    Lê a imagem de EXCLUDE_MASK já no tamanho (largura, altura) da região.
+
+    Returns:
+        np.ndarray: Máscara booleana (altura, largura), True = ignorado
+    """
+    # np.fromfile + imdecode também funciona com caminhos não-ASCII no Windows
+    image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Não foi possível ler a máscara de exclusão '{path}'")
+    if image.shape != (size[1], size[0]):
+        image = cv2.resize(image, tuple(size), interpolation=cv2.INTER_NEAREST)
+    return image > 127
+
+
+def exclusion_mask(region, rects=(), image_path=None):
+    """
+    Pixels ignorados da região de comparação.
+
+    Args:
+        region: Região (x, y, w, h) de comparação na tela
+        rects: Retângulos [x, y, w, h] ignorados, em coordenadas de tela
+        image_path: Imagem de exclusão (branco = ignorado) da região inteira
+
+    Returns:
+        np.ndarray: Máscara booleana (h, w), True = ignorado, ou None se
+        nada da região é ignorado
+    """
+    x, y, w, h = region
+    excluded = load_mask_image(image_path, (w, h)) if image_path else np.zeros((h, w), dtype=bool)
+    for rx, ry, rw, rh in rects or ():
+        x0, y0 = max(0, rx - x), max(0, ry - y)
+        x1, y1 = min(w, rx + rw - x), min(h, ry + rh - y)
+        if x1 > x0 and y1 > y0:
+            excluded[y0:y1, x0:x1] = True
+    return excluded if excluded.any() else None
+
+
+def exclusion_key(config):
+    """Chave das opções de exclusão (muda quando a máscara precisa ser refeita)."""
+    path = config.get("EXCLUDE_MASK")
+    mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+    rects = tuple(tuple(r) for r in config.get("EXCLUDE_IMG") or ())
+    return rects, path, mtime, config.get("MASK_TILE_SIZE", TILE_SIZE)
+
+
+def unmasked_area(excluded, region=None, origin=None):
+    """
+    Pixels não ignorados de `region` (padrão: a região inteira da máscara).
+
+    Args:
+        excluded: Máscara de `exclusion_mask` (ou None)
+        region: Sub-região (x, y, w, h) em coordenadas de tela
+        origin: Região (x, y, w, h) que a máscara cobre
+    """
+    if region is None:
+        return excluded.size - int(np.count_nonzero(excluded))
+    x, y, w, h = region
+    if excluded is None:
+        return w * h
+    view = excluded[y - origin[1]:y - origin[1] + h, x - origin[0]:x - origin[0] + w]
+    return w * h - int(np.count_nonzero(view))
+
+
+def keep_mask(excluded, shape):
+    """
+    Máscara 0/255 dos pixels mantidos na escala da detecção (altura, largura) `shape`.
+
+    Na redução, um pixel da detecção é mantido se a maior parte dos pixels
+    originais que ele cobre não é ignorada.
+    """
+    keep = np.where(excluded, 0, 255).astype(np.uint8)
+    if keep.shape != tuple(shape):
+        keep = cv2.resize(keep, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+        cv2.threshold(keep, 127, 255, cv2.THRESH_BINARY, dst=keep)
+    return keep
+
+
+def detection_tile(tile_size, scale):
+    """Lado do bloco na escala da detecção."""
+    return max(1, int(round(tile_size * scale)))
+
+
+def tile_edges(length, tile):
+    """Bordas dos blocos ao longo de um eixo: 0, tile, 2·tile, ..., length."""
+    return np.append(np.arange(0, length, tile), length)
+
+
+def tile_coverage(keep, tile):
+    """
+    Fração mantida (não ignorada) de cada bloco.
+
+    Args:
+        keep: Máscara 0/255 dos pixels mantidos, na escala da detecção
+        tile: Lado do bloco na escala da detecção
+    """
+    ys, xs = tile_edges(keep.shape[0], tile), tile_edges(keep.shape[1], tile)
+    s = cv2.integral(keep, sdepth=cv2.CV_64F)[np.ix_(ys, xs)]
+    sums = s[1:, 1:] - s[:-1, 1:] - s[1:, :-1] + s[:-1, :-1]
+    areas = np.outer(np.diff(ys), np.diff(xs)) * 255
+    return sums / areas
+
+
+def active_rects(coverage, tile, shape, max_rows=None):
+    """
+    Retângulos (y0, y1, x0, x1) que cobrem os blocos não totalmente ignorados.
+
+    Em cada linha de blocos, os blocos ativos consecutivos formam um
+    retângulo; retângulos de linhas seguidas com as mesmas colunas são
+    unidos (até `max_rows` linhas de pixels, a granularidade da parada
+    antecipada).
+    """
+    height, width = shape
+    rects = []
+    open_rects = {}  # (x0, x1) -> índice em rects do retângulo que pode crescer
+    for row, active in enumerate(coverage > 0):
+        y0, y1 = row * tile, min(height, (row + 1) * tile)
+        spans = []
+        col = 0
+        while col < len(active):
+            if not active[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(active) and active[col]:
+                col += 1
+            spans.append((start * tile, min(width, col * tile)))
+        grown = {}
+        for span in spans:
+            i = open_rects.get(span)
+            if i is not None and rects[i][1] == y0 and (max_rows is None or y1 - rects[i][0] <= max_rows):
+                rects[i] = (rects[i][0], y1) + span
+            else:
+                i = len(rects)
+                rects.append((y0, y1) + span)
+            grown[span] = i
+        open_rects = grown
+    return rects
+
+
+class TileHeatmap:
+    """
+    Mudança acumulada por bloco da região de comparação.
+
+    Para cada bloco conta os ticks em que algum pixel mudou e o total de
+    pixels alterados (na resolução original), a partir da máscara do
+    detector; a soma de cada bloco sai da imagem integral da máscara.
+    """
+
+    def __init__(self, shape, tile, pixel_scale=1.0, coverage=None):
+        """
+        Args:
+            shape: (altura, largura) da máscara (escala da detecção)
+            tile: Lado do bloco na escala da detecção
+            pixel_scale: Pixels originais por pixel da máscara
+            coverage: Fração mantida de cada bloco (`tile_coverage`), se houver exclusão
+        """
+        h, w = shape
+        self._ys, self._xs = tile_edges(h, tile), tile_edges(w, tile)
+        self.pixel_scale = pixel_scale
+        self.coverage = coverage
+        # A soma da máscara (0/255) cabe em int32 até ~8,4 milhões de pixels
+        self._sdepth = cv2.CV_32S if h * w * 255 < 2 ** 31 else cv2.CV_64F
+        self._integral = np.zeros((h + 1, w + 1), dtype=np.int32 if self._sdepth == cv2.CV_32S else np.float64)
+        shape = (len(self._ys) - 1, len(self._xs) - 1)
+        self.ticks = 0
+        self.changed = np.zeros(shape, dtype=np.int64)
+        self.pixels = np.zeros(shape, dtype=np.float64)
+
+    def add(self, mask, score=None):
+        """
+        Soma a máscara de um tick (`score` 0 pula a integral: nada mudou).
+
+        Num tick com parada antecipada só entra a parte da região processada
+        até a parada (o detector zera o resto da máscara).
+        """
+        self.ticks += 1
+        if score == 0:
+            return
+        s = cv2.integral(mask, sum=self._integral, sdepth=self._sdepth)[np.ix_(self._ys, self._xs)]
+        counts = (s[1:, 1:] - s[:-1, 1:] - s[1:, :-1] + s[:-1, :-1]) / 255
+        self.changed += counts > 0
+        self.pixels += counts * self.pixel_scale
+
+    def snapshot(self):
+        """Grade para a API: ticks com mudança e pixels alterados por bloco, e a fração ignorada."""
+        data = {"rows": self.changed.shape[0], "cols": self.changed.shape[1], "ticks": self.ticks,
+                "changed": self.changed.tolist(), "pixels": np.rint(self.pixels).astype(np.int64).tolist()}
+        if self.coverage is not None:
+            data["excluded"] = np.round(1 - self.coverage, 2).tolist()
+        return data
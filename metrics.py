@@ -0,0 +1,285 @@
+"""
+Medições de desempenho do MonitCam.
+
+StageTimer é usado nos benchmarks; Registry/MonitorMetrics mantêm contadores
+e histogramas baratos o suficiente para ficarem sempre ligados no
+monitoramento, expostos pelo servidor em /metrics.
+"""
+
+import time
+import bisect
+import threading
+
+
+def percentile(sorted_values, p):
+    """Percentil `p` (0-100) de uma lista já ordenada, por interpolação linear."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class StageTimer:
+    """
+    Cronômetro por estágio de um frame.
+
+    Uso: `start()` no início do frame, `lap(estágio)` ao fim de cada
+    estágio (estágios repetidos no mesmo frame são somados) e `stop()`
+    para registrar as durações do frame.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.samples = {}
+        self._current = {}
+        self._last = None
+
+    def start(self):
+        self._current.clear()
+        self._last = self.clock()
+
+    def lap(self, stage):
+        now = self.clock()
+        self._current[stage] = self._current.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def stop(self):
+        for stage, seconds in self._current.items():
+            self.samples.setdefault(stage, []).append(seconds)
+        self._current.clear()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """Retorna {estágio: {'count': n, 'p50_ms': ..., ...}}."""
+        result = {}
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            stats = {"count": len(ordered)}
+            for p in percentiles:
+                stats[f"p{p}_ms"] = round(percentile(ordered, p) * 1000, 3)
+            result[stage] = stats
+        return result
+
+
+# --- Métricas de execução (formato Prometheus) ---
+
+# Limites (s) dos histogramas de latência
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    """Contador monotônico."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Gauge:
+    """Valor instantâneo; pode ser definido com `set` ou lido de uma função."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self._fn = fn
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        if self._fn is not None:
+            try:
+                return self._fn()
+            except Exception:
+                return 0
+        return self._value
+
+
+class Histogram:
+    """Histograma de buckets fixos (observe é O(log n) e não aloca)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def _state(self):
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def quantile(self, q, counts=None, count=None):
+        """Estimativa do quantil `q` (0-1) pelo limite superior do bucket."""
+        if counts is None:
+            counts, _, count = self._state()
+        if not count:
+            return 0.0
+        target = q * count
+        acc = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            acc += n
+            if acc >= target:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+    def summary(self):
+        counts, total, count = self._state()
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(self.quantile(0.5, counts, count) * 1000, 3),
+            "p90_ms": round(self.quantile(0.9, counts, count) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99, counts, count) * 1000, 3),
+        }
+
+
+class Registry:
+    """Conjunto de métricas exportável como texto Prometheus ou JSON."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def gauge(self, name, help_text, fn=None):
+        return self._add(Gauge(name, help_text, fn))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render_prometheus(self):
+        """Formato de exposição em texto do Prometheus (versão 0.0.4)."""
+        return render_prometheus([({}, self)])
+
+    def snapshot(self):
+        """Resumo em dicionário (histogramas como contagem, média e percentis)."""
+        result = {}
+        for m in self._metrics:
+            result[m.name] = m.summary() if m.kind == "histogram" else m.value
+        return result
+
+
+def _escape_label(value):
+    """Escapa um valor de rótulo como pede o formato de texto do Prometheus (\\, " e quebra de linha)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus(registries):
+    """
+    Exporta vários registros com as mesmas métricas em um único texto
+    Prometheus (versão 0.0.4), diferenciando-os por rótulos.
+
+    Args:
+        registries: Lista de (rótulos, Registry), ex.: [({"session": "default"}, m)]
+    """
+    families = {}
+    for labels, registry in registries:
+        for m in registry._metrics:
+            families.setdefault(m.name, []).append((labels, m))
+    lines = []
+    for name, entries in families.items():
+        lines.append(f"# HELP {name} {entries[0][1].help}")
+        lines.append(f"# TYPE {name} {entries[0][1].kind}")
+        for labels, m in entries:
+            if m.kind == "histogram":
+                counts, total, count = m._state()
+                acc = 0
+                for bound, n in zip(m.buckets, counts):
+                    acc += n
+                    lines.append(f"{name}_bucket{_labels(labels, le=f'{bound:g}')} {acc}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {m.value}")
+    return "\n".join(lines) + "\n"
+
+
+class MonitorMetrics(Registry):
+    """
+    Métricas do loop de monitoramento.
+
+    Os objetos da execução atual (agendador, gravador, detector) são
+    associados com `bind` e lidos apenas quando as métricas são consultadas.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._bound = {}
+        self.ticks = self.counter("monitcam_ticks_total", "Ticks do loop de monitoramento")
+        self.detections = self.counter("monitcam_detections_total", "Ticks com movimento detectado")
+        self.skipped = self.counter("monitcam_skipped_ticks_total", "Ticks descartados por falha de captura")
+        self.errors = self.counter("monitcam_errors_total", "Falhas fatais da sessão (cada uma agenda um reinício)")
+        self.restarts = self.counter("monitcam_restarts_total", "Reinícios da sessão após falhas")
+        self.capture_seconds = self.histogram("monitcam_capture_seconds", "Tempo de captura da tela por tick")
+        self.detect_seconds = self.histogram("monitcam_detect_seconds", "Tempo do pipeline de diferença por tick")
+        self.encode_seconds = self.histogram("monitcam_encode_seconds", "Tempo de codificação de uma imagem")
+        self.write_seconds = self.histogram("monitcam_write_seconds", "Tempo de escrita de uma imagem em disco")
+        self.gauge("monitcam_scheduler_overruns", "Ticks que passaram do prazo na execução atual",
+                   lambda: self._read("scheduler", lambda s: s.overruns))
+        self.gauge("monitcam_achieved_fps", "Taxa de ticks medida na execução atual",
+                   lambda: self._read("scheduler", lambda s: s.snapshot()["achieved_fps"]))
+        self.gauge("monitcam_writer_queue_depth", "Itens aguardando gravação",
+                   lambda: self._read("writer", lambda w: w.stats["pending"]))
+        self.gauge("monitcam_writer_dropped", "Capturas descartadas pela fila na execução atual",
+                   lambda: self._read("writer", lambda w: w.stats["dropped"]))
+        self.gauge("monitcam_detector_unchanged", "Ticks encerrados no estágio 1 da cascata na execução atual",
+                   lambda: self._read("detector", lambda d: d.stats["unchanged"]))
+        self.gauge("monitcam_detector_early_exit", "Ticks encerrados no estágio 2 da cascata na execução atual",
+                   lambda: self._read("detector", lambda d: d.stats["early_exit"]))
+        self.gauge("monitcam_duplicates_skipped", "Capturas quase idênticas não gravadas na execução atual",
+                   lambda: self._read("dedupe", lambda f: f.stats["skipped"]))
+        self.gauge("monitcam_storage_bytes", "Bytes ocupados pelas capturas no diretório da sessão",
+                   lambda: self._read("retention", lambda r: r.stats["bytes"]))
+        self.gauge("monitcam_storage_freed_bytes", "Bytes liberados pela retenção na execução atual",
+                   lambda: self._read("retention", lambda r: r.stats["freed_bytes"]))
+
+    def bind(self, name, obj):
+        """Associa (ou remove, com None) um objeto da execução atual."""
+        self._bound[name] = obj
+
+    def _read(self, name, getter):
+        obj = self._bound.get(name)
+        return getter(obj) if obj is not None else 0
@@ -0,0 +1,106 @@
+"""
+Pré-visualização ao vivo (MJPEG) do monitoramento.
+
+A thread de monitoramento publica no PreviewHub os frames que já capturou
+(nenhuma captura extra é feita), e só quando há alguém assistindo, limitado
+a `max_fps`. Cada frame é codificado em JPEG no máximo uma vez por visão,
+sob demanda, na thread do primeiro espectador que o pedir.
+"""
+
+import time
+import threading
+
+import cv2
+import numpy as np
+
+VIEWS = ("a", "b", "overlay")
+
+
+class PreviewHub:
+    """Slot compartilhado com o frame mais recente e cache de JPEGs por visão."""
+
+    def __init__(self, max_fps=5.0, quality=70):
+        self.configure(max_fps, quality)
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+        self._viewers = 0
+        self._seq = 0
+        self._frames = None
+        self._last_publish = 0.0
+        self._cache = {}  # visão -> (seq, jpeg)
+
+    def configure(self, max_fps=None, quality=None):
+        """Atualiza o limite de quadros publicados por segundo e a qualidade do JPEG."""
+        if max_fps is not None:
+            self.max_fps = max(0.1, float(max_fps))
+        if quality is not None:
+            self.quality = int(quality)
+
+    @property
+    def viewers(self):
+        return self._viewers
+
+    def add_viewer(self):
+        with self._cond:
+            self._viewers += 1
+
+    def remove_viewer(self):
+        with self._cond:
+            self._viewers -= 1
+
+    def wants_frame(self):
+        """Indica se vale a pena publicar o tick atual (há espectadores e o limite permite)."""
+        return self._viewers > 0 and time.monotonic() - self._last_publish >= 1.0 / self.max_fps
+
+    def publish(self, frame_A, frame_B, mask=None):
+        """
+        Publica os frames do tick atual.
+
+        Os arrays são copiados, pois o monitoramento reutiliza seus buffers;
+        isso só acontece quando `wants_frame()` é verdadeiro.
+        """
+        frames = (frame_A.copy(), frame_B.copy(), None if mask is None else mask.copy())
+        with self._cond:
+            self._frames = frames
+            self._seq += 1
+            self._last_publish = time.monotonic()
+            self._cond.notify_all()
+
+    def wait_jpeg(self, view, after_seq, timeout=None):
+        """
+        Aguarda um frame mais novo que `after_seq` e o retorna codificado.
+
+        Returns:
+            tuple: (seq, bytes JPEG) ou (after_seq, None) se o tempo esgotar
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return after_seq, None
+            seq, frames = self._seq, self._frames
+        return seq, self._encode(view, seq, frames)
+
+    def _encode(self, view, seq, frames):
+        with self._encode_lock:
+            cached = self._cache.get(view)
+            if cached is not None and cached[0] >= seq:
+                return cached[1]
+            ok, jpeg = cv2.imencode(".jpg", render_view(view, *frames),
+                                    [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            data = jpeg.tobytes() if ok else None
+            self._cache[view] = (seq, data)
+            return data
+
+
+def render_view(view, frame_A, frame_B, mask):
+    """Monta a imagem de uma visão: 'a' (captura), 'b' (comparação) ou 'overlay' (máscara sobre a comparação)."""
+    if view == "a":
+        return frame_A
+    if view == "b" or mask is None:
+        return frame_B
+    overlay = cv2.cvtColor(frame_B, cv2.COLOR_GRAY2BGR)
+    if mask.shape != frame_B.shape:
+        # A máscara está na escala da detecção (DETECTION_SCALE)
+        mask = cv2.resize(mask, (frame_B.shape[1], frame_B.shape[0]), interpolation=cv2.INTER_NEAREST)
+    changed = mask > 0
+    overlay[changed] = (overlay[changed] // 2) + np.array((0, 0, 127), dtype=np.uint8)
+    return overlay
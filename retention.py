@@ -0,0 +1,273 @@
+"""
+Retenção das capturas do MonitCam.
+
+As capturas são gravadas em subdiretórios por data ({CAPTURE_DIR}/AAAA-MM-DD)
+em vez de uma pasta única. O RetentionManager mantém um índice em memória
+dos arquivos (montado com uma única varredura ao iniciar e atualizado pelos
+gravadores a cada arquivo escrito) e remove os mais antigos quando o total
+passa de RETENTION_MAX_BYTES ou a idade passa de RETENTION_MAX_AGE_DAYS,
+sem varrer a árvore de novo.
+
+O DuplicateFilter compara um hash perceptual (aHash ou dHash) da captura
+com os das últimas capturas salvas e evita gravar as quase idênticas.
+"""
+
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Formato dos subdiretórios de cada modo de CAPTURE_SHARDING
+SHARDING = {"day": "%Y-%m-%d", "hour": os.path.join("%Y-%m-%d", "%H"), "none": None}
+
+SWEEP_INTERVAL = 60.0  # Intervalo (s) entre as verificações periódicas da retenção
+# Ao passar da cota, remove até ficar nesta fração dela, em vez de um arquivo por gravação
+LOW_WATER = 0.9
+
+# Só entram no índice arquivos com o horário no nome ({prefixo}_AAAAMMDD_HHMMSS_mmm_...):
+# um CAPTURE_DIR apontado para uma pasta com outros arquivos não perde nada
+_CAPTURE_NAME = re.compile(r"_\d{8}_\d{6}_\d{3}_")
+_SHARD_NAME = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def shard_dir(root, timestamp, sharding="day"):
+    """Subdiretório de `root` onde ficam as capturas do horário `timestamp`."""
+    if sharding not in SHARDING:
+        raise ValueError(f"CAPTURE_SHARDING inválido: {sharding}")
+    fmt = SHARDING[sharding]
+    return root if fmt is None else os.path.join(root, timestamp.strftime(fmt))
+
+
+# --- Hashes perceptuais ---
+
+def _small_gray(image, size):
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _pack(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def average_hash(image, size=8):
+    """aHash: cada bit indica se o pixel da miniatura size×size está acima da média."""
+    small = _small_gray(image, (size, size))
+    return _pack(small > small.mean())
+
+
+def difference_hash(image, size=8):
+    """dHash: cada bit indica se o pixel é mais claro que o vizinho da direita."""
+    small = _small_gray(image, (size + 1, size))
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+HASHES = {"ahash": average_hash, "dhash": difference_hash}
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class DuplicateFilter:
+    """Descarta capturas quase idênticas a uma das salvas recentemente."""
+
+    def __init__(self, method="dhash", max_distance=4, window=60.0, history=32, clock=time.monotonic):
+        """
+        Args:
+            method: 'ahash' ou 'dhash'
+            max_distance: Maior distância de Hamming (em 64 bits) considerada duplicata
+            window: Idade máxima (s) das capturas usadas na comparação
+            history: Quantidade máxima de hashes guardados
+            clock: Relógio monotônico (s)
+        """
+        if method not in HASHES:
+            raise ValueError(f"Hash perceptual inválido: {method}")
+        self._hash = HASHES[method]
+        self.max_distance = int(max_distance)
+        self.window = float(window)
+        self._clock = clock
+        self._recent = deque(maxlen=max(1, int(history)))  # (instante, hash) das capturas salvas
+        self.stats = {"checked": 0, "skipped": 0}
+
+    def is_duplicate(self, image):
+        """
+        Compara `image` com as capturas recentes; se não for duplicata, ela
+        passa a fazer parte da comparação das próximas.
+        """
+        now = self._clock()
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+        value = self._hash(image)
+        self.stats["checked"] += 1
+        if any(hamming(value, h) <= self.max_distance for _, h in self._recent):
+            self.stats["skipped"] += 1
+            return True
+        self._recent.append((now, value))
+        return False
+
+
+class RetentionManager:
+    """
+    Cota de espaço e idade máxima de um diretório de capturas.
+
+    Os gravadores chamam `add` a cada arquivo escrito; uma thread remove os
+    arquivos mais antigos a cada `interval` segundos (ou assim que a cota é
+    ultrapassada, até LOW_WATER dela) e apaga os subdiretórios por data que
+    ficarem vazios.
+    """
+
+    def __init__(self, root, max_bytes=None, max_age=None, interval=SWEEP_INTERVAL, on_evicted=None):
+        """
+        Args:
+            root: CAPTURE_DIR
+            max_bytes: Espaço máximo ocupado pelas capturas (None = sem limite)
+            max_age: Idade máxima (s) de uma captura (None = sem limite)
+            interval: Intervalo (s) entre as verificações
+            on_evicted: Chamada com a lista dos arquivos removidos em cada varredura
+                (ex.: Catalog.forget_files)
+        """
+        self.root = root
+        self.on_evicted = on_evicted
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.max_age = float(max_age) if max_age else None
+        self.interval = float(interval)
+        self._lock = threading.Lock()
+        self._files = []  # heap de (mtime, caminho, tamanho)
+        self._paths = set()  # Evita contar duas vezes um arquivo gravado durante a varredura inicial
+        self._bytes = 0
+        self._counters = {"evicted": 0, "freed_bytes": 0}
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = threading.Thread(target=self._worker, name="capture-retention", daemon=True)
+        self._thread.start()
+
+    @property
+    def stats(self):
+        """Arquivos e bytes no índice, arquivos removidos e bytes liberados."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["files"] = len(self._files)
+            stats["bytes"] = self._bytes
+        return stats
+
+    def add(self, path, size=None, mtime=None):
+        """Registra um arquivo recém-gravado (chamado pelas threads de gravação)."""
+        try:
+            if size is None or mtime is None:
+                st = os.stat(path)
+                size = st.st_size if size is None else size
+                mtime = st.st_mtime if mtime is None else mtime
+        except OSError:
+            return
+        with self._lock:
+            if path in self._paths:
+                return
+            self._paths.add(path)
+            heapq.heappush(self._files, (mtime, path, size))
+            self._bytes += size
+            over = self.max_bytes is not None and self._bytes > self.max_bytes
+        if over:
+            self._wake.set()
+
+    def _scan(self):
+        """Varredura inicial: capturas na raiz (formato antigo) e nos subdiretórios por data."""
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if self._closing:
+                return
+            if entry.is_file() and _CAPTURE_NAME.search(entry.name):
+                st = entry.stat()
+                self.add(entry.path, st.st_size, st.st_mtime)
+            elif entry.is_dir() and _SHARD_NAME.match(entry.name):
+                # Subdiretórios de outras sessões (CAPTURE_DIR/{id}) não entram
+                for directory, _, names in os.walk(entry.path):
+                    for name in names:
+                        if _CAPTURE_NAME.search(name):
+                            self.add(os.path.join(directory, name))
+
+    def sweep(self, now=None):
+        """
+        Remove os arquivos mais antigos até respeitar a cota e a idade máxima.
+
+        Returns:
+            tuple: (arquivos removidos, bytes liberados)
+        """
+        now = time.time() if now is None else now
+        freed = 0
+        removed = []
+        directories = set()
+        with self._lock:
+            limit = self.max_bytes
+            if limit is not None and self._bytes > limit:
+                limit = int(limit * LOW_WATER)
+        while True:
+            with self._lock:
+                if not self._files:
+                    break
+                mtime, path, size = self._files[0]
+                over_quota = limit is not None and self._bytes > limit
+                expired = self.max_age is not None and now - mtime > self.max_age
+                if not (over_quota or expired):
+                    break
+                heapq.heappop(self._files)
+                self._paths.discard(path)
+                self._bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Já removido por fora
+            except OSError as e:
+                logging.error(f"Falha ao remover captura antiga '{path}': {e}")
+                continue
+            removed.append(path)
+            freed += size
+            directories.add(os.path.dirname(path))
+        # Os subdiretórios de agora ficam mesmo vazios: os gravadores estão escrevendo neles
+        current = {os.path.normpath(shard_dir(self.root, datetime.fromtimestamp(now), s)) for s in SHARDING}
+        for directory in sorted(directories, reverse=True):
+            # Apaga os subdiretórios por data que ficaram vazios (a raiz fica)
+            while os.path.normpath(directory) not in current:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        evicted = len(removed)
+        if evicted:
+            if self.on_evicted is not None:
+                try:
+                    self.on_evicted(removed)
+                except Exception as e:
+                    logging.error(f"Falha ao tratar as capturas removidas de '{self.root}': {e}")
+            with self._lock:
+                self._counters["evicted"] += evicted
+                self._counters["freed_bytes"] += freed
+            logging.info("Retenção: %d captura(s) antiga(s) removida(s), %.1f MB liberados em %s",
+                         evicted, freed / 1e6, self.root)
+        return evicted, freed
+
+    def _worker(self):
+        self._scan()
+        stats = self.stats
+        logging.info("Retenção de '%s': %d arquivo(s), %.1f MB", self.root, stats["files"], stats["bytes"] / 1e6)
+        while not self._closing:
+            self.sweep()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def close(self):
+        """Encerra a thread (sem uma última verificação)."""
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
@@ -0,0 +1,129 @@
+"""
+Agendador de ticks do monitoramento.
+
+Em vez de dormir um intervalo fixo depois do trabalho (o que faz o período
+real variar com o tempo de captura e processamento), o agendador mira um
+prazo absoluto para cada tick e registra os atrasos (overruns).
+
+`restart_delay` dá a espera entre reinícios de uma sessão após falhas.
+"""
+
+import time
+
+
+def restart_delay(attempt, base_delay=5.0, max_delay=300.0):
+    """
+    Espera (s) antes do reinício número `attempt` (0, 1, 2...) após falhas
+    seguidas: `base_delay` dobrando a cada tentativa, até `max_delay`.
+    """
+    return min(float(max_delay), float(base_delay) * 2 ** min(int(attempt), 32))
+
+
+class TickScheduler:
+    """
+    Agenda os ticks por prazo absoluto.
+
+    Modo fixo: o próximo tick acontece INTERVAL depois do anterior
+    (INTERVAL × 2 após uma detecção, como no comportamento original).
+
+    Modo adaptativo: enquanto os scores ficam baixos o intervalo cresce
+    (fator `backoff`) até `max_interval`; quando o score se aproxima do
+    limiar (`approach` × limiar) ou há detecção, passa para `burst_interval`.
+    """
+
+    def __init__(self, interval, adaptive=False, max_interval=None, burst_interval=None,
+                 approach=0.5, backoff=1.25, smoothing=0.1, clock=time.monotonic):
+        """
+        Args:
+            interval: Intervalo base entre ticks (s)
+            adaptive: Habilita o modo adaptativo
+            max_interval: Maior intervalo no modo adaptativo (padrão: 4 × interval)
+            burst_interval: Intervalo de rajada no modo adaptativo (padrão: interval / 2)
+            approach: Fração do limiar a partir da qual entra em rajada
+            backoff: Fator de crescimento do intervalo quando não há movimento
+            smoothing: Peso da média móvel exponencial das medições
+            clock: Relógio monotônico (s)
+        """
+        self.base_interval = float(interval)
+        self.adaptive = adaptive
+        self.max_interval = float(max_interval or interval * 4)
+        self.burst_interval = float(burst_interval or interval / 2)
+        self.approach = approach
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.interval = self.base_interval
+        self.ticks = 0
+        self.overruns = 0
+        self._deadline = None
+        self._last_tick = None
+        self._planned = None
+        self._period_avg = None
+        self._jitter_avg = 0.0
+
+    def tick(self):
+        """Marca o início de um tick e atualiza as medições de período e jitter."""
+        now = self.clock()
+        if self._last_tick is not None and self._planned is not None:
+            period = now - self._last_tick
+            a = self.smoothing
+            self._period_avg = period if self._period_avg is None else (1 - a) * self._period_avg + a * period
+            self._jitter_avg = (1 - a) * self._jitter_avg + a * abs(period - self._planned)
+        if self._deadline is None:
+            self._deadline = now
+        self._last_tick = now
+        self.ticks += 1
+
+    def next_interval(self, score=None, threshold=None, detected=False):
+        """Calcula o intervalo até o próximo tick a partir do resultado do tick atual."""
+        if not self.adaptive:
+            self.interval = self.base_interval * 2 if detected else self.base_interval
+        elif detected or (score is not None and threshold and score >= self.approach * threshold):
+            self.interval = self.burst_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+    @property
+    def deadline(self):
+        """Prazo (no relógio do agendador) do próximo tick; None antes do primeiro."""
+        return self._deadline
+
+    def due(self, now=None):
+        """Indica se o prazo do próximo tick já chegou."""
+        return self._deadline is None or (self.clock() if now is None else now) >= self._deadline
+
+    def advance(self, score=None, threshold=None, detected=False):
+        """
+        Define o prazo do próximo tick a partir do resultado do tick atual.
+
+        Se o prazo já passou (o trabalho demorou mais que o intervalo), conta
+        um overrun e reinicia o prazo a partir de agora, sem tentar recuperar
+        os ticks perdidos.
+
+        Returns:
+            float: Prazo do próximo tick
+        """
+        self._planned = self.next_interval(score, threshold, detected)
+        if self._deadline is None:
+            self._deadline = self.clock()
+        self._deadline += self._planned
+        now = self.clock()
+        if self._deadline <= now:
+            self.overruns += 1
+            self._deadline = now
+        return self._deadline
+
+    def snapshot(self):
+        """Resumo das medições para exibição no status."""
+        achieved = 1.0 / self._period_avg if self._period_avg else 0.0
+        return {
+            "adaptive": self.adaptive,
+            "interval": round(self.interval, 4),
+            "target_fps": round(1.0 / self.interval, 2) if self.interval else 0.0,
+            "achieved_fps": round(achieved, 2),
+            "jitter_ms": round(self._jitter_avg * 1000, 2),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+        }
@@ -16,7 +16,10 @@ document.addEventListener('DOMContentLoaded', () => {
     let isDirty = false;
     let monitorStatus = 'stopped';
     let isLoaded = false;
-    const STATUS_POLL_INTERVAL = 2000; // ms
+    const STATUS_POLL_INTERVAL = 2000; // ms (usado apenas se o navegador não suportar EventSource)
+    const PREVIEW_RETRY_DELAY = 2000; // ms entre novas tentativas do stream de pré-visualização
+    const SESSION_ID = 'default'; // Sessão exibida e controlada por esta página
+    const lastDetection = document.getElementById('last-detection');
 
     // --- API Flask ---
     const api = {
@@ -83,30 +86,96 @@ document.addEventListener('DOMContentLoaded', () => {
         switch (monitorStatus) {
             case 'running': statusText = 'Em Execução'; break;
             case 'stopped': statusText = 'Parado'; break;
+            case 'starting': statusText = 'Iniciando...'; break;
             case 'stopping': statusText = 'Parando...'; break;
+            case 'restarting': statusText = 'Reiniciando...'; break;
             case 'error': statusText = 'Erro'; break;
         }
         statusIndicator.textContent = statusText;
 
         // Botão Iniciar: bloqueado se isDirty (alterações pendentes) ou se monitoramento está ativo
-        startBtn.disabled = !isLoaded || isDirty || monitorStatus === 'running' || monitorStatus === 'stopping';
-        stopBtn.disabled = !isLoaded || monitorStatus !== 'running';
-        saveBtn.disabled = !isLoaded || !isDirty || monitorStatus === 'running';
-        discardBtn.disabled = !isLoaded || !isDirty || monitorStatus === 'running';
+        startBtn.disabled = !isLoaded || isDirty || ['running', 'starting', 'restarting', 'stopping'].includes(monitorStatus);
+        // Uma sessão aguardando reinício também pode ser parada
+        stopBtn.disabled = !isLoaded || !['running', 'restarting'].includes(monitorStatus);
+        // Salvar/Descartar também funcionam em execução: o monitor aplica a configuração no próximo tick
+        saveBtn.disabled = !isLoaded || !isDirty;
+        discardBtn.disabled = !isLoaded || !isDirty;
+    }
+
+    function setMonitorStatus(status) {
+        if (status === monitorStatus) return;
+        monitorStatus = status;
+        updateStatusIndicator();
+        // Um painel aberto antes do início recebeu 404 (ou o fim do stream): pede o stream de novo
+        if (status === 'running') updatePreview();
     }
 
     async function fetchStatus() {
         try {
             const data = await api.getStatus();
-            if (data.status !== monitorStatus) {
-                monitorStatus = data.status;
-                updateStatusIndicator();
-            }
+            setMonitorStatus(data.status);
         } catch (error) {
             console.error('Erro ao buscar status:', error);
         }
     }
 
+    function showDetection(data) {
+        if (!lastDetection) return;
+        const hora = new Date(data.timestamp).toLocaleTimeString();
+        const arquivos = data.files && data.files.length ? ` - ${data.files.join(', ')}` : '';
+        lastDetection.textContent = `Última detecção: ${hora} (score ${data.score})`;
+        lastDetection.title = `Limiar: ${data.threshold}${arquivos}`;
+    }
+
+    // Recebe status, detecções e métricas do servidor por Server-Sent Events
+    function openEventStream() {
+        if (!window.EventSource) {
+            setInterval(fetchStatus, STATUS_POLL_INTERVAL);
+            return;
+        }
+        const source = new EventSource('/stream');
+        // O stream traz as mensagens de todas as sessões; a interface mostra a padrão
+        const onSession = (type, handler) => source.addEventListener(type, (e) => {
+            const data = JSON.parse(e.data);
+            if (!data.session || data.session === SESSION_ID) handler(data);
+        });
+        onSession('status', (data) => setMonitorStatus(data.status));
+        onSession('detection', showDetection);
+        onSession('metrics', (data) => {
+            statusIndicator.title = `${data.scheduler.achieved_fps} fotos/s | ${data.detections} detecções`;
+        });
+        // O EventSource reconecta sozinho; ao reconectar o servidor reenvia o status atual
+        source.onerror = () => console.warn('Conexão com o stream de eventos perdida, reconectando...');
+    }
+
+    // Pré-visualização MJPEG: só mantém o stream aberto enquanto o painel está expandido
+    const previewPanel = document.getElementById('preview-panel');
+    const previewImg = document.getElementById('preview-img');
+
+    function updatePreview() {
+        if (previewPanel.open) {
+            const view = document.querySelector('input[name="preview-view"]:checked').value;
+            // `t` força uma nova requisição mesmo com a mesma visão
+            previewImg.src = `/preview.mjpg?session=${SESSION_ID}&view=${view}&t=${Date.now()}`;
+        } else {
+            previewImg.removeAttribute('src');
+        }
+    }
+
+    // Stream recusado ou interrompido com o monitoramento ativo (ex.: reinício da captura): tenta de novo
+    previewImg.addEventListener('error', () => {
+        if (previewPanel.open && monitorStatus === 'running') {
+            setTimeout(() => {
+                if (previewPanel.open && monitorStatus === 'running') updatePreview();
+            }, PREVIEW_RETRY_DELAY);
+        }
+    });
+
+    previewPanel.addEventListener('toggle', updatePreview);
+    document.querySelectorAll('input[name="preview-view"]').forEach(radio => {
+        radio.addEventListener('change', updatePreview);
+    });
+
     function populateForm(config) {
         Object.keys(config).forEach(key => {
             const input = document.getElementById(key);
@@ -123,6 +192,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     const fps = Math.round(1 / config[key]);
                     // Garante que o valor está entre 1 e 4
                     input.value = Math.max(1, Math.min(4, fps)).toString();
+                } else if (key === 'COMPARE_IMG' && Array.isArray(config[key]) && typeof config[key][0] === 'object') {
+                    // Várias zonas: editadas como JSON
+                    input.value = JSON.stringify(config[key]);
                 } else if (Array.isArray(config[key])) {
                     input.value = config[key].join(', ');
                 } else {
@@ -150,7 +222,13 @@ document.addEventListener('DOMContentLoaded', () => {
                     const fps = parseInt(element.value, 10);
                     newConfig[element.id] = parseFloat((1 / fps).toFixed(3));
                 } else if (element.type === 'text') {
-                    if (['CAPTURE_IMG', 'COMPARE_IMG'].includes(element.id)) {
+                    if (element.id === 'COMPARE_IMG' && element.value.trim().startsWith('[')) {
+                        try {
+                            newConfig[element.id] = JSON.parse(element.value);
+                        } catch (error) {
+                            throw new Error(`Zonas de COMPARE_IMG com JSON inválido: ${error.message}`);
+                        }
+                    } else if (['CAPTURE_IMG', 'COMPARE_IMG'].includes(element.id)) {
                         newConfig[element.id] = element.value.split(',').map(item => parseInt(item.trim(), 10));
                     } else {
                         newConfig[element.id] = element.value;
@@ -162,8 +240,15 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function checkFormDirty() {
-        const newConfig = readForm();
-        isDirty = JSON.stringify(newConfig) !== JSON.stringify(currentConfig);
+        try {
+            // Compara só os campos do formulário: o resto da configuração não é editado aqui
+            const newConfig = readForm();
+            isDirty = Object.keys(newConfig).some(key =>
+                JSON.stringify(newConfig[key]) !== JSON.stringify(currentConfig[key]));
+        } catch (error) {
+            // JSON ainda sendo digitado: com certeza difere do que está salvo
+            isDirty = true;
+        }
         updateStatusIndicator();
     }
 
@@ -174,7 +259,7 @@ document.addEventListener('DOMContentLoaded', () => {
             populateForm(currentConfig);
             
             await fetchStatus();
-            setInterval(fetchStatus, STATUS_POLL_INTERVAL);
+            openEventStream();
 
             // Event listeners para mudanças no formulário
             configForm.addEventListener('input', checkFormDirty);
@@ -335,8 +420,7 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             const response = await api.startMonitor();
             if (response.success) {
-                monitorStatus = 'running';
-                updateStatusIndicator();
+                setMonitorStatus('running');
                 saveStatus.textContent = 'Monitoramento iniciado.';
                 saveStatus.style.color = '#4CAF50';
             } else {
@@ -353,12 +437,10 @@ document.addEventListener('DOMContentLoaded', () => {
     stopBtn.addEventListener('click', async () => {
         if (!isLoaded) return;
         try {
-            monitorStatus = 'stopping';
-            updateStatusIndicator();
+            setMonitorStatus('stopping');
             const response = await api.stopMonitor();
             if (response.success) {
-                monitorStatus = 'stopped';
-                updateStatusIndicator();
+                setMonitorStatus('stopped');
                 saveStatus.textContent = 'Monitoramento parado.';
             } else {
                 saveStatus.textContent = `Erro: ${response.message}`;
@@ -372,9 +454,16 @@ document.addEventListener('DOMContentLoaded', () => {
 
     configForm.addEventListener('submit', async (e) => {
         e.preventDefault();
-        if (!isLoaded || !isDirty || monitorStatus === 'running') return;
+        if (!isLoaded || !isDirty) return;
 
-        const newConfig = readForm();
+        let newConfig;
+        try {
+            newConfig = readForm();
+        } catch (error) {
+            saveStatus.textContent = `Erro: ${error.message}`;
+            saveStatus.style.color = '#f44336';
+            return;
+        }
         saveBtn.classList.add('saving');
         saveBtn.disabled = true;
         discardBtn.disabled = true;
@@ -384,7 +473,8 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             const response = await api.saveConfig(newConfig);
             if (response.success) {
-                currentConfig = newConfig;
+                // O servidor mescla os campos à configuração; as demais chaves não mudam
+                currentConfig = { ...currentConfig, ...newConfig };
                 isDirty = false;
                 updateStatusIndicator();
                 saveStatus.textContent = '✓ Configuração salva com sucesso!';
@@ -410,7 +500,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Event handler para Descartar Alterações
     discardBtn.addEventListener('click', async () => {
-        if (!isLoaded || !isDirty || monitorStatus === 'running') return;
+        if (!isLoaded || !isDirty) return;
         
         discardBtn.disabled = true;
         saveBtn.disabled = true;
@@ -1,55 +1,125 @@
 """
 Servidor Flask minimalista para a interface do MonitCam.
+
+Modos (SERVER_MODE):
+    production (padrão): waitress com um pool fixo de SERVER_THREADS threads;
+        as conexões contínuas (/stream, /preview.mjpg) nunca ocupam as
+        últimas API_THREADS threads do pool, que ficam para a API.
+    development: servidor do Werkzeug, uma thread por requisição e arquivos
+        estáticos relidos quando mudam no disco.
 """
 
-from flask import Flask, jsonify, request, send_file
-import json
+from flask import Flask, Response, jsonify, request, send_file
+from werkzeug.serving import make_server
 import os
 import sys
+import functools
 import subprocess
 import threading
 import webbrowser
 import time
 
-# Importa funções de monitoramento
+# Importa funções de monitoramento (leve: a captura e o OpenCV só são
+# carregados quando um monitoramento começa)
 import main
+from assets import StaticAssets
+from broadcast import format_sse
+
+# Intervalo (s) entre comentários de keep-alive no stream de eventos
+STREAM_KEEPALIVE = 15
+
+SERVER_THREADS = 16  # Threads do pool no modo de produção
+API_THREADS = 4      # Threads do pool que as conexões contínuas não podem ocupar
 
 app = Flask(__name__)
 
+# Interface (index.html, script.js...) lida do diretório do servidor e servida da memória
+static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)), reload=True)
+
+# Vagas de conexões contínuas (threading.BoundedSemaphore) no modo de produção
+_stream_slots = None
+
 # Desabilita logs do Flask para console mais limpo
 import logging
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
 
+def static_response(name):
+    """
+    Resposta de um arquivo da interface: gzip se o cliente aceitar, ETag por
+    versão e 304 quando o navegador já tem o arquivo (Cache-Control no-cache:
+    ele sempre revalida, então uma atualização aparece no próximo acesso).
+    """
+    asset = static_assets.get(name)
+    if asset is None:
+        return jsonify({"error": "Arquivo não encontrado"}), 404
+    body, etag = asset.body, asset.etag
+    headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if asset.gzip is not None and request.accept_encodings['gzip']:
+        body, etag = asset.gzip, etag + '-gz'
+        headers['Content-Encoding'] = 'gzip'
+    headers['ETag'] = f'"{etag}"'
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype=asset.mimetype, headers=headers)
+
+
+def limit_streams(view):
+    """
+    Limita as conexões contínuas (SSE, MJPEG) às vagas do pool de threads.
+
+    Cada uma ocupa uma thread enquanto o cliente estiver conectado; sem
+    vaga a resposta é 503, e a vaga é devolvida quando a conexão fecha.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        slots = _stream_slots
+        if slots is None:
+            return view(*args, **kwargs)
+        if not slots.acquire(blocking=False):
+            return jsonify({"error": "Limite de conexões contínuas atingido"}), 503, {'Retry-After': '5'}
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            slots.release()
+            raise
+        if response.is_streamed:
+            response.call_on_close(slots.release)
+        else:
+            slots.release()
+        return response
+    return wrapper
+
+
 @app.route('/')
 def index():
     """Serve o index.html"""
-    return send_file('index.html')
+    return static_response('index.html')
 
 
 @app.route('/favicon.ico')
 def favicon():
     """Serve o favicon.ico"""
-    try:
-        return send_file('favicon.ico', mimetype='image/x-icon')
-    except FileNotFoundError:
+    if static_assets.get('favicon.ico') is None:
         return '', 204  # Retorna resposta vazia se não encontrar
+    return static_response('favicon.ico')
 
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    """Serve arquivos estáticos (CSS, JS)"""
-    return send_file(filename)
+    """Serve arquivos estáticos (CSS, JS) da lista assets.STATIC_FILES"""
+    return static_response(filename)
 
 
 @app.route('/get_config')
 def get_config():
-    """Retorna a configuração do config.json"""
+    """Retorna a configuração em memória (APP_CONFIG, carregada do config.json)"""
     try:
-        if os.path.exists('config.json'):
-            with open('config.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
+        if not main.get_config() and os.path.exists('config.json'):
+            main.load_settings()
+        config = main.get_config()
+        if config:
             return jsonify(config)
         else:
             # Retorna configuração padrão
@@ -65,11 +135,60 @@ def get_config():
                 "CAPTURE_DIR": "captures",
                 "FILENAME_PREFIX": "suspeito",
                 "SAVE_COMPARE_IMG": False,
+                "CAPTURE_MODE": "union",
+                "DETECTION_SCALE": 1.0,
+                "DETECTION_MODE": "thread",
+                "DETECTION_WORKERS": None,
+                "SAVE_FORMAT": "png",
+                "SAVE_QUALITY": None,
+                "WRITER_QUEUE_SIZE": 32,
+                "WRITER_WORKERS": 2,
+                "WRITER_POLICY": "block",
+                "CLIP_ENABLED": False,
+                "CLIP_PRE_FRAMES": 10,
+                "CLIP_POST_FRAMES": 10,
+                "CLIP_FOURCC": "MJPG",
+                "CLIP_EXTENSION": ".avi",
+                "EVENT_COALESCE": False,
+                "EVENT_QUIET_PERIOD": 2.0,
+                "EVENT_KEEP": "top_k",
+                "EVENT_TOP_K": 3,
+                "SCHEDULER_ADAPTIVE": False,
+                "MAX_INTERVAL": None,
+                "BURST_INTERVAL": None,
+                "ADAPTIVE_APPROACH": 0.5,
+                "ADAPTIVE_BACKOFF": 1.25,
+                "METRICS_PUSH_INTERVAL": 5.0,
+                "PREVIEW_MAX_FPS": 5.0,
+                "PREVIEW_QUALITY": 70,
+                "CATALOG_ENABLED": True,
+                "CATALOG_PATH": "monitcam_catalog.db",
+                "CAPTURE_SHARDING": "day",
+                "RETENTION_MAX_BYTES": None,
+                "RETENTION_MAX_AGE_DAYS": None,
+                "RETENTION_INTERVAL": 60.0,
+                "DEDUPE_ENABLED": False,
+                "DEDUPE_HASH": "dhash",
+                "DEDUPE_MAX_DISTANCE": 4,
+                "DEDUPE_WINDOW": 60.0,
+                "CROP_MODE": "full",
+                "CROP_PADDING": 16,
+                "CROP_MIN_AREA": 25,
+                "CROP_MAX_BOXES": 8,
+                "OVERVIEW_SCALE": 0.25,
+                "SESSIONS": {},
                 "SAVE_LOGS": False,
                 "LOG_FILE": "monitcam.log",
                 "ERROR_LOG_FILE": "monitcam_error.log",
                 "RESTART_BASE_DELAY": 5,
-                "RESTART_MAX_DELAY": 300
+                "RESTART_MAX_DELAY": 300,
+                "CAPTURE_FAILURE_LIMIT": 5,
+                "EXCLUDE_IMG": [],
+                "EXCLUDE_MASK": None,
+                "MASK_TILE_SIZE": 32,
+                "HEATMAP_ENABLED": True,
+                "SERVER_MODE": "production",
+                "SERVER_THREADS": 16
             }
             return jsonify(default_config)
     except Exception as e:
@@ -81,14 +200,16 @@ def save_config():
     """Salva a configuração no config.json"""
     try:
         data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({"success": False, "message": "Configuração inválida"}), 400
         
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        # Atualiza configuração no main.py
-        main.APP_CONFIG = data
+        # Mescla ao APP_CONFIG, valida, grava o config.json e aplica às sessões (inclusive às em execução)
+        result = main.update_config(data)
+        if not result["success"]:
+            return jsonify(result), 400
         
-        return jsonify({"success": True, "message": "Configuração salva com sucesso!"})
+        result["message"] = "Configuração salva com sucesso!"
+        return jsonify(result)
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
@@ -99,6 +220,91 @@ def get_status():
     return jsonify(main.get_monitor_status())
 
 
+@app.route('/stream')
+@limit_streams
+def stream():
+    """
+    Stream (Server-Sent Events) de status, detecções e resumo de métricas.
+
+    Cada cliente tem sua própria fila limitada; um cliente lento perde
+    mensagens antigas, mas nunca bloqueia a thread de monitoramento.
+    """
+    subscription = main.monitor_events.subscribe()
+
+    def generate():
+        try:
+            yield format_sse("status", main.get_monitor_status())
+            while True:
+                message = subscription.get(timeout=STREAM_KEEPALIVE)
+                # Comentário SSE mantém a conexão viva e detecta clientes desconectados
+                yield message if message is not None else ": keep-alive\n\n"
+        finally:
+            main.monitor_events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/preview.mjpg')
+@limit_streams
+def preview_mjpg():
+    """
+    Pré-visualização MJPEG dos frames que o monitoramento já capturou.
+
+    Parâmetros: session (padrão: default), view=a|b|overlay (padrão: a) e
+    fps (limite deste espectador).
+    """
+    from preview import VIEWS  # Só existe pré-visualização com uma sessão criada
+    session = main.get_session(request.args.get('session', main.DEFAULT_SESSION))
+    if session is None:
+        return jsonify({"error": "Sessão não encontrada"}), 404
+    view = request.args.get('view', 'a')
+    if view not in VIEWS:
+        return jsonify({"error": f"Visão inválida: {view}"}), 400
+    session_id = session.id
+    hub = session.preview
+    fps = min(request.args.get('fps', default=hub.max_fps, type=float), hub.max_fps)
+    min_period = 1.0 / max(0.1, fps)
+
+    def generate():
+        hub.add_viewer()
+        try:
+            seq = 0
+            last = None
+            while True:
+                started = time.monotonic()
+                seq, jpeg = hub.wait_jpeg(view, seq, timeout=STREAM_KEEPALIVE)
+                if jpeg is None:
+                    # Sem frames novos: encerra se a sessão parou ou foi removida; senão
+                    # reenvia o último frame, para que um cliente desconectado seja notado
+                    if not session.active or main.get_session(session_id) is not session:
+                        return
+                    if last is None:
+                        continue
+                    jpeg = last
+                last = jpeg
+                yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                       + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+                time.sleep(max(0.0, min_period - (time.monotonic() - started)))
+        finally:
+            hub.remove_viewer()
+
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/metrics')
+def metrics():
+    """Métricas do monitoramento no formato de texto do Prometheus"""
+    return main.get_metrics_text(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+@app.route('/metrics.json')
+def metrics_json():
+    """Métricas do monitoramento em JSON"""
+    return jsonify(main.get_metrics_snapshot())
+
+
 @app.route('/start_monitor', methods=['POST'])
 def start_monitor():
     """Inicia o monitoramento"""
@@ -117,6 +323,92 @@ def stop_monitor():
     return jsonify(result)
 
 
+@app.route('/events')
+def list_events():
+    """
+    Detecções registradas no catálogo, da mais recente para a mais antiga.
+
+    Parâmetros: since e until (ISO 8601, until exclusivo), session, limit
+    e cursor (o next_cursor da página anterior).
+    """
+    try:
+        return jsonify(main.list_events(since=request.args.get('since'),
+                                        until=request.args.get('until'),
+                                        session=request.args.get('session'),
+                                        cursor=request.args.get('cursor'),
+                                        limit=request.args.get('limit', default=main.catalog.PAGE_SIZE, type=int)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/events/<int:event_id>/thumbnail')
+def event_thumbnail(event_id):
+    """Miniatura JPEG de uma detecção (gerada na primeira vez e guardada em disco)"""
+    width = min(request.args.get('width', default=main.catalog.THUMBNAIL_WIDTH, type=int), 1920)
+    path = main.get_thumbnail(event_id, max(16, width))
+    if path is None:
+        return jsonify({"error": "Miniatura indisponível"}), 404
+    return send_file(os.path.abspath(path), mimetype='image/jpeg', max_age=86400)
+
+
+@app.route('/sessions')
+def list_sessions():
+    """Lista as sessões de monitoramento e seus status"""
+    return jsonify(main.list_sessions())
+
+
+@app.route('/sessions/<session_id>', methods=['PUT', 'POST'])
+def save_session(session_id):
+    """Cria ou altera uma sessão (chaves que sobrescrevem o config.json)"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Configuração da sessão inválida."}), 400
+    result = main.save_session(session_id, data)
+    return jsonify(result), 200 if result["success"] else 409
+
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """Remove uma sessão parada"""
+    result = main.delete_session(session_id)
+    return jsonify(result), 200 if result["success"] else 409
+
+
+@app.route('/sessions/<session_id>/status')
+def session_status(session_id):
+    """Retorna o status de uma sessão"""
+    if session_id not in main.session_ids():
+        return jsonify({"error": "Sessão não encontrada"}), 404
+    return jsonify(main.get_monitor_status(session_id))
+
+
+@app.route('/sessions/<session_id>/heatmap')
+def session_heatmap(session_id):
+    """
+    Mapa de calor por bloco (MASK_TILE_SIZE) da região de comparação: ticks
+    com mudança e pixels alterados de cada bloco desde que o detector foi
+    criado. Serve para decidir onde colocar EXCLUDE_IMG/EXCLUDE_MASK.
+    """
+    heatmap = main.get_heatmap(session_id)
+    if heatmap is None:
+        return jsonify({"error": "Mapa de calor indisponível (sessão parada ou HEATMAP_ENABLED desligado)"}), 404
+    return jsonify(heatmap)
+
+
+@app.route('/sessions/<session_id>/start', methods=['POST'])
+def start_session(session_id):
+    """Inicia o monitoramento de uma sessão"""
+    if os.path.exists('config.json'):
+        main.load_settings()
+    return jsonify(main.start_monitoring(session_id))
+
+
+@app.route('/sessions/<session_id>/stop', methods=['POST'])
+def stop_session(session_id):
+    """Para o monitoramento de uma sessão"""
+    return jsonify(main.stop_monitoring(session_id))
+
+
 @app.route('/select_area')
 def select_area():
     """Abre o seletor de área e retorna as coordenadas"""
@@ -174,20 +466,49 @@ def select_area():
         }), 500
 
 
-def open_browser():
-    """Abre o navegador após um pequeno delay"""
-    time.sleep(1.5)
-    webbrowser.open('http://127.0.0.1:5000')
+def open_browser(url='http://127.0.0.1:5000'):
+    """Abre a interface no navegador"""
+    webbrowser.open(url)
 
 
-def run_server():
-    """Inicia o servidor Flask"""
-    # Abre o navegador em uma thread separada
-    browser_thread = threading.Thread(target=open_browser, daemon=True)
-    browser_thread.start()
-    
-    # Inicia o servidor Flask
-    app.run(host='127.0.0.1', port=5000, debug=False, threaded=True)
+def run_server(host='127.0.0.1', port=5000, mode=None, browser=True):
+    """
+    Inicia o servidor Flask.
+
+    Args:
+        mode: "production" ou "development" (padrão: SERVER_MODE do config.json)
+        browser: Abre a interface no navegador quando o servidor estiver escutando
+    """
+    global _stream_slots
+    if os.path.exists('config.json'):
+        main.load_settings()
+    config = main.get_config()
+    mode = mode or config.get("SERVER_MODE", "production")
+    if mode == "production":
+        try:
+            from waitress import create_server
+        except ImportError:
+            logging.warning("waitress não instalado (pip install waitress); usando o servidor de desenvolvimento.")
+            mode = "development"
+
+    # O socket já está escutando quando o servidor é criado: o navegador é
+    # aberto nesse momento, sem esperar um tempo fixo
+    if mode == "production":
+        threads = config.get("SERVER_THREADS", SERVER_THREADS)
+        _stream_slots = threading.BoundedSemaphore(max(1, threads - API_THREADS))
+        static_assets.reload = False
+        server = create_server(app, host=host, port=port, threads=threads, ident="MonitCam")
+        serve, port = server.run, server.effective_port
+    else:
+        _stream_slots = None
+        static_assets.reload = True
+        server = make_server(host, port, app, threaded=True)
+        serve, port = server.serve_forever, server.port
+    if browser:
+        browser_thread = threading.Thread(target=open_browser, args=(f'http://{host}:{port}',), daemon=True)
+        browser_thread.start()
+
+    serve()
 
 
 if __name__ == '__main__':
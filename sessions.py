@@ -0,0 +1,1226 @@
+"""
+Sessões de monitoramento concorrentes do MonitCam.
+
+Cada sessão vigia um par CAPTURE_IMG/COMPARE_IMG com sua própria
+configuração, status, limiar, diretório de saída, métricas e
+pré-visualização. O MonitorManager roda uma única thread de captura: a
+cada tick a tela é capturada uma vez e cada sessão com prazo vencido
+recebe views das suas regiões, em vez de N threads capturando o display.
+
+A thread também supervisiona as sessões: um tick com falha de captura não
+chega ao detector (e o frame seguinte vira a nova referência), falhas
+seguidas reabrem a sessão de captura e uma falha fatal reinicia a sessão
+com espera exponencial entre RESTART_BASE_DELAY e RESTART_MAX_DELAY.
+"""
+
+import os
+import time
+import logging
+import threading
+import traceback
+from datetime import datetime
+
+import cv2
+
+import capture
+import detector
+import writer
+import clips
+import events
+import scheduler
+import metrics
+import broadcast
+import preview
+import retention
+import crops
+import masks
+
+DEFAULT_SESSION = "default"
+
+# Uma captura única do retângulo envolvente de todas as sessões só compensa
+# se ele não for muito maior que a soma das áreas de cada sessão
+SHARED_GRAB_MAX_OVERHEAD = 2.0
+
+# Sessões cujo prazo vence em menos que isso entram no tick atual, para
+# aproveitarem a mesma captura em vez de provocarem outra logo em seguida
+DUE_TOLERANCE = 0.005
+
+# Quantidade de combinações de sessões com buffers de captura em cache
+MAX_GRABBERS = 16
+
+# Ticks seguidos com falha de captura antes de reabrir a sessão de captura
+CAPTURE_FAILURE_LIMIT = 5
+
+# Chaves de cada componente: numa troca de configuração com a sessão ativa,
+# só os componentes com alguma chave alterada são recriados
+WRITER_KEYS = ("SAVE_FORMAT", "SAVE_QUALITY", "WRITER_QUEUE_SIZE", "WRITER_WORKERS", "WRITER_POLICY")
+TRACKER_KEYS = ("EVENT_COALESCE", "EVENT_QUIET_PERIOD", "EVENT_KEEP", "EVENT_TOP_K")
+DEDUPE_KEYS = ("DEDUPE_ENABLED", "DEDUPE_HASH", "DEDUPE_MAX_DISTANCE", "DEDUPE_WINDOW")
+SCHEDULER_KEYS = ("INTERVAL", "SCHEDULER_ADAPTIVE", "MAX_INTERVAL", "BURST_INTERVAL",
+                  "ADAPTIVE_APPROACH", "ADAPTIVE_BACKOFF")
+CLIP_KEYS = ("CLIP_ENABLED", "CLIP_PRE_FRAMES", "CLIP_POST_FRAMES", "CLIP_FOURCC", "CLIP_EXTENSION", "INTERVAL")
+
+
+def capture_path(config, timestamp, suffix, extension):
+    """
+    Monta o caminho {CAPTURE_DIR}/{data}/{FILENAME_PREFIX}_{horario}_{suffix}{extension}
+    (o subdiretório por data segue CAPTURE_SHARDING).
+    """
+    horario = timestamp.strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    directory = retention.shard_dir(config["CAPTURE_DIR"], timestamp, config.get("CAPTURE_SHARDING", "day"))
+    return os.path.join(directory, f"{config['FILENAME_PREFIX']}_{horario}_{suffix}{extension}")
+
+
+def save_detection(saver, config, timestamp, frame_A, frame_B=None, motion_crops=None, dedupe=None):
+    """
+    Entrega ao gravador o frame A (e o B, se houver) de uma detecção.
+
+    Args:
+        frame_A: Captura (inteira ou reduzida, ver CROP_MODE) ou None se
+            só os recortes são gravados
+        motion_crops: Lista de (retângulo, recorte) da área do movimento,
+            gravados como {...}_A_crop{n}
+        dedupe: DuplicateFilter opcional; uma captura quase idêntica a uma
+            recente não é gravada
+
+    Returns:
+        list: Caminhos dos arquivos enfileirados (vazia se for duplicata)
+    """
+    images = [] if frame_A is None else [("A", frame_A)]
+    images.extend((f"A_crop{i}", image) for i, (_, image) in enumerate(motion_crops or (), 1))
+    if dedupe is not None and dedupe.is_duplicate(images[0][1]):
+        logging.info("Captura quase idêntica a uma recente; não gravada.")
+        return []
+    if frame_B is not None:
+        images.append(("B", frame_B))
+    paths = []
+    for suffix, image in images:
+        path = capture_path(config, timestamp, suffix, saver.extension)
+        saver.submit(path, image)
+        paths.append(path)
+    return paths
+
+
+def save_event(saver, config, event, dedupe=None):
+    """Grava os frames selecionados de um evento encerrado e retorna os caminhos."""
+    selected = event.selected()
+    logging.info("Evento encerrado: %d detecções, pico=%d, %d frame(s) salvos",
+                 event.detections, event.peak_score, len(selected))
+    paths = []
+    for _, timestamp, frames in selected:
+        paths.extend(save_detection(saver, config, timestamp, *frames, dedupe=dedupe))
+    return paths
+
+
+def _check_region(region, key):
+    if not (isinstance(region, (list, tuple)) and len(region) == 4
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in region)
+            and region[2] > 0 and region[3] > 0):
+        raise ValueError(f"{key} deve ser [x, y, largura, altura] com largura e altura positivas.")
+
+
+def _check_choice(config, key, choices, default):
+    if config.get(key, default) not in choices:
+        raise ValueError(f"{key} inválido: {config.get(key)!r} (opções: {', '.join(map(str, choices))})")
+
+
+def validate_config(config):
+    """
+    Verifica uma configuração de sessão antes de ela ser usada.
+
+    Raises:
+        ValueError: Com a primeira chave ausente ou inválida
+    """
+    for key in ("CAPTURE_IMG", "COMPARE_IMG", "SENSIBILIDADE", "INTERVAL", "CAPTURE_DIR",
+                "FILENAME_PREFIX", "SAVE_COMPARE_IMG"):
+        if key not in config:
+            raise ValueError(f"Chave obrigatória ausente: {key}")
+    _check_region(config["CAPTURE_IMG"], "CAPTURE_IMG")
+    try:
+        zones = detector.normalize_zones(config["COMPARE_IMG"], config["SENSIBILIDADE"])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise ValueError("COMPARE_IMG deve ser uma região ou uma lista de zonas.") from None
+    if zones is None:
+        zones = [{"region": config["COMPARE_IMG"], "sensitivity": config["SENSIBILIDADE"]}]
+    for zone in zones:
+        _check_region(zone["region"], "COMPARE_IMG")
+        if not isinstance(zone["sensitivity"], (int, float)) or not 1 <= zone["sensitivity"] <= 100:
+            raise ValueError("SENSIBILIDADE deve estar entre 1 e 100.")
+    if not isinstance(config["INTERVAL"], (int, float)) or config["INTERVAL"] <= 0:
+        raise ValueError("INTERVAL deve ser maior que zero.")
+    scale = config.get("DETECTION_SCALE", 1.0)
+    if not isinstance(scale, (int, float)) or not 0 < scale <= 1:
+        raise ValueError("DETECTION_SCALE deve estar entre 0 (exclusivo) e 1.")
+    for key, default in (("RESTART_BASE_DELAY", 5), ("RESTART_MAX_DELAY", 300)):
+        if not isinstance(config.get(key, default), (int, float)) or config.get(key, default) <= 0:
+            raise ValueError(f"{key} deve ser maior que zero.")
+    for region in config.get("EXCLUDE_IMG") or ():
+        _check_region(region, "EXCLUDE_IMG")
+    mask_path = config.get("EXCLUDE_MASK")
+    if mask_path and not os.path.isfile(mask_path):
+        raise ValueError(f"EXCLUDE_MASK não encontrada: {mask_path}")
+    tile_size = config.get("MASK_TILE_SIZE", masks.TILE_SIZE)
+    if not isinstance(tile_size, int) or tile_size < 4:
+        raise ValueError("MASK_TILE_SIZE deve ser um inteiro de pelo menos 4.")
+    limit = config.get("CAPTURE_FAILURE_LIMIT", CAPTURE_FAILURE_LIMIT)
+    if not isinstance(limit, int) or limit < 1:
+        raise ValueError("CAPTURE_FAILURE_LIMIT deve ser um inteiro maior que zero.")
+    _check_choice(config, "CAPTURE_MODE", capture.RegionGrabber.MODES, "union")
+    _check_choice(config, "DETECTION_MODE", ("thread", "process"), "thread")
+    _check_choice(config, "SAVE_FORMAT", tuple(writer.FORMATS), "png")
+    _check_choice(config, "WRITER_POLICY", writer.POLICIES, "block")
+    _check_choice(config, "EVENT_KEEP", events.KEEP_MODES, "top_k")
+    _check_choice(config, "CAPTURE_SHARDING", tuple(retention.SHARDING), "day")
+    _check_choice(config, "DEDUPE_HASH", tuple(retention.HASHES), "dhash")
+    _check_choice(config, "CROP_MODE", crops.MODES, "full")
+
+
+def log_exception(config, message):
+    """Registra a exceção atual no log e no arquivo de erros (ERROR_LOG_FILE)."""
+    logging.error(message)
+    with open(config.get("ERROR_LOG_FILE", "monitcam_error.log"), "a", encoding="utf-8") as f:
+        f.write(f"{datetime.now().isoformat()} - Exception:\n")
+        traceback.print_exc(file=f)
+        f.write("\n")
+
+
+class MonitorSession:
+    """
+    Uma área monitorada.
+
+    Os métodos de ciclo de vida (`open`, `update_geometry`, `process`,
+    `close`) são chamados apenas pela thread de captura do MonitorManager.
+    """
+
+    def __init__(self, session_id, config, events=None):
+        """
+        Args:
+            session_id: Identificador da sessão (usado nas rotas e nas métricas)
+            config: Configuração completa da sessão (mesmas chaves do config.json)
+            events: Broadcaster compartilhado para status, detecções e métricas
+        """
+        self.id = session_id
+        self.config = config
+        self.config_version = 1
+        self._pending_config = None  # (versão, config) a aplicar no próximo tick
+        self._config_lock = threading.Lock()
+        self.events = events if events is not None else broadcast.Broadcaster()
+        self.metrics = metrics.MonitorMetrics()
+        self.preview = preview.PreviewHub()
+        self.status = "stopped"  # 'stopped', 'starting', 'running', 'restarting', 'stopping' ou 'error'
+        self.stop_requested = False
+        self.restart_at = None  # Instante (monotônico) do próximo reinício, quando 'restarting'
+        self._restart_attempt = 0  # Falhas fatais seguidas (define a espera do reinício)
+        self._opened_at = None
+        self._stale = False  # Houve falha de captura desde o último frame comparado
+        self.scheduler = None
+        self.pixel_threshold = None
+        self.cap_region = None
+        self.cmp_region = None
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._reset()
+
+    def _reset(self):
+        self.pool = None     # workers.DetectionPool quando DETECTION_MODE = "process"
+        self.catalog = None  # catalog.Catalog compartilhado pelo MonitorManager
+        self.retention = None  # retention.RetentionManager do CAPTURE_DIR (compartilhado)
+        self.motion = None
+        self.zones = None
+        self.excluded = None  # Pixels ignorados da região de comparação (masks.exclusion_mask)
+        self.heatmap = None  # masks.TileHeatmap do detector atual
+        self._detector_key = None  # Região, escala, pool e exclusão do detector atual
+        self._recorder_key = None  # Região de captura e parâmetros do gravador de clipes atual
+        self.dedupe = None
+        self.saver = None
+        self.recorder = None
+        self.tracker = None
+
+    # --- Estado ---
+
+    def set_status(self, status):
+        """Atualiza o status da sessão e o publica para a interface."""
+        if status != self.status:
+            self.status = status
+            self.events.publish("status", {"session": self.id, "status": status}, key=self.id)
+
+    @property
+    def active(self):
+        return self.status in ("starting", "running", "restarting", "stopping")
+
+    @property
+    def regions(self):
+        return [self.cap_region, self.cmp_region]
+
+    @property
+    def capture_mode(self):
+        return self.config.get("CAPTURE_MODE", "union")
+
+    @property
+    def crop_mode(self):
+        return self.config.get("CROP_MODE", "full")
+
+    @property
+    def detection_limit(self):
+        # Com zonas ou recortes a máscara precisa estar completa (contagem por zona, retângulos)
+        return self.pixel_threshold if self.zones is None and self.crop_mode == "full" else None
+
+    def mark_starting(self):
+        """Marca a sessão para ser aberta pela thread de captura (que a fecha ao encerrar)."""
+        self.stop_requested = False
+        self._stopped.clear()
+        self.set_status("starting")
+
+    def wait_stopped(self, timeout=None):
+        """Aguarda a thread de captura encerrar a sessão."""
+        return self._stopped.wait(timeout)
+
+    def snapshot(self):
+        """Status da sessão para a API."""
+        status = {"session": self.id, "status": self.status,
+                  "capture_dir": self.config.get("CAPTURE_DIR"), "config_version": self.config_version}
+        pending = self._pending_config
+        if pending is not None:
+            status["pending_config_version"] = pending[0]
+        if self.pixel_threshold is not None:
+            status["threshold"] = self.pixel_threshold
+        if self.zones is not None:
+            status["zones"] = [{"name": n, "region": list(r), "threshold": int(t)} for n, r, t
+                               in zip(self.zones.names, self.zones.regions, self.zones.thresholds)]
+        if self.scheduler is not None:
+            status["scheduler"] = self.scheduler.snapshot()
+        if self.retention is not None:
+            status["storage"] = self.retention.stats
+        if self.dedupe is not None:
+            status["duplicates_skipped"] = self.dedupe.stats["skipped"]
+        status["failures"] = {"capture": self.metrics.skipped.value, "fatal": self.metrics.errors.value}
+        status["restarts"] = self.metrics.restarts.value
+        restart_at = self.restart_at
+        if self.status == "restarting" and restart_at is not None:
+            status["restart_in"] = round(max(0.0, restart_at - time.monotonic()), 1)
+        return status
+
+    def heatmap_snapshot(self):
+        """Mapa de calor por bloco para a API (None sem detector ou com HEATMAP_ENABLED desligado)."""
+        heatmap = self.heatmap
+        if heatmap is None:
+            return None
+        data = {"session": self.id, "region": list(self.cmp_region),
+                "tile_size": self.config.get("MASK_TILE_SIZE", masks.TILE_SIZE)}
+        data.update(heatmap.snapshot())
+        return data
+
+    # --- Criação dos componentes ---
+
+    def create_detector(self):
+        """Cria o MotionDetector (local ou, com um pool, em um processo) para a região de comparação."""
+        shape = (self.cmp_region[3], self.cmp_region[2])
+        scale = self.config.get("DETECTION_SCALE", 1.0)
+        tile_size = self.config.get("MASK_TILE_SIZE", masks.TILE_SIZE)
+        if self.pool is not None:
+            return self.pool.detector(shape, scale, exclude=self.excluded, tile_size=tile_size)
+        return detector.MotionDetector(shape, scale=scale, exclude=self.excluded, tile_size=tile_size)
+
+    def create_heatmap(self):
+        """Cria o mapa de calor por bloco do detector atual, se habilitado em HEATMAP_ENABLED."""
+        if not self.config.get("HEATMAP_ENABLED", True):
+            return None
+        motion = self.motion
+        return masks.TileHeatmap(motion.shape, motion.tile, motion.pixel_scale, motion.coverage)
+
+    def create_writer(self):
+        """Cria o gravador assíncrono de capturas a partir da configuração."""
+        config = self.config
+        return writer.CaptureWriter(fmt=config.get("SAVE_FORMAT", "png"),
+                                    quality=config.get("SAVE_QUALITY"),
+                                    max_queue=config.get("WRITER_QUEUE_SIZE", 32),
+                                    workers=config.get("WRITER_WORKERS", 2),
+                                    policy=config.get("WRITER_POLICY", "block"),
+                                    metrics=self.metrics,
+                                    on_written=self.retention.add if self.retention is not None else None)
+
+    def create_clip_recorder(self):
+        """Cria o gravador de clipes de eventos, se habilitado em CLIP_ENABLED."""
+        config = self.config
+        if not config.get("CLIP_ENABLED", False):
+            return None
+        recorder = clips.ClipRecorder((self.cap_region[3], self.cap_region[2]),
+                                      pre_frames=config.get("CLIP_PRE_FRAMES", 10),
+                                      post_frames=config.get("CLIP_POST_FRAMES", 10),
+                                      fps=1.0 / config["INTERVAL"],
+                                      fourcc=config.get("CLIP_FOURCC", "MJPG"),
+                                      extension=config.get("CLIP_EXTENSION", ".avi"),
+                                      on_written=self.retention.add if self.retention is not None else None)
+        logging.info("[%s] Clipes de eventos habilitados (%d frames, %.1f MB reservados)",
+                     self.id, recorder.capacity, recorder.nbytes / 1e6)
+        return recorder
+
+    def create_duplicate_filter(self):
+        """Cria o filtro de capturas quase idênticas, se habilitado em DEDUPE_ENABLED."""
+        config = self.config
+        if not config.get("DEDUPE_ENABLED", False):
+            return None
+        return retention.DuplicateFilter(method=config.get("DEDUPE_HASH", "dhash"),
+                                         max_distance=config.get("DEDUPE_MAX_DISTANCE", 4),
+                                         window=config.get("DEDUPE_WINDOW", 60.0))
+
+    def create_event_tracker(self):
+        """Cria o agrupador de eventos, se habilitado em EVENT_COALESCE."""
+        config = self.config
+        if not config.get("EVENT_COALESCE", False):
+            return None
+        return events.EventTracker(quiet_period=config.get("EVENT_QUIET_PERIOD", 2.0),
+                                   keep=config.get("EVENT_KEEP", "top_k"),
+                                   top_k=config.get("EVENT_TOP_K", 3))
+
+    def create_scheduler(self):
+        """Cria o agendador de ticks (fixo ou adaptativo, conforme SCHEDULER_ADAPTIVE)."""
+        config = self.config
+        return scheduler.TickScheduler(config["INTERVAL"],
+                                       adaptive=config.get("SCHEDULER_ADAPTIVE", False),
+                                       max_interval=config.get("MAX_INTERVAL"),
+                                       burst_interval=config.get("BURST_INTERVAL"),
+                                       approach=config.get("ADAPTIVE_APPROACH", 0.5),
+                                       backoff=config.get("ADAPTIVE_BACKOFF", 1.25))
+
+    # --- Configuração ---
+
+    def set_config(self, config):
+        """
+        Troca a configuração de uma sessão parada (usada no próximo início).
+
+        Returns:
+            int: Versão da configuração
+        """
+        with self._config_lock:
+            if config != self.config:
+                self.config = config
+                self.config_version += 1
+            self._pending_config = None
+            return self.config_version
+
+    def reconfigure(self, config):
+        """
+        Valida uma nova configuração para a sessão ativa e a deixa pendente;
+        a thread de captura a aplica entre dois ticks (`apply_config`). Uma
+        nova chamada antes disso substitui a pendente.
+
+        Returns:
+            int: Versão que a configuração terá ao ser aplicada
+
+        Raises:
+            ValueError: Se a configuração for inválida (nada muda)
+        """
+        validate_config(config)
+        config = dict(config)
+        with self._config_lock:
+            pending = self._pending_config
+            if pending is None and config == self.config:
+                return self.config_version
+            version = max(self.config_version, pending[0] if pending else 0) + 1
+            self._pending_config = (version, config)
+            return version
+
+    @property
+    def latest_config_version(self):
+        """Versão da configuração mais recente (aplicada ou ainda pendente)."""
+        pending = self._pending_config
+        return pending[0] if pending is not None else self.config_version
+
+    def take_pending_config(self):
+        """Retira a configuração pendente, (versão, config), ou None."""
+        with self._config_lock:
+            pending, self._pending_config = self._pending_config, None
+            return pending
+
+    def apply_config(self, backend, version, config):
+        """
+        Troca a configuração da sessão ativa (thread de captura, entre ticks).
+
+        Os valores derivados (regiões ajustadas, limiares) são recalculados
+        uma vez; os componentes só são recriados se alguma chave deles mudou,
+        e o detector (com o frame de referência) só se a geometria mudou.
+        """
+        old, self.config = self.config, config
+        self.config_version = version
+
+        def changed(keys):
+            return any(old.get(k) != config.get(k) for k in keys)
+
+        if changed(TRACKER_KEYS):
+            # Encerra o evento em aberto com o gravador antigo, antes de trocá-lo
+            if self.tracker is not None:
+                closed = self.tracker.close()
+                if closed is not None:
+                    self.publish_event(closed)
+            self.tracker = self.create_event_tracker()
+        on_written = self.retention.add if self.retention is not None else None
+        if changed(WRITER_KEYS) or self.saver.on_written != on_written:
+            self.saver.close()
+            self.saver = self.create_writer()
+            self.metrics.bind("writer", self.saver)
+        if changed(DEDUPE_KEYS):
+            self.dedupe = self.create_duplicate_filter()
+            self.metrics.bind("dedupe", self.dedupe)
+        if changed(SCHEDULER_KEYS):
+            self.scheduler = self.create_scheduler()
+            self.metrics.bind("scheduler", self.scheduler)
+        self.metrics.bind("retention", self.retention)
+        self.update_geometry(backend)
+        self.preview.configure(config.get("PREVIEW_MAX_FPS", 5.0), config.get("PREVIEW_QUALITY", 70))
+        self._metrics_push_interval = config.get("METRICS_PUSH_INTERVAL", 5.0)
+        logging.info("[%s] Configuração v%d aplicada.", self.id, version)
+
+    # --- Ciclo de vida ---
+
+    def open(self, backend):
+        """Aloca os componentes da sessão para a tela de `backend`."""
+        config = self.config
+        validate_config(config)
+        self.saver = self.create_writer()
+        self.dedupe = self.create_duplicate_filter()
+        self.tracker = self.create_event_tracker()
+        self.scheduler = self.create_scheduler()
+        self.update_geometry(backend)
+        self.preview.configure(config.get("PREVIEW_MAX_FPS", 5.0), config.get("PREVIEW_QUALITY", 70))
+        self._metrics_push_interval = config.get("METRICS_PUSH_INTERVAL", 5.0)
+        self._next_metrics_push = time.monotonic() + self._metrics_push_interval
+        self.metrics.bind("scheduler", self.scheduler)
+        self.metrics.bind("writer", self.saver)
+        self.metrics.bind("dedupe", self.dedupe)
+        self.metrics.bind("retention", self.retention)
+        self._opened_at = time.monotonic()
+        self._stale = False
+        self.restart_at = None
+        self.set_status("running")
+        logging.info("[%s] Sessão de monitoramento iniciada.", self.id)
+
+    def update_geometry(self, backend):
+        """
+        (Re)ajusta as regiões à tela e recalcula os limiares.
+
+        O detector e o gravador de clipes (e os buffers deles) só são
+        recriados quando a região que usam (ou a exclusão) muda; uma troca
+        apenas de sensibilidade mantém o frame de referência.
+        """
+        config = self.config
+        cap_region = backend.clamp(config["CAPTURE_IMG"])
+        zones = detector.normalize_zones(config["COMPARE_IMG"], config["SENSIBILIDADE"])
+        if zones is None:
+            cmp_region = backend.clamp(config["COMPARE_IMG"])
+        else:
+            # Várias zonas: a detecção roda uma vez no retângulo envolvente delas
+            for zone in zones:
+                zone["region"] = backend.clamp(zone["region"])
+            cmp_region = capture.bounding_region([z["region"] for z in zones])
+        self.cap_region, self.cmp_region = cap_region, cmp_region
+
+        detector_key = (cmp_region, config.get("DETECTION_SCALE", 1.0), self.pool, masks.exclusion_key(config))
+        if detector_key != self._detector_key:
+            if self.motion is not None:
+                self.motion.close()
+            self.excluded = masks.exclusion_mask(cmp_region, config.get("EXCLUDE_IMG"), config.get("EXCLUDE_MASK"))
+            self.motion = self.create_detector()
+            self._detector_key = detector_key
+            self.zones = None
+            self.heatmap = None
+            self.metrics.bind("detector", self.motion)
+            if self.excluded is not None and self.excluded.all():
+                logging.warning("[%s] EXCLUDE_IMG/EXCLUDE_MASK ignoram toda a região de comparação.", self.id)
+            elif self.motion.coverage is not None:
+                coverage = self.motion.coverage
+                logging.info("[%s] Exclusão: %.0f%% da região ignorada, %d de %d blocos fora do pipeline",
+                             self.id, 100 * self.excluded.mean(), int((coverage == 0).sum()), coverage.size)
+        if (self.heatmap is None) == config.get("HEATMAP_ENABLED", True):
+            self.heatmap = self.create_heatmap()
+        recorder_key = (cap_region, self.retention) + tuple(config.get(k) for k in CLIP_KEYS)
+        if recorder_key != self._recorder_key:
+            if self.recorder is not None:
+                self.recorder.close()
+            self.recorder = self.create_clip_recorder()
+            self._recorder_key = recorder_key
+
+        if zones is None:
+            self.zones = None
+            # Calcula o limiar de pixels baseado no percentual de sensibilidade (só a área não ignorada)
+            area = masks.unmasked_area(self.excluded) if self.excluded is not None else None
+            self.pixel_threshold = detector.calculate_pixel_threshold(self.cmp_region, config["SENSIBILIDADE"], area)
+            logging.info("[%s] Usando CAPTURE_IMG=%s COMPARE_IMG=%s sensitivity=%d%% (limiar=%d pixels) "
+                         "interval=%.3f mode=%s", self.id, self.cap_region, self.cmp_region,
+                         config["SENSIBILIDADE"], self.pixel_threshold, config["INTERVAL"], self.capture_mode)
+        else:
+            areas = None
+            if self.excluded is not None:
+                areas = [masks.unmasked_area(self.excluded, z["region"], cmp_region) for z in zones]
+            if self.zones is not None and self.zones.regions == [z["region"] for z in zones]:
+                # Mesmas zonas sobre o mesmo detector: só os limiares mudam
+                self.zones.names = [z["name"] for z in zones]
+                self.zones.thresholds = detector.zone_thresholds(zones, areas)
+            else:
+                self.zones = detector.ZoneCounter(zones, self.cmp_region, self.motion, areas)
+            self.pixel_threshold = None
+            logging.info("[%s] Usando CAPTURE_IMG=%s COMPARE_IMG=%s (%d zonas) interval=%.3f mode=%s",
+                         self.id, self.cap_region, self.cmp_region, len(zones), config["INTERVAL"],
+                         self.capture_mode)
+            for zone, threshold in zip(zones, self.zones.thresholds):
+                logging.info("[%s]   zona '%s' %s sensitivity=%d%% (limiar=%d pixels)", self.id,
+                             zone["name"], zone["region"], zone["sensitivity"], threshold)
+
+    def due(self, now):
+        return self.scheduler.due(now)
+
+    def begin_tick(self):
+        self.scheduler.tick()
+        self.metrics.ticks.inc()
+
+    def skip_tick(self):
+        """Tick perdido por falha de captura: nenhum frame chega ao detector."""
+        self.metrics.skipped.inc()
+        self._stale = True
+        self.scheduler.advance()
+
+    def rebaseline(self):
+        """
+        Depois de falhas de captura, descarta o frame de referência: o
+        primeiro frame bom vira a nova base em vez de ser comparado com um
+        frame de antes da falha.
+        """
+        if self._stale:
+            self.motion.reset()
+            self._stale = False
+            logging.info("[%s] Captura restabelecida; nova referência de comparação.", self.id)
+
+    def submit(self, frame_B):
+        """Adianta a detecção do tick para o processo de trabalho (sem efeito no modo local)."""
+        if self.pool is not None:
+            self.motion.submit(frame_B, self.detection_limit)
+
+    def process(self, frame_A, frame_B):
+        """
+        Compara o tick atual e trata uma eventual detecção.
+
+        Os frames são views do buffer da captura, válidas só até o próximo tick.
+        """
+        config = self.config
+        motion = self.motion
+        t1 = time.perf_counter()
+        score = motion.process(frame_B, limit=self.detection_limit)
+        if score is not None and self.heatmap is not None:
+            self.heatmap.add(motion.mask, score)
+        if score is not None and self.zones is not None:
+            score, threshold, fired = self._zone_scores(score)
+        else:
+            threshold, fired = self.pixel_threshold, None
+        self.metrics.detect_seconds.observe(time.perf_counter() - t1)
+        if self.recorder is not None:
+            self.recorder.push(frame_A)
+        if score is None:
+            # Primeiro frame (ou nova geometria): apenas define a referência
+            self.scheduler.advance()
+            return
+
+        if self.preview.wants_frame():
+            self.preview.publish(frame_A, motion.frame, motion.mask)
+
+        detected = score > threshold if fired is None else bool(fired)
+        agora = datetime.now()
+        materialize = None
+        zones = None
+        if detected:
+            self.metrics.detections.inc()
+            if fired is None:
+                logging.info("[%s] Movimento detectado! score=%d", self.id, score)
+            else:
+                zones = fired
+                logging.info("[%s] Movimento detectado nas zonas %s", self.id,
+                             ", ".join(f"{z['name']} (score={z['score']})" for z in fired))
+            materialize = self._materializer(frame_A)
+            if self.recorder is not None:
+                self.recorder.trigger(capture_path(config, agora, "clip", self.recorder.extension))
+
+        if self.tracker is None:
+            if detected:
+                frames = materialize()
+                paths = save_detection(self.saver, config, agora, *frames, dedupe=self.dedupe)
+                if paths:
+                    self.publish_detection(agora, score, threshold, paths, zones=zones,
+                                           boxes=[box for box, _ in frames[2]] if frames[2] else None)
+        else:
+            closed = self.tracker.observe(time.monotonic(), agora, score, detected, materialize,
+                                          threshold, [z["name"] for z in fired] if fired else ())
+            if closed is not None:
+                self.publish_event(closed)
+
+        if time.monotonic() >= self._next_metrics_push:
+            self.publish_metrics()
+            self._next_metrics_push = time.monotonic() + self._metrics_push_interval
+
+        self.scheduler.advance(score, threshold, detected)
+
+    def _materializer(self, frame_A):
+        """
+        Função que gera os frames de uma detecção a guardar: (captura,
+        comparação, recortes), conforme CROP_MODE.
+
+        Os retângulos saem da máscara deste tick; os recortes e a conversão
+        para cinza só acontecem quando os frames vão ser guardados, em
+        arrays próprios (frame_A é uma view e motion.frame é reutilizado).
+        """
+        config = self.config
+        motion = self.motion
+        mode = self.crop_mode
+        boxes = None
+        if mode != "full":
+            boxes = crops.motion_boxes(motion.mask, motion.pixel_scale, self.cmp_region, self.cap_region,
+                                       padding=config.get("CROP_PADDING", 16),
+                                       min_area=config.get("CROP_MIN_AREA", 25),
+                                       max_boxes=config.get("CROP_MAX_BOXES", 8))
+
+        def materialize():
+            frame_B = motion.frame.copy() if config["SAVE_COMPARE_IMG"] else None
+            if boxes is None:
+                # Modo 'full' ou movimento grande/fora da captura: captura inteira
+                return cv2.cvtColor(frame_A, cv2.COLOR_BGR2GRAY), frame_B, None
+            motion_crops = list(zip(boxes, crops.crop_images(frame_A, boxes)))
+            overview = None
+            if mode == "overview":
+                overview = crops.overview_image(frame_A, config.get("OVERVIEW_SCALE", 0.25))
+            return overview, frame_B, motion_crops
+        return materialize
+
+    def _zone_scores(self, total):
+        """
+        Conta as zonas a partir da máscara do tick.
+
+        Returns:
+            tuple: (score, limiar) da zona mais próxima de disparar, usados no
+            agendamento e nos eventos, e a lista das zonas que dispararam
+        """
+        zones = self.zones
+        counts = zones.count(self.motion.mask, total)
+        fired = [{"name": zones.names[i], "score": int(counts[i]), "threshold": int(zones.thresholds[i])}
+                 for i in zones.fired(counts)]
+        strongest = int((counts / zones.thresholds).argmax())
+        return int(counts[strongest]), int(zones.thresholds[strongest]), fired
+
+    def publish_detection(self, timestamp, score, threshold, paths, end=None, detections=1, zones=None,
+                          boxes=None):
+        """
+        Publica uma detecção (ou evento encerrado) para a interface e a registra no catálogo.
+
+        `boxes` são os retângulos [x, y, w, h] dos recortes, relativos a CAPTURE_IMG.
+        """
+        data = {"session": self.id, "timestamp": timestamp.isoformat(timespec="milliseconds"),
+                "score": score, "threshold": threshold,
+                "files": [os.path.basename(p) for p in paths]}
+        if end is not None:
+            data["end"] = end.isoformat(timespec="milliseconds")
+            data["detections"] = detections
+        if zones:
+            data["zones"] = zones
+        if boxes:
+            data["boxes"] = boxes
+        self.events.publish("detection", data, key=self.id)
+        if self.catalog is not None:
+            self.catalog.record(self.id, timestamp, score, threshold, paths, end=end, detections=detections,
+                                region={"capture": list(self.cap_region), "compare": list(self.cmp_region)},
+                                zones=zones, boxes=boxes)
+
+    def publish_event(self, event):
+        """Grava e publica um evento encerrado (se algum frame dele foi gravado)."""
+        paths = save_event(self.saver, self.config, event, self.dedupe)
+        if not paths:
+            return
+        boxes = [box for _, _, frames in event.selected() for box, _ in frames[2] or ()]
+        self.publish_detection(event.start, event.peak_score, event.peak_threshold, paths,
+                               end=event.end, detections=event.detections, zones=event.zones,
+                               boxes=boxes or None)
+
+    def publish_metrics(self):
+        """Publica um resumo periódico das métricas, se houver clientes conectados."""
+        if self.events.subscriber_count:
+            self.events.publish("metrics", {"session": self.id,
+                                            "scheduler": self.scheduler.snapshot(),
+                                            "detections": self.metrics.detections.value,
+                                            "writer": self.saver.stats}, key=self.id)
+
+    def fail(self, message):
+        """Registra a exceção atual e encerra a sessão com status 'error'."""
+        log_exception(self.config, f"[{self.id}] {message}")
+        self.set_status("error")
+        self.close()
+
+    def crash(self, message):
+        """Registra a exceção atual e agenda o reinício da sessão (`schedule_restart`)."""
+        log_exception(self.config, f"[{self.id}] {message}")
+        self.schedule_restart()
+
+    def schedule_restart(self):
+        """
+        Libera os componentes e deixa a sessão em 'restarting' até a thread de
+        captura reabri-la. A espera dobra a cada falha seguida, de
+        RESTART_BASE_DELAY até RESTART_MAX_DELAY; uma sessão que rodou ao menos
+        RESTART_MAX_DELAY desde o último início volta à espera base.
+        """
+        config = self.config
+        base_delay = config.get("RESTART_BASE_DELAY", 5)
+        max_delay = config.get("RESTART_MAX_DELAY", 300)
+        now = time.monotonic()
+        if self._opened_at is not None and now - self._opened_at >= max_delay:
+            self._restart_attempt = 0
+        self._opened_at = None
+        delay = scheduler.restart_delay(self._restart_attempt, base_delay, max_delay)
+        self._restart_attempt += 1
+        self.metrics.errors.inc()
+        self.release()
+        self.restart_at = now + delay
+        self.set_status("restarting")
+        logging.warning("[%s] Reiniciando a sessão em %.1f s (tentativa %d).", self.id, delay,
+                        self._restart_attempt)
+
+    def close(self):
+        """Libera os componentes (gravando o que estiver pendente) e sinaliza o fim."""
+        try:
+            self.release()
+        finally:
+            self.restart_at = None
+            self._restart_attempt = 0
+            self._opened_at = None
+            if self.status != "error":
+                self.set_status("stopped")
+            self._stopped.set()
+            logging.info("[%s] Sessão de monitoramento finalizada.", self.id)
+
+    def release(self):
+        """Libera os componentes, gravando o que estiver pendente."""
+        try:
+            if self.motion is not None:
+                logging.info("[%s] Estatísticas da detecção: %s", self.id, self.motion.stats)
+                self.motion.close()
+            if self.recorder is not None:
+                self.recorder.close()
+                logging.info("[%s] Estatísticas de clipes: %s", self.id, self.recorder.stats)
+            if self.tracker is not None:
+                closed = self.tracker.close()
+                if closed is not None and self.saver is not None:
+                    self.publish_event(closed)
+                logging.info("[%s] Estatísticas de eventos: %s", self.id, self.tracker.stats)
+            if self.saver is not None:
+                self.saver.close()
+                logging.info("[%s] Estatísticas de gravação: %s", self.id, self.saver.stats)
+            if self.dedupe is not None:
+                logging.info("[%s] Capturas duplicadas descartadas: %s", self.id, self.dedupe.stats)
+        finally:
+            self._reset()
+            for name in ("scheduler", "writer", "detector", "dedupe", "retention"):
+                self.metrics.bind(name, None)
+
+
+class MonitorManager:
+    """
+    Sessões nomeadas e a thread de captura compartilhada entre elas.
+
+    A thread só existe enquanto houver sessões ativas. Pedidos de início e
+    parada apenas marcam a sessão; quem abre e fecha os componentes é a
+    própria thread de captura, entre dois ticks. Ela também reabre a sessão
+    de captura (backend) e as sessões que falharam, no prazo de cada uma.
+    """
+
+    def __init__(self, backend_factory=capture.open_session, events=None):
+        """
+        Args:
+            backend_factory: Função que abre a CaptureSession (tela ou outra fonte)
+            events: Broadcaster compartilhado pelas sessões
+        """
+        self.backend_factory = backend_factory
+        self.events = events if events is not None else broadcast.Broadcaster()
+        self.sessions = {}
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pool = None  # Processos de detecção, criados pela primeira sessão em modo "process"
+        self._retired_pools = []  # Pools substituídos, encerrados quando nenhuma sessão os usa mais
+        self.catalog = None  # catalog.Catalog onde as sessões registram as detecções (opcional)
+        self._retention = {}  # RetentionManager por CAPTURE_DIR (caminho absoluto)
+        self._capture_failures = 0  # Ticks seguidos com falha de captura
+
+    # --- Sessões ---
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def add(self, session_id, config):
+        """Cria (ou reconfigura, se estiver parada) a sessão `session_id`."""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = MonitorSession(session_id, config, self.events)
+            elif session.active:
+                raise RuntimeError(f"A sessão '{session_id}' está em execução.")
+            else:
+                session.set_config(config)
+            return session
+
+    def reconfigure(self, session_id, config):
+        """
+        Troca a configuração de uma sessão: na hora, se estiver parada, ou no
+        próximo tick da thread de captura, se estiver ativa.
+
+        Returns:
+            int: Versão da configuração
+
+        Raises:
+            ValueError: Se a configuração for inválida
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or not session.active:
+                return self.add(session_id, config).config_version
+            version = session.reconfigure(config)
+        self._wake.set()
+        return version
+
+    def remove(self, session_id):
+        """Remove uma sessão parada."""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None and session.active:
+                raise RuntimeError(f"A sessão '{session_id}' está em execução.")
+            return self.sessions.pop(session_id, None) is not None
+
+    def start(self, session_id):
+        """
+        Agenda o início da sessão na thread de captura (iniciando-a se preciso).
+
+        Returns:
+            bool: False se a sessão não existe ou já está ativa
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or session.active:
+                return False
+            session.mark_starting()
+            if self._thread is None:
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self.run, args=(self._stop_event, self._wake),
+                                                name="monitor-capture", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return True
+
+    def stop(self, session_id, timeout=None):
+        """
+        Pede a parada da sessão e aguarda a thread de captura encerrá-la.
+
+        Returns:
+            bool: False se a sessão não estava ativa ou não parou a tempo
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or not session.active:
+                return False
+            session.stop_requested = True
+            session.set_status("stopping")
+        self._wake.set()
+        return session.wait_stopped(timeout)
+
+    def shutdown(self, timeout=None):
+        """Encerra todas as sessões e a thread de captura."""
+        with self._lock:
+            thread = self._thread
+            for session in self.sessions.values():
+                if session.active:
+                    session.stop_requested = True
+        self._stop_event.set()
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    # --- Thread de captura ---
+
+    def run(self, stop_event, wake=None):
+        """
+        Loop da captura compartilhada; roda até `stop_event` ou até não
+        restarem sessões ativas. `wake` interrompe a espera entre ticks
+        (padrão: o próprio `stop_event`).
+
+        Uma falha fatal da captura fecha o backend e agenda o reinício das
+        sessões; o backend é reaberto quando a primeira delas voltar.
+        """
+        waiter = wake or stop_event
+        backend = None
+        grabbers = {}
+        opened = set()  # Sessões abertas por esta thread
+        idle = False
+        logging.info("Thread de captura iniciada.")
+        try:
+            while not stop_event.is_set():
+                try:
+                    active, backend = self._sync(backend, opened)
+                    if not active and self._next_deadline() is None:
+                        idle = True
+                        break
+                    if active and backend.check_geometry():
+                        grabbers.clear()
+                        for session in active:
+                            session.update_geometry(backend)
+
+                    now = time.monotonic() + DUE_TOLERANCE
+                    due = [s for s in active if s.due(now)]
+                    if due:
+                        self._tick(backend, due, grabbers)
+                except capture.SourceExhausted:
+                    raise
+                except Exception as e:
+                    grabbers.clear()
+                    self._crash(backend, f"Erro fatal na thread de captura: {e}")
+                    backend = None
+
+                deadline = self._next_deadline()
+                timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else 0.0
+                if waiter.wait(timeout) and waiter is not stop_event:
+                    waiter.clear()
+        except capture.SourceExhausted:
+            logging.info("Fonte de frames encerrada.")
+        finally:
+            if backend is not None:
+                backend.close()
+            with self._lock:
+                pools = self._retired_pools + ([self._pool] if self._pool is not None else [])
+                self._pool, self._retired_pools = None, []
+                services, self._retention = list(self._retention.values()), {}
+                for session in self.sessions.values():
+                    # Sessões iniciadas depois de uma saída por ociosidade são da próxima thread
+                    if (session in opened and not session._stopped.is_set()) or \
+                            (not idle and session.status in ("starting", "restarting", "stopping", "error")
+                             and not session._stopped.is_set()):
+                        session.close()
+                if self._thread is threading.current_thread():
+                    self._thread = None
+            for pool in pools:
+                pool.close()
+            for service in services:
+                service.close()
+            logging.info("Thread de captura finalizada.")
+
+    def _sync(self, backend, opened):
+        """
+        Abre as sessões recém-iniciadas e as com reinício vencido, fecha as
+        que pediram parada e retorna (sessões em execução, backend). O
+        backend é aberto quando uma sessão precisa dele.
+        """
+        with self._lock:
+            active = []
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if session.stop_requested and session.active:
+                    session.close()
+                elif session.status == "starting" or (session.status == "restarting" and session.restart_at <= now):
+                    if backend is None:
+                        backend = self.backend_factory()
+                        self._capture_failures = 0
+                        logging.info("Backend escolhido: %s", backend.name)
+                    restarting = session.status == "restarting"
+                    opened.add(session)
+                    try:
+                        if restarting:
+                            # Uma configuração salva durante a espera vale já no reinício
+                            pending = session.take_pending_config()
+                            if pending is not None:
+                                session.config_version, session.config = pending
+                        session.pool = self._detection_pool(session.config)
+                        session.catalog = self.catalog
+                        session.retention = self._retention_service(session.config)
+                        session.open(backend)
+                    except Exception as e:
+                        if restarting:
+                            session.crash(f"Falha ao reiniciar a sessão: {e}")
+                        else:
+                            session.fail(f"Falha ao iniciar a sessão: {e}")
+                        continue
+                    if restarting:
+                        session.metrics.restarts.inc()
+                    active.append(session)
+                elif session.status == "running":
+                    pending = session.take_pending_config()
+                    if pending is not None:
+                        try:
+                            session.pool = self._detection_pool(pending[1])
+                            session.retention = self._retention_service(pending[1])
+                            session.apply_config(backend, *pending)
+                        except Exception as e:
+                            session.crash(f"Falha ao aplicar a configuração v{pending[0]}: {e}")
+                            continue
+                    active.append(session)
+            self._close_retired_pools()
+            if not active and self._next_deadline() is None and self._thread is threading.current_thread():
+                # Decidido sob o lock: um `start` concorrente cria uma nova thread
+                self._thread = None
+            return active, backend
+
+    def _next_deadline(self):
+        """Prazo mais próximo entre os ticks das sessões em execução e os reinícios agendados (ou None)."""
+        with self._lock:
+            deadlines = [s.scheduler.deadline if s.status == "running" else s.restart_at
+                         for s in self.sessions.values() if s.status in ("running", "restarting")]
+        return min(deadlines) if deadlines else None
+
+    def _crash(self, backend, message):
+        """
+        Falha da captura compartilhada: fecha o backend e agenda o reinício
+        das sessões ativas (as que pediram parada são encerradas). As que
+        esperavam o backend para reiniciar voltam a esperar, por mais tempo.
+        """
+        now = time.monotonic()
+        with self._lock:
+            failed = [s for s in self.sessions.values()
+                      if s.active and (s.status != "restarting" or s.restart_at <= now)]
+            config = failed[0].config if failed else {}
+            log_exception(config, message)
+            if backend is not None:
+                try:
+                    backend.close()
+                except Exception as e:
+                    logging.warning(f"Falha ao fechar o backend '{backend.name}': {e}")
+            self._capture_failures = 0
+            for session in failed:
+                if session.stop_requested:
+                    session.close()
+                else:
+                    session.schedule_restart()
+
+    def _detection_pool(self, config):
+        """Pool de processos para uma sessão com DETECTION_MODE = "process" (ou None)."""
+        if config.get("DETECTION_MODE", "thread") != "process":
+            return None
+        workers_count = config.get("DETECTION_WORKERS")
+        pool = self._pool
+        if pool is not None and (not pool.alive or pool.workers != workers_count):
+            # Processo morto ou DETECTION_WORKERS alterado: as sessões passam para um pool
+            # novo (recriando o detector) e o antigo é encerrado quando nenhuma o usar
+            if not pool.alive:
+                logging.warning("Processo de detecção encerrado; recriando o pool.")
+            self._retired_pools.append(pool)
+            self._pool = None
+        if self._pool is None:
+            import workers  # Importado sob demanda: só o modo "process" precisa dele
+            self._pool = workers.DetectionPool(workers_count)
+            logging.info("Detecção em %d processo(s) de trabalho.", self._pool.size)
+        return self._pool
+
+    def _close_retired_pools(self):
+        """Encerra os pools substituídos que nenhuma sessão usa mais."""
+        for pool in list(self._retired_pools):
+            if not any(s.pool is pool for s in self.sessions.values()):
+                self._retired_pools.remove(pool)
+                pool.close()
+
+    def _retention_service(self, config):
+        """RetentionManager do CAPTURE_DIR da sessão, se houver cota ou idade máxima (ou None)."""
+        max_bytes = config.get("RETENTION_MAX_BYTES")
+        max_age_days = config.get("RETENTION_MAX_AGE_DAYS")
+        if not max_bytes and not max_age_days:
+            return None
+        root = config["CAPTURE_DIR"]
+        key = os.path.abspath(root)
+        service = self._retention.get(key)
+        if service is None:
+            # Sessões que gravam no mesmo diretório dividem a mesma cota
+            service = self._retention[key] = retention.RetentionManager(
+                root, max_bytes, max_age_days * 86400 if max_age_days else None,
+                config.get("RETENTION_INTERVAL", retention.SWEEP_INTERVAL), on_evicted=self._captures_evicted)
+        return service
+
+    def _captures_evicted(self, paths):
+        """Apaga do catálogo as miniaturas das capturas removidas pela retenção."""
+        events_catalog = self.catalog
+        if events_catalog is not None:
+            events_catalog.forget_files(paths)
+
+    def _tick(self, backend, due, grabbers):
+        """Captura a tela uma vez e entrega as views de cada sessão com prazo vencido."""
+        for session in due:
+            session.begin_tick()
+        t0 = time.perf_counter()
+        try:
+            backend.begin_frame()
+            frames = self._grab(backend, due, grabbers)
+        except capture.SourceExhausted:
+            raise
+        except Exception as e:
+            # O tick é descartado: um frame com falha nunca chega ao detector
+            self._capture_failures += 1
+            logging.error(f"Falha ao capturar frame com backend '{backend.name}': {e}")
+            for session in due:
+                session.skip_tick()
+            limit = min(s.config.get("CAPTURE_FAILURE_LIMIT", CAPTURE_FAILURE_LIMIT) for s in due)
+            if self._capture_failures >= limit:
+                raise capture.CaptureFailed(f"{self._capture_failures} falhas seguidas de captura: {e}") from e
+            return
+        elapsed = time.perf_counter() - t0
+        self._capture_failures = 0
+
+        # No modo "process" todas as sessões do tick são detectadas em paralelo
+        for session, (_, frame_B) in zip(due, frames):
+            try:
+                session.rebaseline()
+                session.submit(frame_B)
+            except Exception as e:
+                session.crash(f"Erro fatal na sessão de monitoramento: {e}")
+        for session, (frame_A, frame_B) in zip(due, frames):
+            if session.status != "running":
+                continue
+            session.metrics.capture_seconds.observe(elapsed)
+            try:
+                session.process(frame_A, frame_B)
+            except Exception as e:
+                session.crash(f"Erro fatal na sessão de monitoramento: {e}")
+
+    def _grab(self, backend, due, grabbers):
+        """
+        Retorna (frame_A, frame_B) de cada sessão, na ordem de `due`.
+
+        Várias sessões compartilham uma captura do retângulo envolvente
+        quando ele não desperdiça área demais; senão cada uma recorta a
+        sua captura, sempre do mesmo tick (`begin_frame` já foi chamado).
+        """
+        if len(due) == 1:
+            groups = [(due, due[0].capture_mode)]
+        else:
+            own_area = 0
+            for session in due:
+                _, _, w, h = capture.bounding_region(session.regions)
+                own_area += w * h
+            _, _, w, h = capture.bounding_region([r for s in due for r in s.regions])
+            if w * h <= SHARED_GRAB_MAX_OVERHEAD * own_area:
+                groups = [(due, "union")]
+            else:
+                groups = [([s], s.capture_mode) for s in due]
+
+        frames = []
+        for sessions, mode in groups:
+            regions = [r for s in sessions for r in s.regions]
+            key = (tuple(regions), mode)
+            grabber = grabbers.get(key)
+            if grabber is None:
+                if len(grabbers) >= MAX_GRABBERS:
+                    grabbers.clear()
+                grabber = grabbers[key] = capture.RegionGrabber(backend, regions, mode)
+            views = grabber.grab(new_frame=False)
+            frames.extend(zip(views[0::2], views[1::2]))
+        return frames
+
+    # --- Consulta ---
+
+    def render_prometheus(self):
+        """Métricas de todas as sessões no formato de texto do Prometheus."""
+        with self._lock:
+            sessions = list(self.sessions.values())
+        return metrics.render_prometheus([({"session": s.id}, s.metrics) for s in sessions])
+
+    def metrics_snapshot(self):
+        """Métricas de todas as sessões como dicionário (JSON)."""
+        with self._lock:
+            sessions = list(self.sessions.values())
+        return {s.id: s.metrics.snapshot() for s in sessions}
@@ -0,0 +1,192 @@
+"""
+Fontes de frames alternativas à tela do MonitCam.
+
+Cada fonte se comporta como uma CaptureSession sobre uma "tela virtual":
+as regiões CAPTURE_IMG/COMPARE_IMG são recortadas dela exatamente como
+seriam da tela real, o que permite rodar o monitoramento e os benchmarks
+sem desktop (ex.: em uma máquina de CI).
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from capture import CaptureSession, SourceExhausted
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+
+
+class VirtualScreenSession(CaptureSession):
+    """Base das fontes que mantêm o frame atual em `self._screen` (BGR)."""
+
+    name = "virtual"
+
+    def __init__(self, **kwargs):
+        self._screen = None
+        self.frame_index = -1
+        super().__init__(**kwargs)
+
+    def _query_screen_size(self):
+        height, width = self._screen.shape[:2]
+        return width, height
+
+    def begin_frame(self):
+        self.frame_index += 1
+        if not self._next_frame():
+            raise SourceExhausted(f"Fonte '{self.name}' sem mais frames")
+
+    def _grab_into(self, left, top, w, h, out):
+        np.copyto(out, self._screen[top:top + h, left:left + w])
+
+    def _next_frame(self):
+        """Avança `self._screen` para o próximo frame; retorna False no fim."""
+        raise NotImplementedError
+
+
+class SyntheticSource(VirtualScreenSession):
+    """
+    Gera frames sintéticos: um fundo estático com textura e, a cada frame,
+    com probabilidade `motion_probability`, um retângulo em posição aleatória.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, size=(1280, 720), frames=None, motion_probability=0.1,
+                 blob_size=(60, 60), seed=0, **kwargs):
+        """
+        Args:
+            size: Tamanho (largura, altura) da tela virtual
+            frames: Quantidade de frames (None = infinito)
+            motion_probability: Chance de um frame conter movimento
+            blob_size: Tamanho (largura, altura) do retângulo em movimento
+            seed: Semente do gerador aleatório
+        """
+        self.size = tuple(size)
+        self.frames = frames
+        self.motion_probability = motion_probability
+        self.blob_size = tuple(blob_size)
+        self._rng = np.random.default_rng(seed)
+        super().__init__(**kwargs)
+
+    def _open(self):
+        width, height = self.size
+        self._background = self._rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        cv2.GaussianBlur(self._background, (9, 9), 0, dst=self._background)
+        self._screen = self._background.copy()
+        self._dirty = None
+
+    def _next_frame(self):
+        if self.frames is not None and self.frame_index >= self.frames:
+            return False
+        if self._dirty is not None:
+            # Restaura apenas a área alterada no frame anterior
+            x, y, w, h = self._dirty
+            self._screen[y:y + h, x:x + w] = self._background[y:y + h, x:x + w]
+            self._dirty = None
+        if self._rng.random() < self.motion_probability:
+            width, height = self.size
+            w = min(self.blob_size[0], width)
+            h = min(self.blob_size[1], height)
+            x = int(self._rng.integers(0, width - w + 1))
+            y = int(self._rng.integers(0, height - h + 1))
+            self._screen[y:y + h, x:x + w] = self._rng.integers(0, 256, 3, dtype=np.uint8)
+            self._dirty = (x, y, w, h)
+        return True
+
+
+class ImageDirectorySource(VirtualScreenSession):
+    """
+    Reproduz as imagens de um diretório em ordem alfabética, uma por frame.
+
+    Imagens com tamanho diferente da primeira são redimensionadas para ele.
+    """
+
+    name = "directory"
+
+    def __init__(self, directory, loop=False, **kwargs):
+        self.directory = directory
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(directory, f) for f in os.listdir(directory)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.files:
+            raise ValueError(f"Nenhuma imagem encontrada em '{directory}'")
+        super().__init__(**kwargs)
+
+    def _open(self):
+        self._screen = self._read(0)
+
+    def _read(self, index):
+        image = cv2.imread(self.files[index], cv2.IMREAD_COLOR)
+        if image is None:
+            raise IOError(f"Não foi possível ler '{self.files[index]}'")
+        return image
+
+    def _next_frame(self):
+        index = self.frame_index
+        if index >= len(self.files):
+            if not self.loop:
+                return False
+            index %= len(self.files)
+        image = self._read(index)
+        if image.shape != self._screen.shape:
+            # A geometria da tela virtual é a da primeira imagem
+            height, width = self._screen.shape[:2]
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        self._screen = image
+        return True
+
+
+class VideoSource(VirtualScreenSession):
+    """Reproduz um arquivo de vídeo com cv2.VideoCapture, um frame por tick."""
+
+    name = "video"
+
+    def __init__(self, path, loop=False, **kwargs):
+        self.path = path
+        self.loop = loop
+        self._video = None
+        super().__init__(**kwargs)
+
+    def _open(self):
+        self._video = cv2.VideoCapture(self.path)
+        ok, frame = self._video.read()
+        if not ok:
+            raise IOError(f"Não foi possível ler o vídeo '{self.path}'")
+        self._screen = frame
+        self._first = True
+
+    def _close(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+    def _next_frame(self):
+        if self._first:
+            # O primeiro frame já foi lido em _open para descobrir a geometria
+            self._first = False
+            return True
+        ok, _ = self._video.read(self._screen)
+        if not ok and self.loop:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, _ = self._video.read(self._screen)
+        return ok
+
+
+def open_source(spec, **kwargs):
+    """
+    Abre uma fonte de frames a partir de uma descrição textual.
+
+    Args:
+        spec: 'synthetic', caminho de um diretório de imagens ou de um vídeo
+
+    Returns:
+        CaptureSession: Fonte aberta
+    """
+    if spec == "synthetic":
+        return SyntheticSource(**kwargs)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, **kwargs)
+    return VideoSource(spec, **kwargs)
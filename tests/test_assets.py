@@ -0,0 +1,54 @@
+"""Arquivos estáticos da interface: ETag, 304, gzip e a lista fixa de arquivos."""
+
+import gzip
+import os
+import time
+
+import assets
+import server
+
+SCRIPT = "console.log('monitcam');\n" * 40
+
+
+def test_asset_gzip_and_etag(tmp_path):
+    (tmp_path / "script.js").write_text(SCRIPT)
+    (tmp_path / "style.css").write_text("body{}")
+    static = assets.StaticAssets(str(tmp_path))
+    script = static.get("script.js")
+    assert script.mimetype.startswith("application/javascript")
+    assert gzip.decompress(script.gzip) == SCRIPT.encode()
+    assert static.get("style.css").gzip is None  # Pequeno demais para compensar
+    assert static.get("index.html") is None  # Na lista, mas não existe
+    assert static.get("config.json") is None  # Fora da lista
+
+
+def test_reload_picks_up_changed_file(tmp_path):
+    path = tmp_path / "script.js"
+    path.write_text(SCRIPT)
+    fixed, reloading = assets.StaticAssets(str(tmp_path)), assets.StaticAssets(str(tmp_path), reload=True)
+    etag = fixed.get("script.js").etag
+    path.write_text(SCRIPT + "// v2\n")
+    later = time.time() + 10
+    os.utime(path, (later, later))
+    assert fixed.get("script.js").etag == etag
+    assert reloading.get("script.js").etag != etag
+
+
+def test_static_route_revalidates_and_compresses():
+    client = server.app.test_client()
+    response = client.get("/script.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == "no-cache" and response.headers["Vary"] == "Accept-Encoding"
+    etag = response.headers["ETag"]
+    again = client.get("/script.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+    plain = client.get("/script.js")
+    assert "Content-Encoding" not in plain.headers and plain.headers["ETag"] != etag
+    assert client.get("/script.js", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_static_route_only_serves_listed_files():
+    client = server.app.test_client()
+    for path in ("/config.json", "/server.py", "/requirements.txt", "/../config.json", "/tests/conftest.py"):
+        assert client.get(path).status_code == 404
@@ -0,0 +1,78 @@
+"""Catálogo das detecções: miniaturas e paginação."""
+
+import os
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import pytest
+
+import catalog
+import retention
+
+
+def save_capture(directory, timestamp):
+    path = os.path.join(str(directory), f"suspeito_{timestamp:%Y%m%d_%H%M%S}_000_A.png")
+    cv2.imwrite(path, np.full((48, 64, 3), 128, dtype=np.uint8))
+    return path
+
+
+def test_retention_evicts_thumbnails_with_their_captures(tmp_path):
+    events = catalog.Catalog(str(tmp_path / "catalog.db"))
+    manager = retention.RetentionManager(str(tmp_path), max_age=3600, interval=3600,
+                                         on_evicted=events.forget_files)
+    try:
+        old, new = datetime.now() - timedelta(days=1), datetime.now()
+        old_path, new_path = save_capture(tmp_path, old), save_capture(tmp_path, new)
+        os.utime(old_path, (old.timestamp(), old.timestamp()))
+        events.record("default", old, 10, 5, [old_path])
+        events.record("default", new, 10, 5, [new_path])
+        events.flush()
+        new_id, old_id = (event["id"] for event in events.query()[0])
+        assert events.thumbnail(old_id, 32) and events.thumbnail(new_id, 32)
+        assert len(os.listdir(events.thumb_dir)) == 2
+
+        manager.add(old_path)
+        manager.add(new_path)
+        assert manager.sweep()[0] == 1
+        assert len(os.listdir(events.thumb_dir)) == 1
+        assert events.thumbnail(old_id, 32) is None
+        assert os.path.exists(events.thumbnail(new_id, 32))
+    finally:
+        manager.close()
+        events.close()
+
+
+def test_cursor_pagination_walks_all_events_once(tmp_path):
+    events = catalog.Catalog(str(tmp_path / "catalog.db"))
+    try:
+        start = datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(25):
+            # Pares com o mesmo horário: o id desempata
+            events.record("cam1" if i % 2 else "cam2", start + timedelta(seconds=i // 2), i, 5, [f"{i}.png"])
+        events.flush()
+        seen, cursor = [], None
+        while True:
+            page, cursor = events.query(cursor=cursor, limit=10)
+            seen.extend(page)
+            if cursor is None:
+                break
+        assert len(seen) == 25 and len({e["id"] for e in seen}) == 25
+        keys = [(e["timestamp"], e["id"]) for e in seen]
+        assert keys == sorted(keys, reverse=True)
+
+        page, cursor = events.query(session="cam1", limit=100)
+        assert len(page) == 12 and cursor is None
+        since = (start + timedelta(seconds=10)).isoformat()
+        assert [e["score"] for e in events.query(since=since)[0]] == [24, 23, 22, 21, 20]
+    finally:
+        events.close()
+
+
+def test_invalid_cursor_is_rejected(tmp_path):
+    events = catalog.Catalog(str(tmp_path / "catalog.db"))
+    try:
+        with pytest.raises(ValueError):
+            events.query(cursor="nao-e-um-cursor")
+    finally:
+        events.close()
@@ -0,0 +1,93 @@
+"""
+Gravação da configuração: o formulário da interface é mesclado à
+configuração salva e as sessões ativas aplicam a nova no próximo tick.
+"""
+
+import json
+import time
+
+import pytest
+
+import main
+import server
+import sessions
+import sources
+
+BASE_CONFIG = {"CAPTURE_IMG": [0, 0, 640, 480], "COMPARE_IMG": [100, 100, 200, 200], "SENSIBILIDADE": 80,
+               "INTERVAL": 0.333, "CAPTURE_DIR": "captures", "FILENAME_PREFIX": "suspeito", "SAVE_COMPARE_IMG": False,
+               "SAVE_FORMAT": "jpg"}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    (tmp_path / "config.json").write_text(json.dumps(BASE_CONFIG), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "APP_CONFIG", {})
+    monkeypatch.setattr(main, "monitor_manager", None)
+    return tmp_path
+
+
+def stored(workdir):
+    return json.loads((workdir / "config.json").read_text(encoding="utf-8"))
+
+
+def test_form_save_keeps_sessions_and_other_keys(workdir):
+    client = server.app.test_client()
+    assert client.put("/sessions/cam2", json={"COMPARE_IMG": [10, 10, 50, 50]}).status_code == 200
+    # A interface envia só os campos do formulário
+    response = client.post("/save_config", json={"SENSIBILIDADE": 70, "INTERVAL": 0.5})
+    assert response.status_code == 200 and response.json["success"]
+    config = stored(workdir)
+    assert config["SENSIBILIDADE"] == 70 and config["INTERVAL"] == 0.5
+    assert config["SESSIONS"] == {"cam2": {"COMPARE_IMG": [10, 10, 50, 50]}}
+    assert config["SAVE_FORMAT"] == "jpg"
+    assert client.get("/get_config").json == config
+
+
+def test_invalid_save_leaves_config_untouched(workdir):
+    client = server.app.test_client()
+    response = client.post("/save_config", json={"SENSIBILIDADE": 80, "CAPTURE_IMG": [0, 0, -1, 10]})
+    assert response.status_code == 400
+    assert client.post("/save_config", json=[1, 2]).status_code == 400
+    assert stored(workdir) == BASE_CONFIG
+
+
+def test_update_config_loads_stored_config_first(workdir):
+    assert main.update_config({"SENSIBILIDADE": 90})["success"]
+    assert stored(workdir) == dict(BASE_CONFIG, SENSIBILIDADE=90)
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_running_session_applies_new_config_at_next_tick(tmp_path):
+    config = dict(BASE_CONFIG, CAPTURE_DIR=str(tmp_path / "captures"), INTERVAL=0.01)
+    manager = sessions.MonitorManager(lambda: sources.SyntheticSource(size=(640, 480), motion_probability=0))
+    manager.add("a", config)
+    assert manager.start("a")
+    session = manager.get("a")
+    try:
+        assert wait_for(lambda: session.status == "running" and session.motion is not None)
+        motion, threshold = session.motion, session.pixel_threshold
+
+        version = manager.reconfigure("a", dict(config, SENSIBILIDADE=50))
+        assert wait_for(lambda: session.config_version == version)
+        assert session.status == "running"
+        assert session.pixel_threshold == 200 * 200 // 2 != threshold
+        assert session.motion is motion  # Mesma geometria: o detector (e a referência) continua
+
+        version = manager.reconfigure("a", dict(config, COMPARE_IMG=[0, 0, 320, 240]))
+        assert wait_for(lambda: session.config_version == version)
+        assert session.motion is not motion and session.cmp_region == (0, 0, 320, 240)
+
+        with pytest.raises(ValueError):
+            manager.reconfigure("a", dict(config, CAPTURE_IMG=[0, 0, -1, 10]))
+        assert session.latest_config_version == version
+    finally:
+        manager.shutdown(timeout=10)
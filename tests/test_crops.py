@@ -0,0 +1,52 @@
+"""Recorte das capturas na área do movimento (CROP_MODE)."""
+
+import numpy as np
+
+import crops
+
+CAP = (0, 0, 400, 300)
+CMP = (100, 50, 200, 200)
+
+
+def mask_with(*blocks, shape=(200, 200)):
+    mask = np.zeros(shape, dtype=np.uint8)
+    for y0, y1, x0, x1 in blocks:
+        mask[y0:y1, x0:x1] = 255
+    return mask
+
+
+def test_boxes_are_in_capture_coordinates_with_padding():
+    mask = mask_with((20, 40, 30, 60))
+    assert crops.motion_boxes(mask, 1.0, CMP, CAP, padding=5) == [[125, 65, 40, 30]]
+
+
+def test_scaled_mask_boxes_and_min_area_in_original_pixels():
+    # Máscara a 1/2: cada pixel dela vale 4 pixels originais
+    mask = mask_with((10, 20, 15, 30), (50, 52, 50, 52), shape=(100, 100))
+    boxes = crops.motion_boxes(mask, 4.0, CMP, CAP, padding=0, min_area=25)
+    assert boxes == [[130, 70, 30, 20]]  # O componente de 2x2 (16 pixels originais) fica de fora
+
+
+def test_overlapping_boxes_are_merged_and_clipped():
+    mask = mask_with((0, 20, 0, 20), (15, 30, 15, 30), (150, 160, 150, 160))
+    boxes = crops.motion_boxes(mask, 1.0, (0, 0, 200, 200), (0, 0, 400, 300), padding=2)
+    assert boxes == [[0, 0, 32, 32], [148, 148, 14, 14]]
+
+
+def test_too_many_boxes_become_one():
+    mask = mask_with(*[(y, y + 4, x, x + 4) for y in range(0, 40, 10) for x in range(0, 40, 10)])
+    boxes = crops.motion_boxes(mask, 1.0, CMP, CAP, padding=0, min_area=1, max_boxes=8)
+    assert boxes == [[100, 50, 34, 34]]
+
+
+def test_large_or_empty_motion_saves_full_capture():
+    assert crops.motion_boxes(mask_with(), 1.0, CMP, CAP) is None
+    assert crops.motion_boxes(mask_with((0, 200, 0, 200)), 1.0, (0, 0, 200, 200), (0, 0, 200, 200)) is None
+
+
+def test_crop_and_overview_images():
+    frame = np.zeros((300, 400, 3), dtype=np.uint8)
+    frame[65:95, 125:165] = (0, 0, 255)
+    crop, = crops.crop_images(frame, [[125, 65, 40, 30]])
+    assert crop.shape == (30, 40) and crop.flags.owndata and crop.min() > 0
+    assert crops.overview_image(frame, 0.25).shape == (75, 100)
@@ -0,0 +1,135 @@
+"""MotionDetector: cascata com parada antecipada, detecção reduzida e zonas."""
+
+import numpy as np
+import pytest
+
+import detector
+
+SHAPE = (240, 320)
+
+
+def frames(count, seed=0):
+    """Frames cinza de SHAPE com ruído e blocos em movimento."""
+    rng = np.random.default_rng(seed)
+    result = []
+    for _ in range(count):
+        image = rng.integers(0, 20, SHAPE, dtype=np.uint8)
+        for _ in range(rng.integers(0, 4)):
+            y, x = rng.integers(0, SHAPE[0] - 40), rng.integers(0, SHAPE[1] - 40)
+            image[y:y + 40, x:x + 40] = 220
+        result.append(image)
+    return result
+
+
+def test_banded_count_matches_full_pipeline():
+    full = detector.MotionDetector(SHAPE)
+    banded = detector.MotionDetector(SHAPE, band_rows=32)
+    for image in frames(30):
+        expected = full.process(image)
+        # Limite acima de qualquer score: todas as faixas são processadas
+        assert banded.process(image, limit=SHAPE[0] * SHAPE[1]) == expected
+        assert banded.mask_complete
+        assert np.array_equal(banded.mask, full.mask)
+    assert banded.stats["full"] == full.stats["full"]
+
+
+def test_early_exit_is_a_lower_bound_of_the_full_score():
+    full = detector.MotionDetector(SHAPE)
+    banded = detector.MotionDetector(SHAPE, band_rows=32)
+    exits = 0
+    for image in frames(30, seed=1):
+        expected = full.process(image)
+        score = banded.process(image, limit=100)
+        if expected is None:
+            continue
+        # A decisão (passou do limite ou não) é a mesma da contagem completa
+        assert (score > 100) == (expected > 100)
+        assert score <= expected
+        exits += not banded.mask_complete
+        # As linhas processadas têm a mesma máscara da contagem completa
+        done = banded.mask.any(axis=1).nonzero()[0]
+        if done.size:
+            rows = slice(0, done[-1] + 1)
+            assert np.array_equal(banded.mask[rows], full.mask[rows])
+    assert exits > 0
+
+
+def test_unchanged_frame_skips_pipeline():
+    motion = detector.MotionDetector(SHAPE)
+    image = frames(1)[0]
+    assert motion.process(image) is None
+    assert motion.process(image) == 0
+    assert motion.stats["unchanged"] == 1 and not motion.mask.any()
+
+
+@pytest.mark.parametrize("scale", [0.5, 0.25])
+def test_scaled_score_is_in_original_pixels(scale):
+    full = detector.MotionDetector(SHAPE)
+    scaled = detector.MotionDetector(SHAPE, scale=scale)
+    assert scaled.shape == detector.detection_shape(SHAPE, scale)
+    base = np.zeros(SHAPE, dtype=np.uint8)
+    moved = base.copy()
+    moved[80:160, 120:200] = 255
+    for motion in (full, scaled):
+        motion.process(base)
+    expected = full.process(moved)
+    score = scaled.process(moved)
+    # O mesmo limiar (em pixels originais) vale em qualquer escala
+    assert abs(score - expected) <= 0.15 * expected
+    threshold = detector.calculate_pixel_threshold((0, 0, SHAPE[1], SHAPE[0]), 95)
+    assert (score > threshold) == (expected > threshold)
+
+
+def test_scaled_limit_is_in_original_pixels():
+    motion = detector.MotionDetector(SHAPE, scale=0.5, band_rows=16)
+    base = np.zeros(SHAPE, dtype=np.uint8)
+    moved = base.copy()
+    moved[:, 100:200] = 255
+    motion.process(base)
+    score = motion.process(moved, limit=2000)
+    assert motion.stats["early_exit"] == 1
+    assert 2000 < score < SHAPE[0] * 100
+
+
+def test_invalid_scale_is_rejected():
+    with pytest.raises(ValueError):
+        detector.MotionDetector(SHAPE, scale=1.5)
+
+
+def test_zone_counter_counts_each_zone():
+    origin = (100, 50, 300, 200)
+    zones = detector.normalize_zones([[100, 50, 100, 100],
+                                      {"region": [250, 50, 150, 200], "SENSIBILIDADE": 99, "name": "porta"}], 50)
+    assert [z["name"] for z in zones] == ["zona1", "porta"]
+    motion = detector.MotionDetector((origin[3], origin[2]))
+    counter = detector.ZoneCounter(zones, origin, motion)
+    assert counter.thresholds.tolist() == [5000, 300]
+    base = np.zeros((origin[3], origin[2]), dtype=np.uint8)
+    moved = base.copy()
+    moved[100:140, 200:260] = 255  # Só dentro da zona "porta" (x de 150 a 300 na região)
+    motion.process(base)
+    score = motion.process(moved)
+    counts = counter.count(motion.mask, score)
+    assert counts[0] == 0 and counts[1] == score
+    assert abs(score - 40 * 60) <= 0.1 * 40 * 60  # O blur alarga um pouco a borda
+    assert counter.fired(counts).tolist() == [1]
+    assert counter.count(motion.mask, 0).tolist() == [0, 0]
+
+
+def test_zone_counter_scaled_counts_are_in_original_pixels():
+    origin = (0, 0, 320, 240)
+    zones = detector.normalize_zones([[0, 0, 160, 240], [160, 0, 160, 240]], 90)
+    motion = detector.MotionDetector((240, 320), scale=0.5)
+    counter = detector.ZoneCounter(zones, origin, motion)
+    base = np.zeros((240, 320), dtype=np.uint8)
+    moved = base.copy()
+    moved[40:120, 20:100] = 255
+    motion.process(base)
+    score = motion.process(moved)
+    counts = counter.count(motion.mask, score)
+    assert counts[1] == 0 and counts[0] == score
+    assert abs(counts[0] - 80 * 80) <= 0.1 * 80 * 80
+
+
+def test_single_region_is_not_a_zone_list():
+    assert detector.normalize_zones([10, 10, 50, 50], 80) is None
@@ -0,0 +1,69 @@
+"""EventTracker: agrupamento de detecções em eventos e seleção de frames."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import events
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def feed(tracker, ticks):
+    """Alimenta o tracker com (segundos, score, detectado); retorna os eventos encerrados."""
+    materialized = []
+    closed = []
+    for seconds, score, detected in ticks:
+        def materialize(score=score):
+            materialized.append(score)
+            return f"frame-{score}"
+        event = tracker.observe(seconds, T0 + timedelta(seconds=seconds), score, detected, materialize, 50)
+        if event is not None:
+            closed.append(event)
+    return closed, materialized
+
+
+def test_consecutive_detections_form_one_event():
+    tracker = events.EventTracker(quiet_period=2.0)
+    closed, _ = feed(tracker, [(0, 100, True), (1, 300, True), (2, 0, False), (2.5, 200, True),
+                               (3.5, 0, False), (4.4, 0, False)])
+    assert closed == []  # 1,9 s sem detecção: o evento continua aberto
+    closed, _ = feed(tracker, [(4.5, 0, False)])
+    assert len(closed) == 1
+    event = closed[0]
+    assert event.detections == 3 and event.peak_score == 300 and event.peak_threshold == 50
+    assert event.start == T0 and event.end == T0 + timedelta(seconds=2.5)
+    assert tracker.stats == {"opened": 1, "closed": 1, "detections": 3}
+
+
+def test_quiet_period_splits_events():
+    tracker = events.EventTracker(quiet_period=1.0)
+    closed, _ = feed(tracker, [(0, 100, True), (1, 0, False), (2, 100, True), (3, 0, False)])
+    assert len(closed) == 2 and tracker.active is None
+
+
+def test_top_k_keeps_best_frames_in_order_and_materializes_lazily():
+    tracker = events.EventTracker(keep="top_k", top_k=2)
+    _, materialized = feed(tracker, [(0, 100, True), (1, 300, True), (2, 50, True), (3, 200, True)])
+    # O frame de score 50 nunca entrou na seleção: não foi materializado
+    assert materialized == [100, 300, 200]
+    event = tracker.close()
+    assert [(score, frames) for score, _, frames in event.selected()] == [(300, "frame-300"), (200, "frame-200")]
+
+
+def test_first_peak_last_selection():
+    tracker = events.EventTracker(keep="first_peak_last")
+    feed(tracker, [(0, 100, True), (1, 300, True), (2, 200, True), (3, 150, True)])
+    assert [score for score, _, _ in tracker.close().selected()] == [100, 300, 150]
+
+
+def test_zones_are_merged_across_detections():
+    tracker = events.EventTracker()
+    tracker.observe(0, T0, 100, True, lambda: None, 50, ["porta"])
+    tracker.observe(1, T0, 100, True, lambda: None, 50, ["janela", "porta"])
+    assert tracker.close().zones == ["porta", "janela"]
+
+
+def test_invalid_keep_mode_is_rejected():
+    with pytest.raises(ValueError):
+        events.EventTracker(keep="all")
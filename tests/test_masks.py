@@ -0,0 +1,93 @@
+"""Máscaras de exclusão, blocos ignorados e o mapa de calor por bloco."""
+
+import numpy as np
+
+import detector
+import masks
+
+SHAPE = (256, 128)
+
+
+def frame(*blocks):
+    """Frame cinza de SHAPE com os retângulos (y0, y1, x0, x1) em branco."""
+    image = np.zeros(SHAPE, dtype=np.uint8)
+    for y0, y1, x0, x1 in blocks:
+        image[y0:y1, x0:x1] = 255
+    return image
+
+
+def test_early_exit_leaves_no_stale_rows_in_mask_or_heatmap():
+    motion = detector.MotionDetector(SHAPE)
+    heatmap = masks.TileHeatmap(motion.shape, motion.tile)
+    motion.process(frame())
+    # Tick 1: mudança só nas linhas de baixo, máscara completa
+    score = motion.process(frame((200, 240, 40, 80)), limit=10)
+    assert motion.stats["early_exit"] == 1 and motion.mask_complete
+    heatmap.add(motion.mask, score)
+    # Tick 2: mudança grande no alto para a contagem na primeira faixa;
+    # o bloco de baixo continua igual ao tick 1 (nada mudou ali)
+    score = motion.process(frame((0, 40, 40, 80), (200, 240, 40, 80)), limit=10)
+    assert motion.stats["early_exit"] == 2 and not motion.mask_complete
+    assert not motion.mask[detector.BAND_ROWS:].any()
+    heatmap.add(motion.mask, score)
+    assert heatmap.ticks == 2
+    assert heatmap.changed[7, 1:3].tolist() == [1, 1]  # Só o tick 1
+    assert heatmap.changed[0, 1:3].tolist() == [1, 1]  # Só o tick 2
+
+
+def test_tiled_early_exit_clears_remaining_tiles():
+    excluded = np.zeros(SHAPE, dtype=bool)
+    excluded[:, :32] = True
+    motion = detector.MotionDetector(SHAPE, exclude=excluded)
+    motion.process(frame())
+    motion.process(frame((200, 240, 40, 80)), limit=10)
+    motion.process(frame((0, 40, 40, 80), (200, 240, 40, 80)), limit=10)
+    assert not motion.mask_complete
+    assert not motion.mask[detector.BAND_ROWS:].any()
+
+
+def test_exclusion_mask_from_screen_rects():
+    excluded = masks.exclusion_mask((100, 100, 64, 64), [[90, 90, 30, 20], [500, 500, 10, 10]])
+    assert excluded.shape == (64, 64)
+    assert excluded[:10, :20].all() and np.count_nonzero(excluded) == 200
+    assert masks.exclusion_mask((100, 100, 64, 64), [[0, 0, 10, 10]]) is None
+    assert masks.unmasked_area(excluded) == 64 * 64 - 200
+    assert masks.unmasked_area(excluded, (100, 100, 32, 32), (100, 100, 64, 64)) == 32 * 32 - 200
+
+
+def test_fully_excluded_tiles_are_skipped():
+    excluded = np.zeros(SHAPE, dtype=bool)
+    excluded[:, :64] = True   # Dois blocos inteiros por linha
+    excluded[:, 64:80] = True  # Metade do terceiro
+    coverage = masks.tile_coverage(masks.keep_mask(excluded, SHAPE), 32)
+    assert coverage[0].tolist() == [0.0, 0.0, 0.5, 1.0]
+    rects = masks.active_rects(coverage, 32, SHAPE)
+    assert rects == [(0, 256, 64, 128)]
+    assert all(y1 - y0 <= 64 for y0, y1, _, _ in masks.active_rects(coverage, 32, SHAPE, max_rows=64))
+
+
+def test_changes_in_excluded_area_are_ignored():
+    excluded = np.zeros(SHAPE, dtype=bool)
+    excluded[:, :64] = True
+    masked = detector.MotionDetector(SHAPE, exclude=excluded)
+    plain = detector.MotionDetector(SHAPE)
+    changed = frame((100, 160, 80, 120))
+    for motion in (masked, plain):
+        motion.process(frame())
+    # Fora da parte ignorada o resultado é o mesmo do detector sem máscara
+    assert masked.process(changed) == plain.process(changed) > 0
+    assert np.array_equal(masked.mask, plain.mask)
+    # Só dentro dela: nada muda
+    assert masked.process(frame((100, 160, 80, 120), (40, 80, 0, 60))) == 0
+    assert masked.stats["unchanged"] == 1 and not masked.mask.any()
+
+def test_tile_heatmap_counts_changed_ticks_per_tile():
+    heatmap = masks.TileHeatmap(SHAPE, 32, pixel_scale=4.0)
+    heatmap.add(frame((0, 10, 0, 10)), 100)
+    heatmap.add(frame((0, 10, 0, 10), (40, 50, 40, 50)), 200)
+    heatmap.add(frame(), 0)
+    data = heatmap.snapshot()
+    assert data["ticks"] == 3 and (data["rows"], data["cols"]) == (8, 4)
+    assert data["changed"][0][0] == 2 and data["changed"][1][1] == 1
+    assert data["pixels"][0][0] == 2 * 100 * 4
+    assert sum(map(sum, data["changed"])) == 3
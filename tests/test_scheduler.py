@@ -0,0 +1,67 @@
+"""TickScheduler: prazos absolutos, atrasos e modo adaptativo."""
+
+import pytest
+
+import scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_tick(sched, clock, work, **result):
+    """Um tick que leva `work` segundos; depois espera até o prazo seguinte."""
+    assert sched.due()
+    sched.tick()
+    clock.now += work
+    deadline = sched.advance(**result)
+    assert not sched.due() or deadline == clock.now
+    clock.now = max(clock.now, deadline)
+    return deadline
+
+
+def test_deadlines_do_not_drift_with_work_time():
+    clock = FakeClock()
+    sched = scheduler.TickScheduler(0.5, clock=clock)
+    deadlines = [run_tick(sched, clock, work) for work in (0.1, 0.3, 0.05, 0.45)]
+    # O prazo conta a partir do tick anterior, não do fim do trabalho
+    assert deadlines == [100.5, 101.0, 101.5, 102.0]
+    snapshot = sched.snapshot()
+    assert snapshot["ticks"] == 4 and snapshot["overruns"] == 0
+    assert snapshot["achieved_fps"] == pytest.approx(2.0)
+    assert snapshot["jitter_ms"] == pytest.approx(0.0)
+
+
+def test_overrun_restarts_deadline_without_catching_up():
+    clock = FakeClock()
+    sched = scheduler.TickScheduler(0.5, clock=clock)
+    run_tick(sched, clock, 0.1)
+    # Um tick de 1,2 s perde o prazo: conta um atraso e recomeça a partir de agora
+    assert run_tick(sched, clock, 1.2) == pytest.approx(101.7)
+    assert run_tick(sched, clock, 0.1) == pytest.approx(102.2)
+    assert sched.overruns == 1
+
+
+def test_detection_doubles_interval_in_fixed_mode():
+    clock = FakeClock()
+    sched = scheduler.TickScheduler(0.5, clock=clock)
+    assert run_tick(sched, clock, 0.1, detected=True) == pytest.approx(101.0)
+    assert run_tick(sched, clock, 0.1) == pytest.approx(101.5)
+
+
+def test_adaptive_backs_off_and_bursts():
+    clock = FakeClock()
+    sched = scheduler.TickScheduler(1.0, adaptive=True, backoff=2.0, clock=clock)
+    intervals = []
+    for _ in range(4):
+        sched.tick()
+        sched.advance(score=0, threshold=100)
+        intervals.append(sched.interval)
+    assert intervals == [2.0, 4.0, 4.0, 4.0]  # Até max_interval (4 × interval)
+    sched.advance(score=60, threshold=100)  # Score perto do limiar: rajada
+    assert sched.interval == 0.5
+
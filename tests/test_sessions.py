@@ -0,0 +1,63 @@
+"""Ciclo de vida do MonitorManager: início, fim da fonte e encerramento das sessões."""
+
+import os
+import threading
+
+import pytest
+
+import main
+import sessions
+import sources
+
+
+def session_config(tmp_path, **overrides):
+    config = {"CAPTURE_IMG": [0, 0, 320, 240], "COMPARE_IMG": [0, 0, 320, 240], "SENSIBILIDADE": 99,
+              "INTERVAL": 0.005, "CAPTURE_DIR": str(tmp_path / "captures"), "FILENAME_PREFIX": "suspeito",
+              "SAVE_COMPARE_IMG": False}
+    config.update(overrides)
+    return config
+
+
+def saved_files(tmp_path):
+    return [f for _, _, files in os.walk(tmp_path / "captures") for f in files]
+
+
+def synthetic(frames=None):
+    return sources.SyntheticSource(size=(320, 240), frames=frames, motion_probability=0.5, blob_size=(40, 40))
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_run_monitor_closes_session_when_source_ends(tmp_path, mode):
+    config = session_config(tmp_path, DETECTION_MODE=mode, DETECTION_WORKERS=1)
+    session = main.run_monitor(config, threading.Event(), source=synthetic(frames=40))
+    assert session.status == "stopped"
+    assert session.wait_stopped(0)
+    assert session.saver is None and session.motion is None
+    assert saved_files(tmp_path)
+
+
+def test_run_monitor_saves_open_event_on_exit(tmp_path):
+    # Período de silêncio maior que o teste: o evento só é gravado no encerramento
+    config = session_config(tmp_path, EVENT_COALESCE=True, EVENT_QUIET_PERIOD=60)
+    session = main.run_monitor(config, threading.Event(), source=synthetic(frames=40))
+    assert session.status == "stopped"
+    assert saved_files(tmp_path)
+
+
+def test_manager_start_stop_and_source_exhausted(tmp_path):
+    source = synthetic()
+    manager = sessions.MonitorManager(lambda: source)
+    manager.add("a", session_config(tmp_path))
+    assert manager.start("a")
+    session = manager.get("a")
+    assert not manager.start("a")  # Já ativa
+    assert manager.stop("a", timeout=10)
+    assert session.status == "stopped" and session.saver is None
+
+    manager = sessions.MonitorManager(lambda: synthetic(frames=20))
+    manager.add("b", session_config(tmp_path))
+    manager.start("b")
+    session = manager.get("b")
+    assert session.wait_stopped(10)
+    assert session.status == "stopped"
+    manager.shutdown(timeout=10)
@@ -0,0 +1,71 @@
+"""CaptureWriter: fila limitada e políticas de contrapressão."""
+
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import writer
+
+IMAGE = np.zeros((8, 8, 3), dtype=np.uint8)
+
+
+def stalled_writer(tmp_path, policy):
+    """Gravador com uma thread presa na primeira captura e a fila (2 itens) cheia."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def on_written(path, size):
+        started.set()
+        release.wait(10)
+
+    saver = writer.CaptureWriter(max_queue=2, workers=1, policy=policy, on_written=on_written)
+    saver.submit(str(tmp_path / "a.png"), IMAGE)
+    assert started.wait(10)
+    assert saver.submit(str(tmp_path / "b.png"), IMAGE)
+    assert saver.submit(str(tmp_path / "c.png"), IMAGE)
+    return saver, release
+
+
+def written(tmp_path):
+    return sorted(os.listdir(tmp_path))
+
+
+def test_drop_newest_discards_incoming(tmp_path):
+    saver, release = stalled_writer(tmp_path, "drop_newest")
+    assert not saver.submit(str(tmp_path / "d.png"), IMAGE)
+    release.set()
+    saver.close()
+    assert written(tmp_path) == ["a.png", "b.png", "c.png"]
+    assert saver.stats["dropped"] == 1 and saver.stats["written"] == 3
+
+
+def test_drop_oldest_discards_queued(tmp_path):
+    saver, release = stalled_writer(tmp_path, "drop_oldest")
+    assert saver.submit(str(tmp_path / "d.png"), IMAGE)
+    release.set()
+    saver.close()
+    assert written(tmp_path) == ["a.png", "c.png", "d.png"]
+    assert saver.stats["dropped"] == 1 and saver.stats["queued"] == 4
+
+
+def test_block_waits_for_room(tmp_path):
+    saver, release = stalled_writer(tmp_path, "block")
+    submitted = threading.Event()
+    t = threading.Thread(target=lambda: submitted.set() if saver.submit(str(tmp_path / "d.png"), IMAGE) else None)
+    t.start()
+    assert not submitted.wait(0.2)  # Fila cheia: o loop espera
+    release.set()
+    t.join(10)
+    assert submitted.is_set()
+    saver.close()
+    assert written(tmp_path) == ["a.png", "b.png", "c.png", "d.png"]
+    assert saver.stats["dropped"] == 0
+
+
+def test_invalid_options_are_rejected():
+    with pytest.raises(ValueError):
+        writer.CaptureWriter(policy="drop_all")
+    with pytest.raises(ValueError):
+        writer.CaptureWriter(fmt="bmp")
@@ -0,0 +1,313 @@
+"""
+Detecção em processos de trabalho (DETECTION_MODE = "process").
+
+A captura continua no processo principal. Cada detector remoto tem um bloco
+de memória compartilhada com um anel de slots: a thread de captura copia a
+região de comparação para o próximo slot e envia ao processo apenas o
+índice dele (nenhum pixel é serializado). O processo roda o MotionDetector
+e escreve no mesmo slot o frame em cinza e a máscara, devolvendo só o
+score e as estatísticas.
+
+O MotionDetector guarda o frame anterior, então cada detector fica preso a
+um processo; os detectores das sessões são distribuídos entre os processos
+e as sessões com tick no mesmo instante são detectadas em paralelo, fora
+do GIL do processo principal.
+
+Quando compensa: cada detector paga, a cada tick, a cópia do frame BGR para
+o anel e duas passagens por fila (tarefa e resultado), cerca de 1 ms por
+detector (3 ms em 4K) a mais que no modo "thread". Num núcleo só o modo em
+processos é sempre mais lento (`python bench.py --compare-modes`, 200
+ticks, ticks/s thread x process):
+
+    640x480, 2 detectores, sem movimento      2010 x  419
+    640x480, 2 detectores, movimento sempre    997 x  276
+    1920x1080, 4 detectores, sem movimento     351 x  142
+    1920x1080, 4 detectores, movimento sempre  187 x  100
+    3840x2160, 4 detectores, movimento sempre   38 x   27
+
+Só vale com núcleos livres e uma detecção que custe bem mais que esse
+custo fixo: regiões grandes (4K, sem DETECTION_SCALE) com movimento
+frequente em várias sessões. Para regiões pequenas ou quase sempre
+paradas o padrão "thread" é melhor; meça na própria máquina com o bench.
+"""
+
+import os
+import time
+import queue
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+import detector
+import masks
+
+RING_SLOTS = 2          # Slots por detector (o tick seguinte não sobrescreve as saídas do anterior)
+RESULT_TIMEOUT = 10.0   # Tempo máximo (s) à espera do resultado de um processo
+LIVENESS_INTERVAL = 0.5  # Intervalo (s) entre as verificações de processos mortos durante a espera
+
+
+class FrameRing:
+    """
+    Anel de slots em memória compartilhada.
+
+    Cada slot tem a entrada (BGR na resolução original), o frame em cinza
+    (resolução original) e a máscara (escala da detecção).
+    """
+
+    def __init__(self, input_shape, mask_shape, slots=RING_SLOTS, name=None):
+        """
+        Args:
+            input_shape: (altura, largura) da região de comparação
+            mask_shape: (altura, largura) da detecção
+            slots: Quantidade de slots
+            name: Nome de um bloco existente; None cria um novo (e o remove no `close`)
+        """
+        h, w = input_shape
+        self.input_shape = (h, w, 3)
+        self.gray_shape = (h, w)
+        self.mask_shape = tuple(mask_shape)
+        self.slots = slots
+        self.slot_size = h * w * 3 + h * w + self.mask_shape[0] * self.mask_shape[1]
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_size * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.inputs, self.grays, self.masks = [], [], []
+        for slot in range(slots):
+            offset = slot * self.slot_size
+            self.inputs.append(self._view(offset, self.input_shape))
+            offset += h * w * 3
+            self.grays.append(self._view(offset, self.gray_shape))
+            offset += h * w
+            self.masks.append(self._view(offset, self.mask_shape))
+
+    def _view(self, offset, shape):
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+
+    @property
+    def spec(self):
+        """Argumentos para abrir este anel em outro processo."""
+        return self.gray_shape, self.mask_shape, self.slots, self.shm.name
+
+    def close(self):
+        self.inputs = self.grays = self.masks = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Ainda há views vivas; o mapeamento é liberado quando elas forem coletadas
+        if self._owner:
+            self.shm.unlink()
+
+
+def _worker_main(tasks, results):
+    """Loop de um processo de detecção: mensagens 'open', 'process' e 'close'."""
+    detectors = {}  # chave -> (MotionDetector, FrameRing)
+    while True:
+        message = tasks.get()
+        if message is None:
+            break
+        op, key = message[0], message[1]
+        if op == "open":
+            ring = FrameRing(*message[2])
+            motion = detector.MotionDetector(ring.gray_shape, scale=message[3], exclude=message[4],
+                                             tile_size=message[5])
+            detectors[key] = (motion, ring)
+        elif op == "process":
+            slot, limit = message[2], message[3]
+            motion, ring = detectors[key]
+            try:
+                score = motion.process(ring.inputs[slot], limit)
+                np.copyto(ring.grays[slot], motion.frame)
+                np.copyto(ring.masks[slot], motion.mask)
+                results.put((key, score, motion.mask_complete, dict(motion.stats), None))
+            except Exception as e:
+                results.put((key, None, True, None, repr(e)))
+        elif op == "reset":
+            detectors[key][0].reset()
+        elif op == "close":
+            _, ring = detectors.pop(key)
+            ring.close()
+    for _, ring in detectors.values():
+        ring.close()
+
+
+class DetectionPool:
+    """Processos de detecção e a fila de resultados compartilhada por eles."""
+
+    def __init__(self, workers=None):
+        """
+        Args:
+            workers: Quantidade de processos (padrão: núcleos - 1, no mínimo 1)
+        """
+        self.workers = workers  # Valor pedido (DETECTION_WORKERS), para saber se a configuração mudou
+        # 'spawn' em todas as plataformas: o processo principal tem threads
+        # (captura, gravação, Flask) e fork com threads pode travar o filho
+        context = multiprocessing.get_context("spawn")
+        count = max(1, int(workers or (os.cpu_count() or 2) - 1))
+        self._results = context.Queue()
+        self._tasks = []
+        self._processes = []
+        self._keys = itertools.count()
+        self._next_worker = itertools.cycle(range(count))
+        self._ready = {}
+        self._live = set()  # Chaves dos detectores abertos; resultados de outras são descartados
+        try:
+            # Os filhos herdam o rastreador de recursos já em execução, então
+            # conectar-se a um bloco não faz o filho removê-lo ao terminar
+            resource_tracker.ensure_running()
+            for i in range(count):
+                tasks = context.Queue()
+                self._tasks.append(tasks)
+                p = context.Process(target=_worker_main, args=(tasks, self._results),
+                                    name=f"monitcam-detector-{i}", daemon=True)
+                p.start()
+                self._processes.append(p)
+        except BaseException:
+            self.close()  # Não deixa para trás os processos que já foram iniciados
+            raise
+
+    @property
+    def size(self):
+        return len(self._processes)
+
+    @property
+    def alive(self):
+        """Indica se todos os processos de detecção estão vivos."""
+        return all(p.is_alive() for p in self._processes)
+
+    def detector(self, shape, scale=1.0, slots=RING_SLOTS, exclude=None, tile_size=masks.TILE_SIZE):
+        """Cria um detector remoto para uma região (altura, largura), preso a um dos processos."""
+        key = next(self._keys)
+        remote = RemoteDetector(self, self._tasks[next(self._next_worker)], key, shape, scale, slots,
+                                exclude, tile_size)
+        self._live.add(key)
+        return remote
+
+    def _collect(self, key):
+        """
+        Aguarda o resultado do detector `key`, guardando os de outros que
+        chegarem antes. Sem resposta no prazo (ou com um processo morto), o
+        detector é descartado: um resultado atrasado dele não é mais aceito.
+        """
+        if key not in self._live:
+            raise RuntimeError("Detector remoto descartado após uma falha.")
+        deadline = time.monotonic() + RESULT_TIMEOUT
+        while key not in self._ready:
+            try:
+                result = self._results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                if not self.alive:
+                    self._live.discard(key)
+                    raise RuntimeError("Um processo de detecção terminou inesperadamente.") from None
+                if time.monotonic() >= deadline:
+                    self._live.discard(key)
+                    raise RuntimeError("O processo de detecção não respondeu.") from None
+                continue
+            if result[0] in self._live:
+                self._ready[result[0]] = result[1:]
+        return self._ready.pop(key)
+
+    def _forget(self, key):
+        """Descarta o detector `key` (fechado): resultados dele que ainda chegarem são ignorados."""
+        self._live.discard(key)
+        self._ready.pop(key, None)
+
+    def close(self):
+        """Encerra os processos (os detectores devem ter sido fechados antes)."""
+        for tasks in self._tasks:
+            try:
+                tasks.put(None)
+            except (OSError, ValueError):
+                pass
+        for p in self._processes:
+            p.join(timeout=RESULT_TIMEOUT)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        for q in self._tasks + [self._results]:
+            q.close()
+            q.cancel_join_thread()
+
+
+class RemoteDetector:
+    """
+    Substituto do MotionDetector que roda a detecção em um processo do pool.
+
+    `submit` publica o frame e retorna imediatamente; `process` aguarda o
+    resultado (publicando antes, se `submit` não foi chamado). `frame` e
+    `mask` são views do slot da memória compartilhada do último resultado.
+    """
+
+    timer = None
+
+    def __init__(self, pool, tasks, key, shape, scale=1.0, slots=RING_SLOTS, exclude=None, tile_size=masks.TILE_SIZE):
+        self.input_shape = tuple(shape)
+        self.scale = scale
+        self.shape = detector.detection_shape(shape, scale)
+        self.pixel_scale = (self.input_shape[0] * self.input_shape[1]) / (self.shape[0] * self.shape[1])
+        # Mesmos blocos do MotionDetector do processo (usados no mapa de calor)
+        self.tile = masks.detection_tile(tile_size, scale)
+        self.keep = self.coverage = None
+        if exclude is not None:
+            self.keep = masks.keep_mask(exclude, self.shape)
+            self.coverage = masks.tile_coverage(self.keep, self.tile)
+        self.stats = {"frames": 0, "unchanged": 0, "early_exit": 0, "full": 0}
+        self.mask_complete = True
+        self._pool = pool
+        self._tasks = tasks
+        self._key = key
+        self._ring = FrameRing(self.input_shape, self.shape, slots)
+        self._seq = itertools.count()
+        self._slot = 0
+        self._pending = None
+        tasks.put(("open", key, self._ring.spec, scale, exclude, tile_size))
+
+    @property
+    def frame(self):
+        """Último frame processado (em cinza, resolução original)."""
+        return self._ring.grays[self._slot]
+
+    @property
+    def mask(self):
+        """Máscara binária de mudança do último `process` (na escala da detecção)."""
+        return self._ring.masks[self._slot]
+
+    def submit(self, frame, limit=None):
+        """Copia o frame BGR para o próximo slot e envia a detecção ao processo."""
+        slot = next(self._seq) % self._ring.slots
+        np.copyto(self._ring.inputs[slot], frame)
+        self._tasks.put(("process", self._key, slot, limit))
+        self._pending = slot
+
+    def process(self, frame, limit=None):
+        """Mesmo contrato de MotionDetector.process."""
+        if self._pending is None:
+            self.submit(frame, limit)
+        slot, self._pending = self._pending, None
+        score, self.mask_complete, stats, error = self._pool._collect(self._key)
+        if error is not None:
+            raise RuntimeError(f"Falha no processo de detecção: {error}")
+        self.stats = stats
+        self._slot = slot
+        return score
+
+    def reset(self):
+        """Mesmo contrato de MotionDetector.reset (chamado sem detecção em voo)."""
+        self._tasks.put(("reset", self._key))
+
+    def close(self):
+        """Libera o detector no processo e o bloco de memória compartilhada."""
+        try:
+            if self._pending is not None:
+                # Descarta o resultado em voo antes de o processo perder o slot
+                self._pending = None
+                self._pool._collect(self._key)
+        except RuntimeError:
+            pass  # Processo morto ou sem resposta: o resultado nunca virá
+        finally:
+            self._pool._forget(self._key)
+            self._tasks.put(("close", self._key))
+            self._ring.close()
@@ -0,0 +1,173 @@
+"""
+Gravação assíncrona das capturas do MonitCam.
+
+O loop de monitoramento apenas entrega o caminho e a imagem; a codificação
+(PNG/JPEG/WebP) e a escrita em disco acontecem em threads de trabalho
+alimentadas por uma fila limitada.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+
+import cv2
+
+# Extensão e parâmetro de qualidade do OpenCV para cada formato
+FORMATS = {
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION, 3),
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, 90),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, 90),
+}
+FORMATS["jpeg"] = FORMATS["jpg"]
+
+# Políticas quando a fila está cheia
+POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class CaptureWriter:
+    """
+    Fila limitada de gravações drenada por um pool de threads.
+
+    Políticas de contrapressão:
+    - 'block': o loop espera por espaço na fila (nenhuma captura é perdida)
+    - 'drop_oldest': descarta o item mais antigo da fila para abrir espaço
+    - 'drop_newest': descarta o item que está chegando
+    """
+
+    def __init__(self, fmt="png", quality=None, max_queue=32, workers=2, policy="block", metrics=None,
+                 on_written=None):
+        """
+        Args:
+            fmt: 'png', 'jpg'/'jpeg' ou 'webp'
+            quality: Compressão do PNG (0-9) ou qualidade do JPEG/WebP (0-100);
+                None usa o padrão do formato
+            max_queue: Capacidade da fila
+            workers: Quantidade de threads de gravação
+            policy: Política de contrapressão (ver POLICIES)
+            metrics: MonitorMetrics opcional para os tempos de codificação e escrita
+            on_written: Função opcional chamada com (caminho, bytes) após cada gravação
+        """
+        fmt = str(fmt).lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de imagem inválido: {fmt}")
+        if policy not in POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy}")
+        self.extension, flag, default_quality = FORMATS[fmt]
+        self.params = [flag, int(default_quality if quality is None else quality)]
+        self.policy = policy
+        self.metrics = metrics
+        self.on_written = on_written
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._created_dirs = set()
+        self._counters = {"queued": 0, "written": 0, "dropped": 0, "failed": 0}
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"capture-writer-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for t in self._workers:
+            t.start()
+
+    @property
+    def stats(self):
+        """Contadores de itens enfileirados, gravados, descartados e com falha."""
+        with self._lock:
+            stats = dict(self._counters)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def submit(self, path, image):
+        """
+        Enfileira a gravação de `image` em `path`.
+
+        A imagem não é copiada: quem chama não deve reutilizar o array.
+
+        Returns:
+            bool: False se o item foi descartado pela política da fila
+        """
+        item = (path, image)
+        if self.policy == "block":
+            self._queue.put(item)
+        elif self.policy == "drop_newest":
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._count("dropped")
+                logging.warning("Fila de gravação cheia; captura descartada: %s", path)
+                return False
+        else:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        old_path, _ = self._queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    self._queue.task_done()
+                    self._count("dropped")
+                    logging.warning("Fila de gravação cheia; captura descartada: %s", old_path)
+        self._count("queued")
+        return True
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, image):
+        try:
+            directory = os.path.dirname(path)
+            if directory and directory not in self._created_dirs:
+                os.makedirs(directory, exist_ok=True)
+                self._created_dirs.add(directory)
+            started = time.perf_counter()
+            ok, encoded = cv2.imencode(self.extension, image, self.params)
+            if not ok:
+                raise ValueError("falha na codificação")
+            encoded_at = time.perf_counter()
+            # imencode + open() também funciona com caminhos não-ASCII no Windows
+            try:
+                f = open(path, "wb")
+            except FileNotFoundError:
+                if not directory:
+                    raise
+                # O diretório foi apagado depois de criado (ex.: esvaziado pela retenção)
+                self._created_dirs.discard(directory)
+                os.makedirs(directory, exist_ok=True)
+                self._created_dirs.add(directory)
+                f = open(path, "wb")
+            with f:
+                f.write(encoded)
+            if self.metrics is not None:
+                self.metrics.encode_seconds.observe(encoded_at - started)
+                self.metrics.write_seconds.observe(time.perf_counter() - encoded_at)
+            self._count("written")
+            if self.on_written is not None:
+                self.on_written(path, len(encoded))
+        except Exception as e:
+            self._count("failed")
+            logging.error(f"Falha ao gravar captura '{path}': {e}")
+
+    def flush(self):
+        """Aguarda até que todos os itens enfileirados sejam processados."""
+        self._queue.join()
+
+    def close(self):
+        """Grava o que resta na fila e encerra as threads."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join()